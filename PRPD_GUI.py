@@ -1,99 +1,825 @@
+import time
+
+_IMPORT_START = time.perf_counter()
+
 import sys
 import os
+import glob
+import functools
+import threading
+from collections import deque
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QPushButton, QFileDialog, QLabel, 
-                             QMessageBox, QGroupBox, QComboBox, QSpinBox,
+                             QMessageBox, QGroupBox, QComboBox, QSpinBox, QDoubleSpinBox,
                              QFormLayout, QTabWidget, QRadioButton, QButtonGroup,
-                             QListWidget, QStatusBar, QProgressBar)
-from PySide6.QtCore import Qt, QSize, QThread, Signal
-from PySide6.QtGui import QPixmap, QImage
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+                             QListView, QStatusBar, QProgressBar, QCheckBox, QDialog,
+                             QListWidget, QListWidgetItem, QInputDialog, QSlider)
+from PySide6.QtCore import (Qt, QSize, QThread, QTimer, Signal, SignalInstance, QObject,
+                            QAbstractListModel, QModelIndex)
+from PySide6.QtGui import QIcon, QPixmap, QImage
+# pyplot导入较慢，不在启动时导入（mpl_toolkits.mplot3d在导入Figure时已由matplotlib.projections导入）
+from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
-import pandas as pd
+from mpl_toolkits.mplot3d.art3d import Poly3DCollection
 import numpy as np
 from matplotlib.colors import LinearSegmentedColormap
-from mpl_toolkits.mplot3d import Axes3D
+from prpd_archive import ARCHIVE_EXT, get_archive, stat_source
+from prpd_cache import LRUCache, estimate_nbytes, load_prpd_matrix
+from prpd_core import (COLOR_SCHEMES, SURFACE_COUNT, PipelineStats, PRPDRenderTemplate,
+                       auto_scale_surface, fix_job_limits, get_raster_renderer, make_jobs,
+                       release_canvas_buffer, release_figure, run_jobs, surface_polygons)
+from prpd_manifest import JobManifest
+from prpd_metrics import BATCH_LOG_NAME, STAGES, BatchMetrics, format_seconds
+from prpd_index import PRPDIndex
+from prpd_preprocess import NORMALIZE_MODES, Preprocess, color_limits, data_limits, preprocess_maps
+from prpd_compare import PER_PAGE, PRPDComparisonFigure, iter_contact_sheets, load_maps, map_title
+from prpd_sequence import (PRPDSequence, PRPDTrendFigure, iter_sequence_batches, sort_series,
+                           write_trend_csv)
+from prpd_features import PHASE_WINDOWS, FeatureTable, iter_file_features
+from prpd_events import AMP_BINS, PHASE_BINS, EventBinning, events_to_prpd
+from prpd_stream import ACCUMULATE_STATS, PRPDAccumulator, iter_frames
+from prpd_thumbnails import THUMBNAIL_SIZE, make_thumbnail
+from prpd_watch import WatchService
+
+# 中文字体由prpd_core在导入时设置（查找结果缓存在磁盘上）
+
+# 检测信号引用计数问题时发出的次数
+EMIT_PROBE_COUNT = 8
+
+def fix_signal_emit_refcount():
+    """修正部分PySide6版本中SignalInstance.emit的引用计数错误，返回是否进行了修正
+
+    这些版本的emit返回True时没有增加其引用计数，Python 3.12之前True不是永生对象，
+    每发出一次信号True的引用计数就少1，长时间运行（后台线程不断发出进度、绘图结果等
+    信号）后解释器会因释放True而崩溃。启动时发出几次测试信号检测，存在问题时为返回值补上引用。
+    """
+    if sys.version_info >= (3, 12):
+        return False
+
+    class Probe(QObject):
+        probe = Signal()
+
+    sender = Probe()
+    before = sys.getrefcount(True)
+    for _ in range(EMIT_PROBE_COUNT):
+        sender.probe.emit()
+    if before - sys.getrefcount(True) != EMIT_PROBE_COUNT:
+        return False
+
+    import ctypes
+    incref = ctypes.pythonapi.Py_IncRef
+    incref.argtypes = [ctypes.py_object]
+    emit = SignalInstance.emit
+
+    def checked_emit(self, *args):
+        result = emit(self, *args)
+        if result is True:
+            incref(result)
+        return result
+
+    SignalInstance.emit = checked_emit
+    for _ in range(EMIT_PROBE_COUNT):
+        incref(True)  # 补回检测时少的引用
+    return True
 
-# 设置默认字体为SimHei（或其他支持中文的字体）
-plt.rcParams['font.sans-serif'] = ['SimHei']
-# 解决负号"-"显示为方块的问题
-plt.rcParams['axes.unicode_minus'] = False
+fix_signal_emit_refcount()
 
 class BatchProcessThread(QThread):
     """用于批处理PRPD文件的线程"""
     progress = Signal(int)
     status = Signal(str)
     finished_one = Signal(str, str)  # 文件路径, 保存路径
+    stats_updated = Signal(dict)  # BatchMetrics.snapshot()
+    STATS_INTERVAL = 0.5  # 运行统计的最短刷新间隔（秒）
     
-    def __init__(self, file_list, save_dir, color_scheme, dpi, view_mode):
+    def __init__(self, file_list, save_dir, color_scheme, dpi, view_mode, workers=1,
+                 render_mode="figure", surface_count=SURFACE_COUNT, events=None,
+                 skip_current=True, preprocess=None):
         super().__init__()
         self.file_list = file_list
         self.save_dir = save_dir
         self.color_scheme = color_scheme
         self.dpi = dpi
         self.view_mode = view_mode
+        self.workers = max(1, workers)  # 工作进程数，1表示在当前线程中顺序处理
+        self.render_mode = render_mode  # 渲染方式，见prpd_core.RENDER_MODES
+        self.surface_count = surface_count  # 3D曲面网格数
+        self.events = events  # 原始脉冲事件的分箱参数，None表示PRPD矩阵文件
+        self.skip_current = skip_current  # 跳过任务清单中输入和参数均未变化的文件
+        self.preprocess = preprocess  # 预处理参数，None表示不处理
+        self.cancelled = False
+    
+    def stop(self):
+        """请求取消批处理（当前正在处理的文件完成后停止）"""
+        self.cancelled = True
+    
+    def run(self):
+        jobs = make_jobs(self.file_list, self.save_dir, self.color_scheme, self.dpi,
+                         self.view_mode, self.render_mode,
+                         surface_count=self.surface_count, events=self.events,
+                         preprocess=self.preprocess)
+        if self.preprocess is not None and self.preprocess.normalize == "global":
+            # 所有文件统一颜色范围，先扫描一遍全部数据
+            self.status.emit("正在计算所有文件的统一颜色范围...")
+            jobs = fix_job_limits(jobs)
+        
+        # 跳过已是最新的输出，中断的批处理从中断处继续
+        self.status.emit("正在检查任务清单...")
+        self.manifest = JobManifest(self.save_dir)
+        if self.skip_current:
+            jobs, skipped = self.manifest.split_jobs(jobs)
+            if skipped:
+                self.status.emit(f"跳过{len(skipped)}个输入和参数均未变化的文件")
+        self.jobs_by_output = {job.save_path: job for job in jobs}
+        if self.cancelled:
+            self.status.emit("批处理已取消")
+            return
+        
+        total = len(jobs)
+        if total == 0:
+            self.progress.emit(100)
+            self.status.emit("批处理完成 - 所有输出均已是最新")
+            return
+        if self.workers > 1 and total > 1:
+            self.status.emit(f"使用{min(self.workers, total)}个进程处理{total}个文件")
+        
+        # 按完成顺序更新进度（单进程时为读取、渲染、写出三级流水线），
+        # 逐文件计时写入输出目录中的批处理日志
+        stats = PipelineStats()
+        metrics = BatchMetrics(total, os.path.join(self.save_dir, BATCH_LOG_NAME), params={
+            'view': self.view_mode, 'dpi': self.dpi, 'render': self.render_mode,
+            'workers': self.workers, 'events': self.events is not None,
+            'preprocess': self.preprocess._asdict() if self.preprocess else None})
+        try:
+            self.process_jobs(jobs, stats, metrics)
+        finally:
+            self.stats_updated.emit(metrics.snapshot())
+            metrics.close()
+    
+    def process_jobs(self, jobs, stats, metrics):
+        """执行渲染任务并发送进度和运行统计"""
+        total = len(jobs)
+        last_update = 0
+        results = run_jobs(jobs, self.workers, stats, metrics=metrics)
+        for done, (file_path, save_path, error) in enumerate(results, 1):
+            self.progress.emit(int((done / total) * 100))
+            self.report_result(file_path, save_path, error)
+            # 运行统计限制刷新频率，避免大量小文件时信号过多
+            if time.perf_counter() - last_update >= self.STATS_INTERVAL:
+                last_update = time.perf_counter()
+                snapshot = metrics.snapshot()
+                self.stats_updated.emit(snapshot)
+                eta = "" if snapshot['eta'] is None else f"，剩余约{format_seconds(snapshot['eta'])}"
+                self.status.emit(f"处理文件 {done}/{total}: {os.path.basename(file_path)}"
+                                 f"（{snapshot['rate']:.2f} 文件/秒{eta}）")
+            if self.cancelled:
+                results.close()
+                self.status.emit(f"批处理已取消（已完成{done}/{total}），再次运行将从中断处继续")
+                return
         
+        self.progress.emit(100)
+        if stats.counts["render"]:
+            self.status.emit(f"批处理完成 - {metrics.summary()}；{stats.summary()}")
+        else:
+            self.status.emit(f"批处理完成 - {metrics.summary()}")
+    
+    def report_result(self, file_path, save_path, error):
+        """发送单个文件的处理结果"""
+        if error is None:
+            # 记录到任务清单，再次运行时跳过
+            self.manifest.record(self.jobs_by_output[save_path])
+            # 发送完成信号
+            self.finished_one.emit(file_path, save_path)
+        else:
+            self.status.emit(f"处理文件失败: {os.path.basename(file_path)} - {error}")
+
+class WatchFolderThread(QThread):
+    """监视目录并自动渲染新增或修改的文件的线程（见prpd_watch.WatchService）"""
+    status = Signal(str)
+    finished_one = Signal(str, str)  # 文件路径, 保存路径
+    stats_updated = Signal(dict)  # WatchService.snapshot()
+    
+    def __init__(self, watch_dir, save_dir, color_scheme, dpi, view_mode, workers=1,
+                 render_mode="figure", surface_count=SURFACE_COUNT, events=None, preprocess=None):
+        super().__init__()
+        self.watch_dir = watch_dir
+        self.service = WatchService([watch_dir], save_dir, color_scheme, dpi, view_mode,
+                                    render_mode, surface_count=surface_count, events=events,
+                                    preprocess=preprocess,
+                                    workers=max(1, workers),
+                                    log_path=os.path.join(save_dir, BATCH_LOG_NAME),
+                                    on_result=self.report_result, on_stats=self.stats_updated.emit)
+    
+    def stop(self):
+        """请求停止监视（正在渲染的文件完成后停止）"""
+        self.service.stop()
+    
+    def run(self):
+        self.status.emit(f"正在监视: {self.watch_dir}")
+        self.service.run(stats_interval=BatchProcessThread.STATS_INTERVAL)
+        self.status.emit(f"已停止监视: {self.watch_dir}")
+    
+    def report_result(self, file_path, save_path, error):
+        """在渲染线程中调用，发送单个文件的处理结果"""
+        if error is None:
+            self.finished_one.emit(file_path, save_path)
+            self.status.emit(f"已渲染: {os.path.basename(file_path)}")
+        else:
+            self.status.emit(f"处理文件失败: {os.path.basename(file_path)} - {error}")
+
+class StreamAccumulateThread(QThread):
+    """逐帧读取长时记录并累积的线程"""
+    updated = Signal(object)  # PRPDAccumulator快照
+    status = Signal(str)
+    
+    def __init__(self, file_path, update_interval=0.5):
+        super().__init__()
+        self.file_path = file_path
+        self.update_interval = update_interval  # 界面刷新间隔（秒）
+        self._stopped = False
+    
+    def stop(self):
+        """请求停止读取"""
+        self._stopped = True
+    
+    def run(self):
+        accumulator = PRPDAccumulator()
+        last_update = time.perf_counter()
+        try:
+            for frame in iter_frames(self.file_path):
+                if self._stopped:
+                    return
+                accumulator.add(frame)
+                # 按时间间隔发送快照，避免每帧重绘
+                if time.perf_counter() - last_update >= self.update_interval:
+                    self.updated.emit(accumulator.copy())
+                    last_update = time.perf_counter()
+        except Exception as e:
+            self.status.emit(f"读取记录失败: {str(e)}")
+            return
+        if accumulator.frame_count:
+            self.updated.emit(accumulator)
+        self.status.emit(f"记录读取完成: 共{accumulator.frame_count}帧")
+
+class FeatureExtractThread(QThread):
+    """分批提取PRPD统计特征并写出特征表的线程"""
+    progress = Signal(int)
+    status = Signal(str)
+    
+    def __init__(self, file_list, save_path, events=None, phase_windows=PHASE_WINDOWS,
+                 batch_size=256):
+        super().__init__()
+        self.file_list = list(file_list)
+        self.save_path = save_path
+        self.events = events  # 原始脉冲事件的分箱参数，None表示PRPD矩阵文件
+        self.phase_windows = phase_windows
+        self.batch_size = batch_size  # 每批堆叠的矩阵数（同时决定进度更新的频率）
+        self.cancelled = False
+    
+    def stop(self):
+        """请求取消（当前批次完成后停止）"""
+        self.cancelled = True
+    
+    def run(self):
+        table = FeatureTable()
+        total = len(self.file_list)
+        done = failed = 0
+        start = time.perf_counter()
+        try:
+            for names, features, errors in iter_file_features(
+                    self.file_list, self.events, self.phase_windows, self.batch_size):
+                table.append(names, features)
+                done += len(names) + len(errors)
+                failed += len(errors)
+                self.progress.emit(int(done / total * 100))
+                self.status.emit(f"提取特征 {done}/{total}")
+                if self.cancelled:
+                    self.status.emit("特征提取已取消")
+                    return
+            table.write(self.save_path)
+        except Exception as e:
+            self.status.emit(f"特征提取失败: {str(e)}")
+            return
+        elapsed = time.perf_counter() - start
+        self.status.emit(f"特征表已保存到: {self.save_path}（{len(table)}个文件，失败{failed}个，"
+                         f"{len(table) / max(elapsed, 1e-9):.0f} 文件/秒）")
+
+class CompareLoadThread(QThread):
+    """并发读取要对比的PRPD文件的线程"""
+    loaded = Signal(object)  # [(文件路径, 矩阵, 错误信息)]
+    
+    def __init__(self, file_list, events=None):
+        super().__init__()
+        self.file_list = list(file_list)
+        self.events = events  # 原始脉冲事件的分箱参数，None表示PRPD矩阵文件
+    
+    def run(self):
+        self.loaded.emit(load_maps(self.file_list, self.events))
+
+class SequenceLoadThread(QThread):
+    """按顺序分批读取序列文件的线程，每读完一批发送一次（界面随之增量更新）"""
+    batch_loaded = Signal(object, object, object)  # 文件列表, 帧数组, [(文件路径, 错误信息)]
+    
+    def __init__(self, file_list, events=None):
+        super().__init__()
+        self.file_list = list(file_list)
+        self.events = events  # 原始脉冲事件的分箱参数，None表示PRPD矩阵文件
+        self.cancelled = False
+    
+    def stop(self):
+        """请求停止（当前批读取完成后停止）"""
+        self.cancelled = True
+    
+    def run(self):
+        for names, frames, failed in iter_sequence_batches(self.file_list, self.events):
+            if self.cancelled:
+                return
+            self.batch_loaded.emit(names, frames, failed)
+
+class ContactSheetThread(QThread):
+    """按页导出对比总览图的线程"""
+    progress = Signal(int)
+    status = Signal(str)
+    
+    def __init__(self, file_list, save_dir, color_scheme, dpi, events=None, per_page=PER_PAGE):
+        super().__init__()
+        self.file_list = list(file_list)
+        self.save_dir = save_dir
+        self.color_scheme = color_scheme
+        self.dpi = dpi
+        self.events = events  # 原始脉冲事件的分箱参数，None表示PRPD矩阵文件
+        self.per_page = per_page
+        self.cancelled = False
+    
+    def stop(self):
+        """请求取消（当前页完成后停止）"""
+        self.cancelled = True
+    
     def run(self):
         total = len(self.file_list)
-        for i, file_path in enumerate(self.file_list):
+        done = failed = pages = 0
+        name = os.path.basename(os.path.dirname(self.file_list[0])) or "PRPD"
+        try:
+            for save_path, page, errors in iter_contact_sheets(
+                    self.file_list, self.save_dir, self.color_scheme, self.dpi, self.per_page,
+                    events=self.events, name=name):
+                done += len(page)
+                failed += len(errors)
+                pages += 1
+                self.progress.emit(int(done / total * 100))
+                self.status.emit(f"导出对比总览图 {done}/{total}: {os.path.basename(save_path)}")
+                if self.cancelled:
+                    self.status.emit("对比总览图导出已取消")
+                    return
+        except Exception as e:
+            self.status.emit(f"对比总览图导出失败: {str(e)}")
+            return
+        self.status.emit(f"对比总览图已保存到: {self.save_dir}（{pages}页，读取失败{failed}个文件）")
+
+class ThumbnailLoader(QObject):
+    """在后台线程中生成（或从磁盘缓存读取）缩略图
+
+    最近的请求最先处理，使当前可见的行优先显示；等待的请求超过上限时丢弃最早的
+    （通常是已滚动出视图的行），这些行再次显示时会重新请求。
+    """
+    loaded = Signal(str, object, QImage)  # 文件路径, 缩略图参数, 图像（失败时为空图像）
+    
+    def __init__(self, workers=2, max_pending=512):
+        super().__init__()
+        self.max_pending = max_pending
+        self._pending = deque()
+        self._queued = set()
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._threads = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+    
+    def request(self, file_path, params):
+        """请求缩略图，params为(颜色方案, 脉冲事件分箱参数)"""
+        key = (file_path, params)
+        with self._condition:
+            if key in self._queued:
+                return
+            self._pending.append(key)
+            self._queued.add(key)
+            while len(self._pending) > self.max_pending:
+                self._queued.discard(self._pending.popleft())
+            self._condition.notify()
+    
+    def stop(self):
+        """停止后台线程并等待正在生成的缩略图完成"""
+        with self._condition:
+            self._stopped = True
+            self._pending.clear()
+            self._queued.clear()
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join()
+    
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                key = self._pending.pop()
+            file_path, params = key
+            color_scheme, events = params
             try:
-                # 更新进度
-                self.progress.emit(int((i / total) * 100))
-                self.status.emit(f"处理文件 {i+1}/{total}: {os.path.basename(file_path)}")
-                
-                # 读取数据
-                df = pd.read_csv(file_path, header=None)
-                
-                # 创建颜色方案
-                custom_cmap = LinearSegmentedColormap.from_list('custom', self.color_scheme)
-                
-                # 创建图像
-                fig = Figure(figsize=(10, 6), dpi=100)
-                
-                if self.view_mode == "2D":
-                    ax = fig.add_subplot(111)
-                    img = ax.imshow(df.values, cmap=custom_cmap, origin='lower', 
-                                extent=[0, 360, 0, 100], aspect='auto')
-                    ax.set_title('2D PRPD图')
-                    ax.set_xlabel('相位 (°)')
-                    ax.set_ylabel('电压 (%)')
-                    ax.set_xticks(np.arange(0, 361, 90))
-                    ax.set_yticks(np.arange(0, 101, 25))
-                    fig.colorbar(img, ax=ax)
-                else:
-                    ax = fig.add_subplot(111, projection='3d')
-                    x = np.arange(0, 360, 360/df.shape[1])
-                    y = np.arange(0, 100, 100/df.shape[0])
-                    X, Y = np.meshgrid(x, y)
-                    Z = df.values
-                    surf = ax.plot_surface(X, Y, Z, cmap=custom_cmap, 
-                                        linewidth=0, antialiased=False)
-                    ax.set_title('3D PRPD图')
-                    ax.set_xlabel('相位 (°)')
-                    ax.set_ylabel('电压 (%)')
-                    ax.set_zlabel('幅值')
-                    ax.view_init(elev=30, azim=45)
-                    fig.colorbar(surf, ax=ax, shrink=0.5, aspect=5)
-                
-                fig.tight_layout()
-                
-                # 创建保存路径
-                filename = os.path.splitext(os.path.basename(file_path))[0]
-                save_path = os.path.join(self.save_dir, f"{filename}_{self.view_mode}.png")
-                
-                # 保存图像
-                fig.savefig(save_path, dpi=self.dpi, bbox_inches='tight')
-                plt.close(fig)
-                
-                # 发送完成信号
-                self.finished_one.emit(file_path, save_path)
-                
-            except Exception as e:
-                self.status.emit(f"处理文件失败: {os.path.basename(file_path)} - {str(e)}")
+                image = QImage(make_thumbnail(file_path, color_scheme, THUMBNAIL_SIZE, events))
+            except Exception:
+                image = QImage()
+            with self._condition:
+                self._queued.discard(key)
+                if self._stopped:
+                    return
+            self.loaded.emit(file_path, params, image)
+
+class BatchFileModel(QAbstractListModel):
+    """批处理文件列表模型
+
+    视图只为实际显示的行查询缩略图，未生成的缩略图交给ThumbnailLoader在后台生成，
+    已显示过的缩略图保存在按大小限制的内存缓存中。添加文件时只插入新行；
+    后台完成的缩略图每50ms合并通知一次视图，避免逐个重绘。
+    """
+    def __init__(self, loader, color_scheme, parent=None):
+        super().__init__(parent)
+        self.loader = loader
+        self.files = []
+        self.rows = {}  # 文件路径 -> 所在行
+        self.params = (tuple(color_scheme), None)
+        self.pixmaps = LRUCache(64 * 2**20)
+        self.failed = set()
+        self.changed_rows = None  # 待通知视图的行范围(最小, 最大)
+        self.notify_timer = QTimer(self)
+        self.notify_timer.setSingleShot(True)
+        self.notify_timer.setInterval(50)
+        self.notify_timer.timeout.connect(self.notify_changed)
+        loader.loaded.connect(self.thumbnail_loaded)
+    
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.files)
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        file_path = self.files[index.row()]
+        if role == Qt.DisplayRole:
+            return os.path.basename(file_path)
+        if role == Qt.ToolTipRole:
+            return file_path
+        if role == Qt.DecorationRole:
+            key = (file_path, self.params)
+            pixmap = self.pixmaps.get(key)
+            if pixmap is None and key not in self.failed:
+                self.loader.request(file_path, self.params)
+            return pixmap
+        return None
+    
+    def append_files(self, file_paths):
+        """在末尾插入新文件"""
+        if not file_paths:
+            return
+        first = len(self.files)
+        self.beginInsertRows(QModelIndex(), first, first + len(file_paths) - 1)
+        for row, file_path in enumerate(file_paths, first):
+            self.files.append(file_path)
+            self.rows.setdefault(file_path, []).append(row)
+        self.endInsertRows()
+    
+    def clear(self):
+        """清空文件列表"""
+        self.beginResetModel()
+        self.files = []
+        self.rows = {}
+        self.failed = set()
+        self.changed_rows = None
+        self.endResetModel()
+    
+    def set_thumbnail_params(self, color_scheme, events=None):
+        """修改缩略图的颜色方案或分箱参数，可见的行随后重新请求缩略图"""
+        params = (tuple(color_scheme), events)
+        if params == self.params:
+            return
+        self.params = params
+        if self.files:
+            self.dataChanged.emit(self.index(0), self.index(len(self.files) - 1),
+                                  [Qt.DecorationRole])
+    
+    def thumbnail_loaded(self, file_path, params, image):
+        """缩略图生成完成"""
+        key = (file_path, params)
+        if image.isNull():
+            self.failed.add(key)
+        else:
+            self.pixmaps.put(key, QPixmap.fromImage(image), image.sizeInBytes())
+        if params != self.params:
+            return
+        rows = self.rows.get(file_path)
+        if not rows:
+            return
+        if self.changed_rows is None:
+            self.changed_rows = (rows[0], rows[-1])
+        else:
+            first, last = self.changed_rows
+            self.changed_rows = (min(first, rows[0]), max(last, rows[-1]))
+        if not self.notify_timer.isActive():
+            self.notify_timer.start()
+    
+    def notify_changed(self):
+        """通知视图重绘缩略图已更新的行"""
+        if self.changed_rows is None:
+            return
+        first, last = self.changed_rows
+        self.changed_rows = None
+        self.dataChanged.emit(self.index(first), self.index(last), [Qt.DecorationRole])
+
+# 查找相似时显示的结果数
+SIMILAR_COUNT = 10
+
+class SimilarResultsDialog(QDialog):
+    """显示相似图谱的查询结果，双击结果打开对应文件"""
+    open_requested = Signal(str)
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("相似图谱")
+        self.resize(560, 420)
+        layout = QVBoxLayout(self)
+        self.summary_label = QLabel()
+        self.result_list = QListWidget()
+        self.result_list.setViewMode(QListView.IconMode)
+        self.result_list.setIconSize(QSize(*THUMBNAIL_SIZE))
+        self.result_list.setGridSize(QSize(THUMBNAIL_SIZE[0] + 56, THUMBNAIL_SIZE[1] + 48))
+        self.result_list.setResizeMode(QListView.Adjust)
+        self.result_list.setMovement(QListView.Static)
+        self.result_list.setWordWrap(True)
+        self.change_index_button = QPushButton("更换索引...")
+        layout.addWidget(self.summary_label)
+        layout.addWidget(self.result_list)
+        layout.addWidget(self.change_index_button)
+        self.result_list.itemDoubleClicked.connect(
+            lambda item: self.open_requested.emit(item.data(Qt.UserRole)))
+    
+    def show_results(self, matches, color_scheme, summary):
+        """显示[(条目, 得分)]列表"""
+        self.summary_label.setText(summary)
+        self.result_list.clear()
+        for rank, (entry, score) in enumerate(matches, 1):
+            item = QListWidgetItem(f"{rank}. [{entry['label']}] {score:.3f}\n"
+                                   f"{os.path.basename(entry['file'])}")
+            item.setData(Qt.UserRole, entry['file'])
+            item.setToolTip(entry['file'])
+            try:
+                item.setIcon(QIcon(make_thumbnail(entry['file'], color_scheme)))
+            except Exception:
+                pass  # 图谱文件已移动或删除时只显示文字
+            self.result_list.addItem(item)
+
+# 对比窗口中最多同时显示的图谱数
+COMPARE_LIMIT = 36
+
+# 归档中的图谱数不超过此值时从列表中选择图谱，否则输入序号
+ARCHIVE_PICK_LIMIT = 10000
+
+class ComparisonDialog(QDialog):
+    """多图谱对比：网格排列，共享坐标轴、颜色范围和colorbar"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("图谱对比")
+        self.resize(1000, 700)
+        layout = QVBoxLayout(self)
+        self.summary_label = QLabel()
+        self.fig = Figure(figsize=(10, 7), dpi=100)
+        self.canvas = FigureCanvas(self.fig)
+        self.export_button = QPushButton("导出图像...")
+        layout.addWidget(self.summary_label)
+        layout.addWidget(self.canvas, 1)
+        layout.addWidget(self.export_button)
+        self.comparison = None
+        self.save_dpi = 300
+        self.export_button.clicked.connect(self.export_image)
+    
+    def show_maps(self, results, color_scheme, save_dpi):
+        """显示[(文件路径, 矩阵, 错误信息)]，网格和布局随图谱数重新创建"""
+        self.save_dpi = save_dpi
+        self.fig.clear()
+        self.comparison = PRPDComparisonFigure(color_scheme, len(results), fig=self.fig)
+        self.comparison.update([data for _, data, _ in results],
+                               [map_title(file_path) for file_path, _, _ in results])
+        self.canvas.draw_idle()
+        failed = [os.path.basename(file_path) for file_path, _, error in results if error]
+        summary = f"{len(results)}个图谱（颜色范围相同）"
+        if failed:
+            summary += f"，读取失败: {', '.join(failed)}"
+        self.summary_label.setText(summary)
+    
+    def export_image(self):
+        """保存对比图"""
+        save_path, _ = QFileDialog.getSaveFileName(
+            self, "导出对比图", "PRPD对比.png",
+            "PNG图像 (*.png);;JPEG图像 (*.jpg);;PDF文件 (*.pdf);;SVG图像 (*.svg)"
+        )
+        if not save_path:
+            return
+        try:
+            self.fig.savefig(save_path, dpi=self.save_dpi, bbox_inches='tight')
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"导出对比图失败: {str(e)}")
+            return
+        self.summary_label.setText(f"对比图已保存到: {save_path}")
+    
+    def closeEvent(self, event):
+        # 对话框保留以便再次打开，关闭时释放子图和渲染缓冲区（下次show_maps时重新创建）
+        self.comparison = None
+        release_figure(self.fig)
+        super().closeEvent(event)
+
+class SequenceDialog(QDialog):
+    """序列趋势分析：趋势曲线、斜率图和差值图，读取或追加新帧时只计算新帧并增量刷新"""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("序列趋势分析")
+        self.resize(1200, 760)
+        layout = QVBoxLayout(self)
+        self.summary_label = QLabel()
+        self.fig = Figure(figsize=(12, 7), dpi=100)
+        self.canvas = FigureCanvas(self.fig)
+        self.trend = PRPDTrendFigure(fig=self.fig)
         
-        self.progress.emit(100)
-        self.status.emit("批处理完成")
+        # 差值图的帧选择
+        self.frame_slider = QSlider(Qt.Horizontal)
+        self.frame_slider.setEnabled(False)
+        self.frame_label = QLabel("-")
+        frame_layout = QHBoxLayout()
+        frame_layout.addWidget(QLabel("差值图帧:"))
+        frame_layout.addWidget(self.frame_slider, 1)
+        frame_layout.addWidget(self.frame_label)
+        
+        # 斜率窗口（0表示整个序列），修改后按已读取的帧重新计算，不重新读取文件
+        self.window_spinbox = QSpinBox()
+        self.window_spinbox.setRange(0, 100000)
+        self.window_spinbox.setSpecialValueText("整个序列")
+        self.window_spinbox.setSuffix(" 帧")
+        self.window_spinbox.setToolTip("趋势斜率只按最近的帧数计算")
+        self.append_button = QPushButton("追加文件...")
+        self.export_button = QPushButton("导出...")
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addWidget(QLabel("斜率窗口:"))
+        buttons_layout.addWidget(self.window_spinbox)
+        buttons_layout.addStretch(1)
+        buttons_layout.addWidget(self.append_button)
+        buttons_layout.addWidget(self.export_button)
+        
+        layout.addWidget(self.summary_label)
+        layout.addWidget(self.canvas, 1)
+        layout.addLayout(frame_layout)
+        layout.addLayout(buttons_layout)
+        
+        self.sequence = None
+        self.events = None
+        self.failed = []
+        self.load_thread = None
+        self.save_dpi = 300
+        self.frame_slider.valueChanged.connect(self.show_difference)
+        self.window_spinbox.valueChanged.connect(self.change_window)
+        self.append_button.clicked.connect(self.append_files)
+        self.export_button.clicked.connect(self.export)
+    
+    def start(self, file_list, events=None, save_dpi=300):
+        """开始分析新的序列（文件按编号排序）"""
+        self.stop_loading()
+        if self.sequence is not None:
+            self.sequence.close()
+        self.sequence = PRPDSequence(self.window_spinbox.value() or None)
+        self.events = events
+        self.save_dpi = save_dpi
+        self.failed = []
+        self.frame_slider.setEnabled(False)
+        self.load(sort_series(file_list))
+    
+    def load(self, file_list):
+        """在后台按顺序读取文件并追加到序列末尾"""
+        self.stop_loading()
+        self.set_loading(True)
+        self.summary_label.setText(f"正在读取{len(file_list)}个文件...")
+        self.load_thread = SequenceLoadThread(file_list, self.events)
+        self.load_thread.batch_loaded.connect(self.add_batch)
+        self.load_thread.finished.connect(lambda: self.set_loading(False))
+        self.load_thread.start()
+    
+    def set_loading(self, loading):
+        """读取期间不能追加文件和修改斜率窗口"""
+        self.append_button.setEnabled(not loading)
+        self.window_spinbox.setEnabled(not loading)
+    
+    def stop_loading(self):
+        """停止正在进行的读取"""
+        if self.load_thread is not None and self.load_thread.isRunning():
+            self.load_thread.stop()
+            self.load_thread.wait()
+    
+    def add_batch(self, names, frames, failed):
+        """追加一批帧并增量刷新（差值图停在最新一帧时跟随新帧）"""
+        if self.sender() is not self.load_thread:
+            return  # 已停止的读取线程在停止前发出的信号
+        self.failed.extend(failed)
+        if names:
+            try:
+                self.sequence.extend(frames, names)
+            except ValueError as e:
+                self.failed.extend((file_path, str(e)) for file_path in names)
+        self.refresh()
+    
+    def refresh(self):
+        """按序列当前的帧刷新图形、帧选择和摘要"""
+        count = len(self.sequence) if self.sequence is not None else 0
+        if count == 0:
+            self.summary_label.setText("没有可分析的帧")
+            return
+        slider = self.frame_slider
+        follow = not slider.isEnabled() or slider.value() == slider.maximum()
+        slider.blockSignals(True)
+        slider.setRange(0, count - 1)
+        if follow:
+            slider.setValue(count - 1)
+        slider.setEnabled(True)
+        slider.blockSignals(False)
+        self.trend.update(self.sequence, slider.value())
+        self.update_frame_label()
+        self.canvas.draw_idle()
+        changes = self.sequence.change_points(self.trend.threshold)
+        summary = f"{count}帧，形状{self.sequence.shape}"
+        if self.sequence.is_mapped:
+            summary += "（内存映射）"
+        if len(changes):
+            summary += "，突变帧: " + "、".join(
+                os.path.basename(self.sequence.files[i]) for i in changes[:10])
+        if self.failed:
+            summary += f"，跳过{len(self.failed)}个文件"
+        self.summary_label.setText(summary)
+    
+    def show_difference(self, index):
+        """显示所选帧与前一帧的差值图"""
+        if self.sequence is None or not len(self.sequence):
+            return
+        self.trend.show_difference(self.sequence, index)
+        self.update_frame_label()
+        self.canvas.draw_idle()
+    
+    def update_frame_label(self):
+        index = self.frame_slider.value()
+        self.frame_label.setText(f"{index + 1}/{len(self.sequence)} "
+                                 f"{os.path.basename(self.sequence.files[index])}")
+    
+    def change_window(self, window):
+        """修改斜率窗口，按已读取的帧一次重新计算"""
+        if self.sequence is None:
+            return
+        old = self.sequence
+        self.sequence = PRPDSequence(window or None).extend(old.frames, old.files)
+        old.close()
+        self.refresh()
+    
+    def append_files(self):
+        """追加之后采集的文件（只计算新帧）"""
+        file_paths, _ = QFileDialog.getOpenFileNames(
+            self, "追加到序列", "", "PRPD文件 (*.csv);;所有文件 (*)"
+        )
+        if file_paths:
+            self.load(sort_series(file_paths))
+    
+    def export(self):
+        """导出趋势图或逐帧趋势表（按扩展名）"""
+        if self.sequence is None or not len(self.sequence):
+            return
+        save_path, _ = QFileDialog.getSaveFileName(
+            self, "导出序列分析", "PRPD趋势.png",
+            "PNG图像 (*.png);;PDF文件 (*.pdf);;SVG图像 (*.svg);;趋势表 (*.csv)"
+        )
+        if not save_path:
+            return
+        try:
+            if save_path.lower().endswith('.csv'):
+                write_trend_csv(save_path, self.sequence, self.trend.rolling, self.trend.threshold)
+            else:
+                self.fig.savefig(save_path, dpi=self.save_dpi, bbox_inches='tight')
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"导出失败: {str(e)}")
+            return
+        self.summary_label.setText(f"已导出到: {save_path}")
+    
+    def closeEvent(self, event):
+        # 释放序列的帧数组（或内存映射的临时文件）和渲染缓冲区，下次start时重新读取
+        self.stop_loading()
+        self.load_thread = None
+        if self.sequence is not None:
+            self.sequence.close()
+            self.sequence = None
+        release_canvas_buffer(self.fig)
+        super().closeEvent(event)
 
 class MatplotlibCanvas(FigureCanvas):
     """用于在Qt中嵌入Matplotlib的画布类"""
@@ -105,22 +831,185 @@ class MatplotlibCanvas(FigureCanvas):
             self.axes = self.fig.add_subplot(111)
         super(MatplotlibCanvas, self).__init__(self.fig)
 
+class PRPD2DCanvas(MatplotlibCanvas):
+    """持久的2D PRPD画布，切换文件或颜色方案时只原地更新图像数据、颜色映射和颜色范围"""
+    def __init__(self, parent=None):
+        super().__init__(parent, width=10, height=6, dpi=100, is_3d=False)
+        self.img = self.axes.imshow(np.zeros((2, 2)), origin='lower',
+                                    extent=[0, 360, 0, 100], aspect='auto')
+        self.axes.set_title('2D PRPD图')
+        self.axes.set_xlabel('相位 (°)')
+        self.axes.set_ylabel('电压 (%)')
+        
+        # 设置刻度
+        self.axes.set_xticks(np.arange(0, 361, 90))  # 每90度一个刻度
+        self.axes.set_yticks(np.arange(0, 101, 25))  # 每25%一个刻度
+        
+        # 创建colorbar（随图像的颜色映射和范围自动更新）
+        self.cbar = self.fig.colorbar(self.img, ax=self.axes)
+        
+        # 按较宽的colorbar刻度标签只调整一次布局
+        self.img.set_clim(*PRPDRenderTemplate.RESERVED_CLIM)
+        self.fig.tight_layout()
+    
+    def update_plot(self, prepared, cmap):
+        """更新图像"""
+        self.img.set_data(prepared['data'])
+        self.img.set_cmap(cmap)
+        self.img.set_clim(*prepared['clim'])
+        self.draw_idle()
+
+class PRPD3DCanvas(MatplotlibCanvas):
+    """持久的3D PRPD画布，只替换曲面多边形、颜色值和坐标范围，保留当前视角"""
+    def __init__(self, parent=None):
+        super().__init__(parent, width=10, height=6, dpi=100, is_3d=True)
+        self.surface = Poly3DCollection(np.empty((0, 4, 3)), linewidth=0, antialiased=False)
+        self.surface.set_array(np.empty(0))
+        self.axes.add_collection3d(self.surface, autolim=False)
+        self.axes.set_title('3D PRPD图')
+        self.axes.set_xlabel('相位 (°)')
+        self.axes.set_ylabel('电压 (%)')
+        self.axes.set_zlabel('幅值')
+        
+        # 设置视角
+        self.axes.view_init(elev=30, azim=45)
+        
+        # 创建colorbar，并按较宽的刻度标签只调整一次布局
+        self.surface.set_clim(*PRPDRenderTemplate.RESERVED_CLIM)
+        self.cbar = self.fig.colorbar(self.surface, ax=self.axes, shrink=0.5, aspect=5)
+        self.axes.auto_scale_xyz([0, 360], [0, 100], list(PRPDRenderTemplate.RESERVED_CLIM),
+                                 had_data=False)
+        self.fig.tight_layout()
+    
+    def update_plot(self, prepared, cmap):
+        """更新曲面"""
+        self.surface.set_verts(prepared['polys'])
+        self.surface.set_array(prepared['avg_z'])
+        self.surface.set_cmap(cmap)
+        if prepared['clim'] is not None:
+            self.surface.set_clim(*prepared['clim'])
+        auto_scale_surface(self.axes, prepared['data'])
+        self.draw_idle()
+
+class PlotPrepareThread(QThread):
+    """在后台准备绘图数据（颜色范围、3D曲面多边形）的线程
+
+    新请求覆盖尚未开始处理的旧请求，连续修改设置时只处理最新的一次。
+    """
+    prepared = Signal(int, object)  # 请求编号, 绘图数据
+    failed = Signal(int, str)
+    
+    def __init__(self):
+        super().__init__()
+        self._condition = threading.Condition()
+        self._request = None
+        self._stopped = False
+    
+    def submit(self, request_id, view_mode, data, surface_count, cache_key=None, preprocess=None):
+        """提交绘图请求，cache_key随结果返回，用于写入内存缓存"""
+        with self._condition:
+            self._request = (request_id, view_mode, data, surface_count, cache_key, preprocess)
+            self._condition.notify()
+    
+    def stop(self):
+        """停止线程"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+    
+    def run(self):
+        while True:
+            with self._condition:
+                while self._request is None and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                request, self._request = self._request, None
+            request_id, view_mode, data, surface_count, cache_key, preprocess = request
+            try:
+                prepared = self.prepare(view_mode, data, surface_count, preprocess)
+                prepared['cache_key'] = cache_key
+                self.prepared.emit(request_id, prepared)
+            except Exception as e:
+                self.failed.emit(request_id, str(e))
+    
+    def prepare(self, view_mode, data, surface_count, preprocess=None):
+        """计算绘图所需的数据（preprocess不为None时先预处理）"""
+        if preprocess is not None:
+            data = preprocess_maps(data, preprocess)
+        clim = color_limits(preprocess)
+        if view_mode == "2D":
+            return {'view_mode': view_mode, 'data': data, 'preprocess': preprocess,
+                    'clim': data_limits(data, clim)}
+        # 向量化生成曲面，网格数越小旋转越流畅
+        polys, avg_z = surface_polygons(data, surface_count, surface_count)
+        if clim is None and len(avg_z):
+            clim = data_limits(avg_z)
+        return {'view_mode': view_mode, 'data': data, 'preprocess': preprocess,
+                'polys': polys, 'avg_z': avg_z, 'clim': clim}
+
+# 保留的首帧耗时记录数（长时间运行时不持续增长）
+FIRST_PIXEL_HISTORY = 100
+
+@functools.lru_cache(maxsize=16)
+def scheme_colormap(colors):
+    """颜色方案（颜色元组）的颜色映射，同一方案复用同一对象，不在每次绘图时新建"""
+    return LinearSegmentedColormap.from_list('custom', colors)
+
 class PRPDVisualizer(QMainWindow):
     """PRPD数据可视化工具的主窗口"""
     def __init__(self):
         super().__init__()
         self.current_file = None
         self.canvas = None
-        self.current_df = None
+        self.displayed_plot = None  # 当前画布显示的绘图数据（预处理后的矩阵和颜色范围）
+        self.current_data = None
+        self.events_file = None  # 当前显示的原始脉冲事件文件
+        self.accumulator = None  # 长时记录的累积状态
+        self.stream_thread = None
         self.view_mode = "2D"  # 默认为2D视图
         self.batch_files = []  # 批处理文件列表
+        self.batch_file_set = set()  # 用于快速判断文件是否已在列表中
+        self.batch_thread = None
+        self.feature_thread = None
+        self.contact_thread = None
+        self.watch_thread = None
+        self.compare_thread = None
+        self.compare_dialog = None
+        self.sequence_dialog = None
+        self.similarity_index = None  # 相似图谱索引（prpd_index.PRPDIndex）
+        self.similar_dialog = None
+        
+        # 持久画布（每种视图模式一个）和后台绘图数据准备
+        self.canvases = {}
+        self.plot_request_id = 0
+        self.plot_thread = PlotPrepareThread()
+        self.plot_thread.prepared.connect(self.show_prepared_plot)
+        self.plot_thread.failed.connect(self.plot_failed)
+        self.plot_thread.start()
+        
+        # 防抖：短时间内的多次绘图请求只提交最后一次
+        self.plot_timer = QTimer(self)
+        self.plot_timer.setSingleShot(True)
+        self.plot_timer.setInterval(30)
+        self.plot_timer.timeout.connect(self.submit_plot)
+        
+        # 解析后的矩阵和绘图数据的内存缓存（LRU，大小上限可设置）
+        self.memory_cache = LRUCache(256 * 2**20)
+        self.current_data_key = None  # 当前数据的缓存键，长时记录的累积结果不缓存
+        
+        # 首帧耗时记录: [(操作, 毫秒)]，只保留最近的FIRST_PIXEL_HISTORY条
+        self.first_pixel = None
+        self.first_pixel_times = deque(maxlen=FIRST_PIXEL_HISTORY)
         
         # 预定义颜色方案
-        self.color_schemes = {
-            "默认方案": ['#000000', '#FFFFFE', '#FFFF13', '#FF0000'],
-            "蓝绿红": ['#0000FF', '#00FFFF', '#00FF00', '#FF0000'],
-            "黑蓝紫": ['#000000', '#0000FF', '#800080', '#FF00FF'],
-            "绿黄红": ['#006400', '#7FFF00', '#FFFF00', '#FF0000']
+        self.color_schemes = dict(COLOR_SCHEMES)
+        
+        # 渲染方式（对应prpd_core.RENDER_MODES）
+        self.render_modes = {
+            "figure": "标准（Matplotlib）",
+            "template": "复用图形模板",
+            "raster": "快速栅格（仅2D）",
         }
         
         self.initUI()
@@ -144,13 +1033,14 @@ class PRPDVisualizer(QMainWindow):
         self.single_tab = QWidget()
         self.createSingleFileTab()
         
-        # 创建批处理选项卡
+        # 创建批处理选项卡（其中的控件和缩略图线程在第一次切换到该选项卡时才创建）
         self.batch_tab = QWidget()
-        self.createBatchTab()
+        self.batch_tab_created = False
         
         # 添加选项卡
         self.tabs.addTab(self.single_tab, "单文件处理")
         self.tabs.addTab(self.batch_tab, "批量处理")
+        self.tabs.currentChanged.connect(self.tab_changed)
         
         # 将选项卡添加到主布局
         main_layout.addWidget(self.tabs)
@@ -164,6 +1054,22 @@ class PRPDVisualizer(QMainWindow):
         self.progress_bar = QProgressBar()
         self.progress_bar.setVisible(False)
         self.statusBar.addPermanentWidget(self.progress_bar)
+        
+        # 创建内存缓存统计标签
+        self.cache_label = QLabel()
+        self.statusBar.addPermanentWidget(self.cache_label)
+        self.update_cache_label()
+    
+    def tab_changed(self, index):
+        """切换选项卡"""
+        if self.tabs.widget(index) is self.batch_tab:
+            self.ensure_batch_tab()
+    
+    def ensure_batch_tab(self):
+        """创建批处理选项卡的控件（只创建一次）"""
+        if not self.batch_tab_created:
+            self.batch_tab_created = True
+            self.createBatchTab()
     
     def createSingleFileTab(self):
         """创建单文件处理选项卡"""
@@ -178,12 +1084,19 @@ class PRPDVisualizer(QMainWindow):
         
         # 创建按钮
         self.open_button = QPushButton("打开PRPD文件")
+        self.open_record_button = QPushButton("打开长时记录")
+        self.open_events_button = QPushButton("导入脉冲事件")
         self.save_button = QPushButton("保存图像")
         self.save_button.setEnabled(False)  # 初始禁用保存按钮
+        self.find_similar_button = QPushButton("查找相似")
+        self.find_similar_button.setEnabled(False)
         
         # 添加按钮到布局
         button_layout.addWidget(self.open_button)
+        button_layout.addWidget(self.open_record_button)
+        button_layout.addWidget(self.open_events_button)
         button_layout.addWidget(self.save_button)
+        button_layout.addWidget(self.find_similar_button)
         button_group.setLayout(button_layout)
         
         # 创建参数设置组
@@ -212,10 +1125,43 @@ class PRPDVisualizer(QMainWindow):
         self.dpi_spinbox.setValue(300)
         self.dpi_spinbox.setSingleStep(50)
         
+        # 创建3D网格数设置（细节级别）
+        self.surface_count_spinbox = self.create_surface_count_spinbox()
+        
+        # 创建内存缓存大小设置
+        self.cache_size_spinbox = QSpinBox()
+        self.cache_size_spinbox.setRange(0, 8192)
+        self.cache_size_spinbox.setValue(256)
+        self.cache_size_spinbox.setSingleStep(64)
+        self.cache_size_spinbox.setSuffix(" MB")
+        self.cache_size_spinbox.setToolTip("缓存解析后的矩阵和绘图数据，切换视图和文件时无需重新计算，0表示不缓存")
+        
+        # 创建快速栅格导出选项（仅对2D视图有效）
+        self.raster_save_checkbox = QCheckBox("快速栅格导出（仅2D）")
+        
+        # 创建累积方式选择（仅对长时记录有效）
+        self.accumulate_stat_combo = QComboBox()
+        for stat, label in ACCUMULATE_STATS.items():
+            self.accumulate_stat_combo.addItem(label, stat)
+        
         # 添加参数控件到布局
         param_layout.addRow("视图模式:", view_mode_layout)
         param_layout.addRow("颜色方案:", self.color_scheme_combo)
         param_layout.addRow("保存DPI:", self.dpi_spinbox)
+        param_layout.addRow("3D网格数:", self.surface_count_spinbox)
+        param_layout.addRow("累积方式:", self.accumulate_stat_combo)
+        param_layout.addRow("内存缓存:", self.cache_size_spinbox)
+        
+        # 创建脉冲事件分箱设置
+        self.phase_bins_spinbox, self.amp_bins_spinbox, self.frequency_spinbox = \
+            self.create_event_binning_widgets()
+        param_layout.addRow("事件分箱(相位×幅值):",
+                            self.create_bins_layout(self.phase_bins_spinbox, self.amp_bins_spinbox))
+        param_layout.addRow("事件工频:", self.frequency_spinbox)
+        
+        # 创建预处理设置（单个文件没有统一颜色范围）
+        self.preprocess_widgets = self.create_preprocess_widgets(param_layout)
+        param_layout.addRow(self.raster_save_checkbox)
         
         # 创建应用按钮
         self.apply_button = QPushButton("应用设置")
@@ -243,9 +1189,106 @@ class PRPDVisualizer(QMainWindow):
         
         # 连接信号和槽
         self.open_button.clicked.connect(self.open_file)
+        self.open_record_button.clicked.connect(self.open_record)
+        self.open_events_button.clicked.connect(self.open_events)
         self.save_button.clicked.connect(self.save_image)
+        self.find_similar_button.clicked.connect(self.find_similar)
         self.apply_button.clicked.connect(self.apply_settings)
         self.view_mode_group.buttonClicked.connect(self.change_view_mode)
+        self.cache_size_spinbox.valueChanged.connect(self.resize_memory_cache)
+    
+    def create_surface_count_spinbox(self):
+        """创建3D曲面网格数（细节级别）设置框"""
+        spinbox = QSpinBox()
+        spinbox.setRange(5, 200)
+        spinbox.setValue(SURFACE_COUNT)
+        spinbox.setSingleStep(5)
+        spinbox.setToolTip("3D曲面每个方向的最大网格数，越小渲染和旋转越快")
+        return spinbox
+    
+    def create_event_binning_widgets(self):
+        """创建脉冲事件分箱设置框（相位分箱数、幅值分箱数、工频）"""
+        phase_bins = QSpinBox()
+        phase_bins.setRange(8, 3600)
+        phase_bins.setValue(PHASE_BINS)
+        amp_bins = QSpinBox()
+        amp_bins.setRange(8, 4096)
+        amp_bins.setValue(AMP_BINS)
+        frequency = QSpinBox()
+        frequency.setRange(0, 1000)
+        frequency.setSuffix(" Hz")
+        frequency.setSpecialValueText("第一列为相位")
+        frequency.setToolTip("脉冲事件第一列为时间戳（秒）时，按此工频换算相位")
+        return phase_bins, amp_bins, frequency
+    
+    def create_bins_layout(self, phase_bins, amp_bins):
+        """将相位和幅值分箱数设置框排成一行"""
+        bins_layout = QHBoxLayout()
+        bins_layout.addWidget(phase_bins)
+        bins_layout.addWidget(QLabel("×"))
+        bins_layout.addWidget(amp_bins)
+        return bins_layout
+    
+    def get_event_binning(self, phase_bins, amp_bins, frequency):
+        """根据设置框生成分箱参数"""
+        return EventBinning(phase_bins.value(), amp_bins.value(),
+                            frequency=frequency.value() or None)
+    
+    def create_preprocess_widgets(self, form_layout, allow_global=False):
+        """创建预处理设置控件并添加到表单布局，返回控件字典"""
+        threshold = QDoubleSpinBox()
+        threshold.setRange(0, 1e9)
+        threshold.setDecimals(1)
+        threshold.setSpecialValueText("不处理")
+        threshold.setToolTip("低于该值的计数置为0")
+        median = QSpinBox()
+        median.setRange(1, 9)
+        median.setSingleStep(2)
+        median.setPrefix("中值")
+        median.setSpecialValueText("不中值滤波")
+        median.setToolTip("中值滤波窗口大小（奇数），去除孤立的噪声点")
+        sigma = QDoubleSpinBox()
+        sigma.setRange(0, 10)
+        sigma.setSingleStep(0.5)
+        sigma.setPrefix("σ ")
+        sigma.setSpecialValueText("不平滑")
+        sigma.setToolTip("高斯平滑的标准差（单元格数）")
+        log_scale = QCheckBox("对数")
+        log_scale.setToolTip("显示log10(1+值)")
+        normalize = QComboBox()
+        for mode, label in NORMALIZE_MODES.items():
+            if mode != "global" or allow_global:
+                normalize.addItem(label, mode)
+        vmin = QDoubleSpinBox()
+        vmax = QDoubleSpinBox()
+        for spinbox, value in ((vmin, 0), (vmax, 1000)):
+            spinbox.setRange(-1e9, 1e9)
+            spinbox.setDecimals(1)
+            spinbox.setValue(value)
+            spinbox.setEnabled(False)
+        normalize.currentIndexChanged.connect(
+            lambda: [w.setEnabled(normalize.currentData() == "fixed") for w in (vmin, vmax)])
+        
+        filter_layout = QHBoxLayout()
+        for widget in (threshold, median, sigma):
+            filter_layout.addWidget(widget)
+        clim_layout = QHBoxLayout()
+        for widget in (log_scale, normalize, vmin, QLabel("~"), vmax):
+            clim_layout.addWidget(widget)
+        form_layout.addRow("降噪(阈值/滤波):", filter_layout)
+        form_layout.addRow("颜色范围:", clim_layout)
+        return {'threshold': threshold, 'median': median, 'sigma': sigma, 'log': log_scale,
+                'normalize': normalize, 'vmin': vmin, 'vmax': vmax}
+    
+    def get_preprocess(self, widgets):
+        """根据预处理设置控件生成参数，不做任何处理时返回None"""
+        normalize = widgets['normalize'].currentData()
+        fixed = normalize == "fixed"
+        params = Preprocess(widgets['threshold'].value(), widgets['median'].value() | 1,
+                            widgets['sigma'].value(), widgets['log'].isChecked(), normalize,
+                            widgets['vmin'].value() if fixed else None,
+                            widgets['vmax'].value() if fixed else None)
+        return None if params == Preprocess() else params
     
     def createBatchTab(self):
         """创建批处理选项卡"""
@@ -258,14 +1301,30 @@ class PRPDVisualizer(QMainWindow):
         file_group = QGroupBox("文件列表")
         file_layout = QVBoxLayout()
         
-        # 创建文件列表
-        self.file_list = QListWidget()
+        # 创建文件列表（缩略图画廊，只绘制可见的行，缩略图在后台生成）
+        self.thumbnail_loader = ThumbnailLoader()
+        self.batch_file_model = BatchFileModel(self.thumbnail_loader,
+                                               next(iter(self.color_schemes.values())), self)
+        self.file_list = QListView()
+        self.file_list.setViewMode(QListView.IconMode)
+        self.file_list.setIconSize(QSize(*THUMBNAIL_SIZE))
+        self.file_list.setGridSize(QSize(THUMBNAIL_SIZE[0] + 24, THUMBNAIL_SIZE[1] + 32))
+        self.file_list.setUniformItemSizes(True)
+        self.file_list.setResizeMode(QListView.Adjust)
+        self.file_list.setMovement(QListView.Static)
+        self.file_list.setLayoutMode(QListView.Batched)
+        self.file_list.setBatchSize(500)
+        self.file_list.setTextElideMode(Qt.ElideMiddle)
+        self.file_list.setSelectionMode(QListView.ExtendedSelection)
+        self.file_list.setModel(self.batch_file_model)
         
         # 创建文件操作按钮
         file_buttons_layout = QHBoxLayout()
         self.add_files_button = QPushButton("添加文件")
+        self.add_dir_button = QPushButton("添加目录")
         self.clear_files_button = QPushButton("清空列表")
         file_buttons_layout.addWidget(self.add_files_button)
+        file_buttons_layout.addWidget(self.add_dir_button)
         file_buttons_layout.addWidget(self.clear_files_button)
         
         # 添加到文件列表布局
@@ -299,6 +1358,28 @@ class PRPDVisualizer(QMainWindow):
         self.batch_dpi_spinbox.setValue(300)
         self.batch_dpi_spinbox.setSingleStep(50)
         
+        # 创建并行进程数设置（1表示不使用进程池）
+        self.batch_workers_spinbox = QSpinBox()
+        self.batch_workers_spinbox.setRange(1, os.cpu_count() or 1)
+        self.batch_workers_spinbox.setValue(1)
+        
+        # 创建批处理3D网格数设置
+        self.batch_surface_count_spinbox = self.create_surface_count_spinbox()
+        
+        # 创建渲染方式选择
+        self.batch_render_mode_combo = QComboBox()
+        for mode, label in self.render_modes.items():
+            self.batch_render_mode_combo.addItem(label, mode)
+        
+        # 创建脉冲事件输入选项
+        self.batch_events_checkbox = QCheckBox("输入为原始脉冲事件")
+        (self.batch_phase_bins_spinbox, self.batch_amp_bins_spinbox,
+         self.batch_frequency_spinbox) = self.create_event_binning_widgets()
+        
+        # 创建跳过未变化文件选项（基于输出目录中的任务清单）
+        self.batch_skip_current_checkbox = QCheckBox("跳过未变化的文件（可从中断处继续）")
+        self.batch_skip_current_checkbox.setChecked(True)
+        
         # 创建输出目录选择
         self.output_dir_label = QLabel("未选择输出目录")
         self.select_output_dir_button = QPushButton("选择输出目录")
@@ -310,12 +1391,58 @@ class PRPDVisualizer(QMainWindow):
         batch_settings_layout.addRow("视图模式:", batch_view_mode_layout)
         batch_settings_layout.addRow("颜色方案:", self.batch_color_scheme_combo)
         batch_settings_layout.addRow("保存DPI:", self.batch_dpi_spinbox)
+        batch_settings_layout.addRow("并行进程数:", self.batch_workers_spinbox)
+        batch_settings_layout.addRow("3D网格数:", self.batch_surface_count_spinbox)
+        batch_settings_layout.addRow("渲染方式:", self.batch_render_mode_combo)
+        batch_settings_layout.addRow(self.batch_events_checkbox)
+        batch_settings_layout.addRow("事件分箱(相位×幅值):",
+                                     self.create_bins_layout(self.batch_phase_bins_spinbox,
+                                                             self.batch_amp_bins_spinbox))
+        batch_settings_layout.addRow("事件工频:", self.batch_frequency_spinbox)
+        self.batch_preprocess_widgets = self.create_preprocess_widgets(batch_settings_layout,
+                                                                       allow_global=True)
         batch_settings_layout.addRow("输出目录:", output_dir_layout)
+        batch_settings_layout.addRow(self.batch_skip_current_checkbox)
         
-        # 创建开始批处理按钮
+        # 统计特征的相位窗口数
+        self.batch_feature_windows_spinbox = QSpinBox()
+        self.batch_feature_windows_spinbox.setRange(1, 64)
+        self.batch_feature_windows_spinbox.setValue(PHASE_WINDOWS)
+        batch_settings_layout.addRow("特征相位窗口数:", self.batch_feature_windows_spinbox)
+        
+        # 创建开始和取消批处理按钮
         self.start_batch_button = QPushButton("开始批处理")
         self.start_batch_button.setEnabled(False)
-        batch_settings_layout.addRow(self.start_batch_button)
+        self.cancel_batch_button = QPushButton("取消")
+        self.cancel_batch_button.setEnabled(False)
+        batch_buttons_layout = QHBoxLayout()
+        batch_buttons_layout.addWidget(self.start_batch_button, 1)
+        batch_buttons_layout.addWidget(self.cancel_batch_button)
+        self.export_features_button = QPushButton("导出特征表")
+        self.export_features_button.setEnabled(False)
+        batch_buttons_layout.addWidget(self.export_features_button)
+        batch_settings_layout.addRow(batch_buttons_layout)
+        
+        # 创建监视目录按钮（新增或修改的文件写入完成后自动渲染到输出目录）
+        self.watch_button = QPushButton("监视目录...")
+        self.watch_button.setCheckable(True)
+        self.watch_button.setEnabled(False)
+        batch_settings_layout.addRow(self.watch_button)
+        
+        # 创建多图谱对比按钮（对比所选文件，或将所有文件按页导出为对比总览图）
+        self.compare_button = QPushButton("对比所选")
+        self.compare_button.setEnabled(False)
+        self.contact_sheet_button = QPushButton("导出对比总览图")
+        self.contact_sheet_button.setEnabled(False)
+        compare_buttons_layout = QHBoxLayout()
+        compare_buttons_layout.addWidget(self.compare_button)
+        compare_buttons_layout.addWidget(self.contact_sheet_button)
+        
+        # 创建序列分析按钮（按编号排序的文件视为时间序列，分析趋势和相邻帧的变化）
+        self.sequence_button = QPushButton("序列分析")
+        self.sequence_button.setEnabled(False)
+        compare_buttons_layout.addWidget(self.sequence_button)
+        batch_settings_layout.addRow(compare_buttons_layout)
         
         batch_settings_group.setLayout(batch_settings_layout)
         
@@ -323,45 +1450,266 @@ class PRPDVisualizer(QMainWindow):
         top_layout.addWidget(file_group)
         top_layout.addWidget(batch_settings_group)
         
+        # 创建运行统计组（批处理进行中定时刷新）
+        batch_stats_group = QGroupBox("运行统计")
+        batch_stats_layout = QFormLayout()
+        self.batch_stats_labels = {}
+        for key, label in (("done", "完成/失败:"), ("rate", "吞吐量:"), ("eta", "预计剩余:"),
+                           ("latency", "单文件耗时:"), ("arrival", "端到端延迟:"),
+                           ("stages", "各阶段平均:"),
+                           ("memory", "峰值内存:"), ("slowest", "最慢文件:")):
+            self.batch_stats_labels[key] = QLabel("-")
+            self.batch_stats_labels[key].setTextInteractionFlags(Qt.TextSelectableByMouse)
+            batch_stats_layout.addRow(label, self.batch_stats_labels[key])
+        batch_stats_group.setLayout(batch_stats_layout)
+        
         # 创建批处理结果标签
         self.batch_result_label = QLabel("未开始批处理")
         
         # 将组件添加到布局
         layout.addLayout(top_layout)
+        layout.addWidget(batch_stats_group)
         layout.addWidget(self.batch_result_label)
         
         # 连接信号和槽
         self.add_files_button.clicked.connect(self.add_batch_files)
+        self.add_dir_button.clicked.connect(self.add_batch_dir)
         self.clear_files_button.clicked.connect(self.clear_batch_files)
+        
+        # 缩略图随批处理颜色方案和脉冲事件设置更新
+        self.batch_color_scheme_combo.currentTextChanged.connect(self.update_thumbnail_params)
+        self.batch_events_checkbox.toggled.connect(self.update_thumbnail_params)
+        for spinbox in (self.batch_phase_bins_spinbox, self.batch_amp_bins_spinbox,
+                        self.batch_frequency_spinbox):
+            spinbox.valueChanged.connect(self.update_thumbnail_params)
         self.select_output_dir_button.clicked.connect(self.select_output_dir)
         self.start_batch_button.clicked.connect(self.start_batch_process)
+        self.cancel_batch_button.clicked.connect(self.cancel_batch_process)
+        self.export_features_button.clicked.connect(self.export_features)
+        self.compare_button.clicked.connect(self.compare_selected)
+        self.contact_sheet_button.clicked.connect(self.export_contact_sheets)
+        self.sequence_button.clicked.connect(self.analyze_sequence)
+        self.watch_button.toggled.connect(self.toggle_watch)
     
     def open_file(self):
         """打开PRPD数据文件并显示"""
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "打开PRPD数据文件", "", "CSV文件 (*.csv);;所有文件 (*)"
+            self, "打开PRPD数据文件", "",
+            f"PRPD数据 (*.csv *{ARCHIVE_EXT});;CSV文件 (*.csv);;PRPD归档 (*{ARCHIVE_EXT});;所有文件 (*)"
         )
         
+        if file_path.endswith(ARCHIVE_EXT):
+            file_path = self.pick_archive_member(file_path)
         if file_path:
-            try:
-                self.current_file = file_path
-                self.file_info_label.setText(f"当前文件: {os.path.basename(file_path)}")
-                
-                # 读取数据
-                self.current_df = pd.read_csv(file_path, header=None)
-                
-                # 绘制图像
-                self.plot_prpd()
-                
-                # 启用按钮
-                self.save_button.setEnabled(True)
-                self.apply_button.setEnabled(True)
-                
-                # 更新状态栏
-                self.statusBar.showMessage(f"已加载文件: {os.path.basename(file_path)}")
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"无法加载文件: {str(e)}")
-                self.statusBar.showMessage("加载文件失败")
+            self.load_file(file_path)
+    
+    def pick_archive_member(self, archive_path):
+        """选择归档中的一个图谱，返回其成员路径（取消时返回None）"""
+        try:
+            archive = get_archive(archive_path)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "错误", f"无法打开归档: {str(e)}")
+            return None
+        if len(archive) == 0:
+            QMessageBox.warning(self, "警告", "归档中没有图谱")
+            return None
+        title = f"{os.path.basename(archive_path)}（{len(archive)}个图谱）"
+        if len(archive) <= ARCHIVE_PICK_LIMIT:
+            items = [f"{i}: [{archive.label(i)}] {archive.source(i)}" for i in range(len(archive))]
+            item, ok = QInputDialog.getItem(self, title, "选择图谱:", items, 0, False)
+            index = items.index(item) if ok else None
+        else:
+            index, ok = QInputDialog.getInt(self, title, "图谱序号:", 0, 0, len(archive) - 1)
+        return archive.member_path(index) if ok else None
+    
+    def load_file(self, file_path):
+        """加载并显示PRPD数据文件"""
+        try:
+            self.start_first_pixel_timer("打开文件")
+            self.stop_stream()
+            self.events_file = None
+            self.current_file = file_path
+            self.file_info_label.setText(f"当前文件: {os.path.basename(file_path)}")
+            
+            # 读取数据（经由内存缓存和二进制缓存）
+            self.set_current_data(self.load_matrix_cached(file_path))
+            
+            # 绘制图像
+            self.plot_prpd()
+            
+            # 启用按钮
+            self.save_button.setEnabled(True)
+            self.find_similar_button.setEnabled(True)
+            self.apply_button.setEnabled(True)
+            
+            # 更新状态栏
+            self.statusBar.showMessage(f"已加载文件: {os.path.basename(file_path)}")
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"无法加载文件: {str(e)}")
+            self.statusBar.showMessage("加载文件失败")
+    
+    def set_current_data(self, data):
+        """设置当前显示的PRPD矩阵"""
+        self.current_data = data
+    
+    def load_matrix_cached(self, file_path, binning=None):
+        """读取PRPD矩阵（binning不为None时由脉冲事件分箱），结果保存在内存缓存中"""
+        stat = stat_source(file_path)
+        key = ('matrix', os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, binning)
+        data = self.memory_cache.get(key)
+        if data is None:
+            if binning is None:
+                data = load_prpd_matrix(file_path)
+            else:
+                data = events_to_prpd(file_path, binning, workers=os.cpu_count() or 1)
+            self.memory_cache.put(key, data)
+        self.current_data_key = key
+        self.update_cache_label()
+        return data
+    
+    def resize_memory_cache(self, size_mb):
+        """修改内存缓存上限"""
+        self.memory_cache.resize(size_mb * 2**20)
+        self.update_cache_label()
+    
+    def update_cache_label(self):
+        """更新状态栏中的缓存统计"""
+        self.cache_label.setText(f"缓存: {self.memory_cache.summary()}")
+    
+    def open_record(self):
+        """打开多帧长时记录，在后台逐帧累积并刷新累积PRPD图"""
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "打开长时记录", "", "PRPD记录 (*.csv *.npy);;所有文件 (*)"
+        )
+        
+        if file_path:
+            self.stop_stream()
+            self.events_file = None
+            self.current_file = file_path
+            self.current_data = None
+            self.accumulator = None
+            self.file_info_label.setText(f"当前记录: {os.path.basename(file_path)}")
+            self.statusBar.showMessage(f"正在读取记录: {os.path.basename(file_path)}")
+            
+            self.stream_thread = StreamAccumulateThread(file_path)
+            self.stream_thread.updated.connect(self.update_accumulated)
+            self.stream_thread.status.connect(self.statusBar.showMessage)
+            self.stream_thread.start()
+    
+    def open_events(self):
+        """导入原始脉冲事件文件，按当前分箱设置生成PRPD图"""
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "导入脉冲事件", "", "脉冲事件 (*.csv *.npy);;所有文件 (*)"
+        )
+        
+        if file_path:
+            self.stop_stream()
+            self.current_file = file_path
+            self.events_file = file_path
+            self.load_events()
+    
+    def load_events(self):
+        """对当前脉冲事件文件分箱并绘制"""
+        binning = self.get_event_binning(self.phase_bins_spinbox, self.amp_bins_spinbox,
+                                         self.frequency_spinbox)
+        try:
+            hits = self.memory_cache.hits
+            start = time.perf_counter()
+            data = self.load_matrix_cached(self.events_file, binning)
+            elapsed = time.perf_counter() - start
+            cached = self.memory_cache.hits > hits
+            
+            self.set_current_data(data)
+            self.file_info_label.setText(
+                f"当前脉冲事件: {os.path.basename(self.events_file)}"
+                f"（{int(data.sum())}个事件，{binning.phase_bins}×{binning.amp_bins}分箱）")
+            self.plot_prpd()
+            
+            # 启用按钮
+            self.save_button.setEnabled(True)
+            self.find_similar_button.setEnabled(True)
+            self.apply_button.setEnabled(True)
+            
+            if cached:
+                self.statusBar.showMessage(
+                    f"已导入脉冲事件: {os.path.basename(self.events_file)}（内存缓存）")
+            else:
+                self.statusBar.showMessage(
+                    f"已导入脉冲事件: {os.path.basename(self.events_file)}，"
+                    f"分箱耗时{elapsed:.2f}s（{data.sum() / max(elapsed, 1e-9):,.0f} 事件/秒）")
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"无法导入脉冲事件: {str(e)}")
+            self.statusBar.showMessage("导入脉冲事件失败")
+    
+    def stop_stream(self):
+        """停止正在进行的记录读取"""
+        if self.stream_thread is not None:
+            self.stream_thread.stop()
+            self.stream_thread.wait()
+            self.stream_thread = None
+        self.accumulator = None
+    
+    def update_accumulated(self, accumulator):
+        """收到新的累积快照时刷新显示"""
+        self.accumulator = accumulator
+        self.show_accumulated()
+        self.file_info_label.setText(
+            f"当前记录: {os.path.basename(self.current_file)}（已累积{accumulator.frame_count}帧）")
+        
+        # 启用按钮
+        self.save_button.setEnabled(True)
+        self.find_similar_button.setEnabled(True)
+        self.apply_button.setEnabled(True)
+    
+    def show_accumulated(self):
+        """按当前累积方式更新current_data并绘制"""
+        stat = self.accumulate_stat_combo.currentData()
+        self.set_current_data(self.accumulator.result(stat))
+        self.current_data_key = None
+        self.plot_prpd()
+    
+    def select_similarity_index(self):
+        """选择相似图谱索引目录，返回是否成功打开"""
+        index_dir = QFileDialog.getExistingDirectory(
+            self, "选择图谱索引目录（由prpd_index.py build创建）", "")
+        if not index_dir:
+            return False
+        try:
+            self.similarity_index = PRPDIndex(index_dir)
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"无法打开图谱索引: {str(e)}")
+            return False
+        return True
+    
+    def find_similar(self):
+        """在图谱索引中查找与当前PRPD图最相似的图谱"""
+        if self.current_data is None:
+            return
+        if self.similarity_index is None and not self.select_similarity_index():
+            return
+        try:
+            start = time.perf_counter()
+            matches = self.similarity_index.search_maps([self.current_data], SIMILAR_COUNT)[0]
+            elapsed = time.perf_counter() - start
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"查找相似图谱失败: {str(e)}")
+            return
+        
+        if self.similar_dialog is None:
+            self.similar_dialog = SimilarResultsDialog(self)
+            self.similar_dialog.open_requested.connect(self.load_file)
+            self.similar_dialog.change_index_button.clicked.connect(self.change_similarity_index)
+        summary = (f"{os.path.basename(self.current_file)}: 在{len(self.similarity_index)}个图谱中"
+                   f"查询耗时{elapsed * 1000:.1f}ms（余弦相似度）")
+        self.similar_dialog.show_results(matches, self.get_current_color_scheme(), summary)
+        self.similar_dialog.show()
+        self.similar_dialog.raise_()
+        self.statusBar.showMessage(summary)
+    
+    def change_similarity_index(self):
+        """更换图谱索引并重新查询"""
+        if self.select_similarity_index():
+            self.find_similar()
     
     def get_current_color_scheme(self):
         """获取当前选择的颜色方案"""
@@ -375,84 +1723,107 @@ class PRPDVisualizer(QMainWindow):
         else:
             self.view_mode = "3D"
         
-        if self.current_df is not None:
+        if self.current_data is not None:
+            self.start_first_pixel_timer(f"切换到{self.view_mode}视图")
             self.plot_prpd()
     
     def plot_prpd(self):
-        """绘制PRPD图"""
-        if self.current_df is None:
+        """请求绘制PRPD图（防抖后在后台准备数据，连续修改设置时只绘制最后一次）"""
+        if self.current_data is None:
             return
-            
+        self.plot_timer.start()
+    
+    def submit_plot(self):
+        """将当前数据和设置提交给后台线程"""
+        if self.current_data is None:
+            return
+        self.plot_request_id += 1
+        surface_count = self.surface_count_spinbox.value()
+        preprocess = self.get_preprocess(self.preprocess_widgets)
+        
+        # 绘图数据与颜色方案无关（颜色映射在更新画布时应用），按数据、视图模式、网格数和预处理参数缓存
+        cache_key = None
+        if self.current_data_key is not None:
+            cache_key = ('plot', self.current_data_key, self.view_mode,
+                         surface_count if self.view_mode == "3D" else None, preprocess)
+            prepared = self.memory_cache.get(cache_key)
+            self.update_cache_label()
+            if prepared is not None:
+                self.show_prepared_plot(self.plot_request_id, prepared)
+                return
+        self.plot_thread.submit(self.plot_request_id, self.view_mode, self.current_data,
+                                surface_count, cache_key, preprocess)
+    
+    def get_canvas(self, view_mode):
+        """获取（必要时创建）指定视图模式的持久画布"""
+        canvas = self.canvases.get(view_mode)
+        if canvas is None:
+            canvas = PRPD2DCanvas(self) if view_mode == "2D" else PRPD3DCanvas(self)
+            canvas.mpl_connect('draw_event', lambda event, c=canvas: self.canvas_drawn(c))
+            self.plot_container.addWidget(canvas)
+            self.canvases[view_mode] = canvas
+        return canvas
+    
+    def show_prepared_plot(self, request_id, prepared):
+        """后台数据准备完成后原地更新画布"""
+        if request_id != self.plot_request_id:
+            return  # 已有更新的请求
+        cache_key = prepared.get('cache_key')
+        if cache_key is not None and cache_key not in self.memory_cache:
+            # 未预处理时矩阵已在缓存中计入，不重复计算
+            shared = ('data',) if prepared['preprocess'] is None else ()
+            nbytes = estimate_nbytes({k: v for k, v in prepared.items() if k not in shared})
+            self.memory_cache.put(cache_key, prepared, nbytes)
+            self.update_cache_label()
         try:
-            # 清除之前的图像
-            for i in reversed(range(self.plot_container.count())): 
-                widget = self.plot_container.itemAt(i).widget()
-                if widget:
-                    widget.setParent(None)
-            
             # 获取当前颜色方案
-            colors = self.get_current_color_scheme()
-            custom_cmap = LinearSegmentedColormap.from_list('custom', colors)
-            
-            if self.view_mode == "2D":
-                # 创建2D画布
-                self.canvas = MatplotlibCanvas(self, width=10, height=6, dpi=100, is_3d=False)
-                
-                # 绘制2D图
-                img = self.canvas.axes.imshow(self.current_df.values, cmap=custom_cmap, origin='lower', 
-                            extent=[0, 360, 0, 100], aspect='auto')
-                self.canvas.axes.set_title('2D PRPD图')
-                self.canvas.axes.set_xlabel('相位 (°)')
-                self.canvas.axes.set_ylabel('电压 (%)')
-                
-                # 设置刻度
-                self.canvas.axes.set_xticks(np.arange(0, 361, 90))  # 每90度一个刻度
-                self.canvas.axes.set_yticks(np.arange(0, 101, 25))  # 每25%一个刻度
-                
-                # 创建colorbar
-                self.canvas.fig.colorbar(img, ax=self.canvas.axes)
-            else:
-                # 创建3D画布
-                self.canvas = MatplotlibCanvas(self, width=10, height=6, dpi=100, is_3d=True)
-                
-                # 准备3D数据
-                x = np.arange(0, 360, 360/self.current_df.shape[1])
-                y = np.arange(0, 100, 100/self.current_df.shape[0])
-                X, Y = np.meshgrid(x, y)
-                Z = self.current_df.values
-                
-                # 绘制3D图
-                surf = self.canvas.axes.plot_surface(X, Y, Z, cmap=custom_cmap, 
-                                                    linewidth=0, antialiased=False)
-                self.canvas.axes.set_title('3D PRPD图')
-                self.canvas.axes.set_xlabel('相位 (°)')
-                self.canvas.axes.set_ylabel('电压 (%)')
-                self.canvas.axes.set_zlabel('幅值')
-                
-                # 设置视角
-                self.canvas.axes.view_init(elev=30, azim=45)
-                
-                # 创建colorbar
-                self.canvas.fig.colorbar(surf, ax=self.canvas.axes, shrink=0.5, aspect=5)
-            
-            # 调整布局
-            self.canvas.fig.tight_layout()
+            custom_cmap = scheme_colormap(tuple(self.get_current_color_scheme()))
             
-            # 添加到界面
-            self.plot_container.addWidget(self.canvas)
+            view_mode = prepared['view_mode']
+            self.canvas = self.get_canvas(view_mode)
+            self.canvas.update_plot(prepared, custom_cmap)
+            self.displayed_plot = prepared
+            for mode, canvas in self.canvases.items():
+                canvas.setVisible(mode == view_mode)
+                if mode != view_mode:
+                    # 隐藏的画布保留图形对象以便切换回来时原地更新，只释放渲染缓冲区
+                    release_canvas_buffer(canvas.fig)
+            if self.first_pixel is not None:
+                self.first_pixel['canvas'] = self.canvas
             
             # 更新状态栏
-            self.statusBar.showMessage(f"已绘制{self.view_mode}图像")
-            
+            self.statusBar.showMessage(f"已绘制{view_mode}图像")
         except Exception as e:
-            QMessageBox.critical(self, "错误", f"绘图错误: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            self.statusBar.showMessage("绘图失败")
+            self.plot_failed(request_id, str(e))
+    
+    def plot_failed(self, request_id, message):
+        """绘图失败"""
+        if request_id != self.plot_request_id:
+            return
+        QMessageBox.critical(self, "错误", f"绘图错误: {message}")
+        self.statusBar.showMessage("绘图失败")
+    
+    def start_first_pixel_timer(self, action):
+        """开始记录从操作到画布首次绘制完成的时间"""
+        self.first_pixel = {'action': action, 'start': time.perf_counter(), 'canvas': None}
+    
+    def canvas_drawn(self, canvas):
+        """画布绘制完成，记录首帧耗时"""
+        if self.first_pixel is None or self.first_pixel['canvas'] is not canvas:
+            return
+        elapsed = (time.perf_counter() - self.first_pixel['start']) * 1000
+        self.first_pixel_times.append((self.first_pixel['action'], elapsed))
+        self.statusBar.showMessage(f"{self.first_pixel['action']}首帧耗时: {elapsed:.0f} ms")
+        self.first_pixel = None
     
     def apply_settings(self):
         """应用当前参数设置"""
-        if self.current_df is not None:
+        if self.accumulator is not None:
+            self.show_accumulated()
+        elif self.events_file is not None:
+            # 分箱设置可能已改变，重新分箱
+            self.load_events()
+        elif self.current_data is not None:
             self.plot_prpd()
     
     def save_image(self):
@@ -469,7 +1840,15 @@ class PRPDVisualizer(QMainWindow):
             try:
                 # 获取当前DPI设置
                 dpi = self.dpi_spinbox.value()
-                self.canvas.fig.savefig(save_path, dpi=dpi, bbox_inches='tight')
+                if self.view_mode == "2D" and self.raster_save_checkbox.isChecked():
+                    # 直接生成像素，不经过Matplotlib绘制
+                    # 使用画布当前显示的（预处理后的）矩阵和颜色范围
+                    # 渲染器按线程缓存，界面线程使用自己的实例，不与批处理线程共享
+                    renderer = get_raster_renderer(self.get_current_color_scheme(), dpi)
+                    renderer.save(self.displayed_plot['data'], save_path,
+                                  self.displayed_plot['clim'])
+                else:
+                    self.canvas.fig.savefig(save_path, dpi=dpi, bbox_inches='tight')
                 QMessageBox.information(self, "成功", f"图像已保存到: {save_path}")
                 self.statusBar.showMessage(f"图像已保存到: {save_path}")
             except Exception as e:
@@ -479,26 +1858,51 @@ class PRPDVisualizer(QMainWindow):
     def add_batch_files(self):
         """添加批处理文件"""
         file_paths, _ = QFileDialog.getOpenFileNames(
-            self, "选择PRPD数据文件", "", "CSV文件 (*.csv);;所有文件 (*)"
+            self, "选择PRPD数据文件", "",
+            f"PRPD数据 (*.csv *{ARCHIVE_EXT});;CSV文件 (*.csv);;PRPD归档 (*{ARCHIVE_EXT});;所有文件 (*)"
         )
         
         if file_paths:
-            self.batch_files.extend(file_paths)
-            self.update_batch_file_list()
-            self.check_batch_ready()
+            # 归档展开为其中的各个图谱
+            try:
+                file_paths = [member for file_path in file_paths
+                              for member in (get_archive(file_path).member_paths()
+                                             if file_path.endswith(ARCHIVE_EXT) else [file_path])]
+            except (OSError, ValueError) as e:
+                QMessageBox.critical(self, "错误", f"无法打开归档: {str(e)}")
+                return
+            self.append_batch_files(file_paths)
+    
+    def add_batch_dir(self):
+        """添加目录中的所有PRPD文件"""
+        dir_path = QFileDialog.getExistingDirectory(self, "选择PRPD数据目录", "")
+        
+        if dir_path:
+            self.append_batch_files(sorted(glob.glob(os.path.join(dir_path, '*.csv'))))
+    
+    def append_batch_files(self, file_paths):
+        """将文件追加到批处理列表（只向列表插入新行）"""
+        self.batch_files.extend(file_paths)
+        self.batch_file_set.update(file_paths)
+        self.batch_file_model.append_files(file_paths)
+        self.update_batch_file_list()
+        self.check_batch_ready()
     
     def clear_batch_files(self):
         """清空批处理文件列表"""
         self.batch_files = []
+        self.batch_file_set.clear()
+        self.batch_file_model.clear()
         self.update_batch_file_list()
         self.check_batch_ready()
     
+    def update_thumbnail_params(self, *args):
+        """按批处理颜色方案和脉冲事件设置更新缩略图"""
+        color_scheme = self.color_schemes[self.batch_color_scheme_combo.currentText()]
+        self.batch_file_model.set_thumbnail_params(color_scheme, self.get_batch_events())
+    
     def update_batch_file_list(self):
-        """更新批处理文件列表显示"""
-        self.file_list.clear()
-        for file_path in self.batch_files:
-            self.file_list.addItem(os.path.basename(file_path))
-        
+        """更新批处理文件列表状态"""
         # 更新状态栏
         self.statusBar.showMessage(f"批处理文件列表: {len(self.batch_files)}个文件")
     
@@ -516,6 +1920,11 @@ class PRPDVisualizer(QMainWindow):
         """检查批处理是否准备就绪"""
         is_ready = len(self.batch_files) > 0 and self.output_dir_label.text() != "未选择输出目录"
         self.start_batch_button.setEnabled(is_ready)
+        self.export_features_button.setEnabled(len(self.batch_files) > 0)
+        self.compare_button.setEnabled(len(self.batch_files) > 0)
+        self.contact_sheet_button.setEnabled(len(self.batch_files) > 0)
+        self.sequence_button.setEnabled(len(self.batch_files) > 0)
+        self.watch_button.setEnabled(self.output_dir_label.text() != "未选择输出目录")
     
     def start_batch_process(self):
         """开始批处理"""
@@ -524,6 +1933,11 @@ class PRPDVisualizer(QMainWindow):
         scheme_name = self.batch_color_scheme_combo.currentText()
         color_scheme = self.color_schemes[scheme_name]
         dpi = self.batch_dpi_spinbox.value()
+        workers = self.batch_workers_spinbox.value()
+        render_mode = self.batch_render_mode_combo.currentData()
+        surface_count = self.batch_surface_count_spinbox.value()
+        events = self.get_batch_events()
+        preprocess = self.get_preprocess(self.batch_preprocess_widgets)
         output_dir = self.output_dir_label.text()
         
         # 显示进度条
@@ -532,17 +1946,20 @@ class PRPDVisualizer(QMainWindow):
         
         # 创建并启动批处理线程
         self.batch_thread = BatchProcessThread(
-            self.batch_files, output_dir, color_scheme, dpi, view_mode
+            self.batch_files, output_dir, color_scheme, dpi, view_mode, workers, render_mode,
+            surface_count, events, self.batch_skip_current_checkbox.isChecked(), preprocess
         )
         
         # 连接信号
         self.batch_thread.progress.connect(self.update_batch_progress)
         self.batch_thread.status.connect(self.update_batch_status)
         self.batch_thread.finished_one.connect(self.batch_file_processed)
+        self.batch_thread.stats_updated.connect(self.update_batch_stats)
         self.batch_thread.finished.connect(self.batch_process_finished)
         
-        # 禁用开始按钮
+        # 禁用开始按钮，启用取消按钮
         self.start_batch_button.setEnabled(False)
+        self.cancel_batch_button.setEnabled(True)
         
         # 启动线程
         self.batch_thread.start()
@@ -550,6 +1967,157 @@ class PRPDVisualizer(QMainWindow):
         # 更新状态
         self.batch_result_label.setText("批处理进行中...")
     
+    def get_batch_events(self):
+        """返回批处理的脉冲事件分箱参数，输入不是脉冲事件时返回None"""
+        if not self.batch_events_checkbox.isChecked():
+            return None
+        return self.get_event_binning(self.batch_phase_bins_spinbox, self.batch_amp_bins_spinbox,
+                                      self.batch_frequency_spinbox)
+    
+    def export_features(self):
+        """提取批处理文件的统计特征并导出特征表"""
+        save_path, _ = QFileDialog.getSaveFileName(
+            self, "导出特征表", "PRPD特征.csv", "CSV文件 (*.csv);;Parquet文件 (*.parquet)"
+        )
+        if not save_path:
+            return
+        
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.feature_thread = FeatureExtractThread(
+            self.batch_files, save_path, self.get_batch_events(),
+            self.batch_feature_windows_spinbox.value()
+        )
+        self.feature_thread.progress.connect(self.update_batch_progress)
+        self.feature_thread.status.connect(self.update_batch_status)
+        self.feature_thread.finished.connect(self.feature_export_finished)
+        self.export_features_button.setEnabled(False)
+        self.feature_thread.start()
+    
+    def feature_export_finished(self):
+        """特征提取完成"""
+        self.progress_bar.setVisible(False)
+        self.export_features_button.setEnabled(len(self.batch_files) > 0)
+    
+    def compare_selected(self):
+        """在网格中对比所选文件（未选择时对比全部文件）"""
+        rows = sorted(index.row() for index in self.file_list.selectionModel().selectedIndexes())
+        file_list = [self.batch_files[row] for row in rows] or self.batch_files
+        if len(file_list) > COMPARE_LIMIT:
+            QMessageBox.warning(self, "警告", f"最多同时对比{COMPARE_LIMIT}个文件，"
+                                f"更多文件请使用\"导出对比总览图\"按页导出")
+            return
+        if self.compare_thread is not None and self.compare_thread.isRunning():
+            return
+        
+        self.compare_button.setEnabled(False)
+        self.statusBar.showMessage(f"正在读取{len(file_list)}个文件...")
+        self.compare_thread = CompareLoadThread(file_list, self.get_batch_events())
+        self.compare_thread.loaded.connect(self.show_comparison)
+        self.compare_thread.start()
+    
+    def show_comparison(self, results):
+        """显示对比图"""
+        self.compare_button.setEnabled(len(self.batch_files) > 0)
+        if self.compare_dialog is None:
+            self.compare_dialog = ComparisonDialog(self)
+        color_scheme = self.color_schemes[self.batch_color_scheme_combo.currentText()]
+        self.compare_dialog.show_maps(results, color_scheme, self.batch_dpi_spinbox.value())
+        self.compare_dialog.show()
+        self.compare_dialog.raise_()
+        self.statusBar.showMessage(self.compare_dialog.summary_label.text())
+    
+    def analyze_sequence(self):
+        """将所选文件（未选择时为全部文件）按编号排序作为时间序列分析"""
+        rows = sorted(index.row() for index in self.file_list.selectionModel().selectedIndexes())
+        file_list = [self.batch_files[row] for row in rows] or self.batch_files
+        if self.sequence_dialog is None:
+            self.sequence_dialog = SequenceDialog(self)
+        self.sequence_dialog.start(file_list, self.get_batch_events(), self.batch_dpi_spinbox.value())
+        self.sequence_dialog.show()
+        self.sequence_dialog.raise_()
+    
+    def export_contact_sheets(self):
+        """将所有批处理文件按页导出为对比总览图"""
+        default_dir = self.output_dir_label.text()
+        if default_dir == "未选择输出目录":
+            default_dir = ""
+        save_dir = QFileDialog.getExistingDirectory(self, "选择对比总览图输出目录", default_dir)
+        if not save_dir:
+            return
+        
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        color_scheme = self.color_schemes[self.batch_color_scheme_combo.currentText()]
+        self.contact_thread = ContactSheetThread(
+            self.batch_files, save_dir, color_scheme, self.batch_dpi_spinbox.value(),
+            self.get_batch_events()
+        )
+        self.contact_thread.progress.connect(self.update_batch_progress)
+        self.contact_thread.status.connect(self.update_batch_status)
+        self.contact_thread.finished.connect(self.contact_sheet_finished)
+        self.contact_sheet_button.setEnabled(False)
+        self.contact_thread.start()
+    
+    def contact_sheet_finished(self):
+        """对比总览图导出完成"""
+        self.progress_bar.setVisible(False)
+        self.contact_sheet_button.setEnabled(len(self.batch_files) > 0)
+    
+    def toggle_watch(self, checked):
+        """开始或停止监视目录"""
+        if not checked:
+            if self.watch_thread is not None:
+                self.watch_thread.stop()
+                self.watch_button.setEnabled(False)
+                self.update_batch_status("正在停止监视，等待当前文件完成...")
+            return
+        preprocess = self.get_preprocess(self.batch_preprocess_widgets)
+        if preprocess is not None and preprocess.normalize == "global":
+            # 文件陆续到达，无法预先扫描全部数据
+            QMessageBox.warning(self, "警告", "监视目录不支持所有文件统一颜色范围，请使用固定范围")
+            self.watch_button.setChecked(False)
+            return
+        watch_dir = QFileDialog.getExistingDirectory(self, "选择监视的目录", "")
+        if not watch_dir:
+            self.watch_button.setChecked(False)
+            return
+        
+        # 使用与批处理相同的设置
+        self.watch_thread = WatchFolderThread(
+            watch_dir, self.output_dir_label.text(),
+            self.color_schemes[self.batch_color_scheme_combo.currentText()],
+            self.batch_dpi_spinbox.value(),
+            "2D" if self.batch_view_2d_radio.isChecked() else "3D",
+            self.batch_workers_spinbox.value(), self.batch_render_mode_combo.currentData(),
+            self.batch_surface_count_spinbox.value(), self.get_batch_events(), preprocess
+        )
+        self.watch_thread.status.connect(self.update_batch_status)
+        self.watch_thread.finished_one.connect(self.watch_file_processed)
+        self.watch_thread.stats_updated.connect(self.update_batch_stats)
+        self.watch_thread.finished.connect(self.watch_finished)
+        self.watch_button.setText("停止监视")
+        self.select_output_dir_button.setEnabled(False)
+        self.watch_thread.start()
+    
+    def watch_file_processed(self, file_path, save_path):
+        """监视目录中的文件渲染完成，新文件追加到文件列表"""
+        if file_path not in self.batch_file_set:
+            self.append_batch_files([file_path])
+    
+    def watch_finished(self):
+        """监视线程结束"""
+        self.watch_button.setText("监视目录...")
+        self.watch_button.setChecked(False)
+        self.select_output_dir_button.setEnabled(True)
+        self.check_batch_ready()
+    
+    def cancel_batch_process(self):
+        """取消正在进行的批处理"""
+        self.batch_thread.stop()
+        self.cancel_batch_button.setEnabled(False)
+        self.update_batch_status("正在取消，等待当前文件完成...")
+    
     def update_batch_progress(self, value):
         """更新批处理进度"""
         self.progress_bar.setValue(value)
@@ -559,6 +2127,40 @@ class PRPDVisualizer(QMainWindow):
         self.statusBar.showMessage(status)
         self.batch_result_label.setText(status)
     
+    def update_batch_stats(self, snapshot):
+        """刷新运行统计"""
+        labels = self.batch_stats_labels
+        labels["done"].setText(f"{snapshot['done']}/{snapshot['total']}，失败{snapshot['failed']}")
+        labels["rate"].setText(f"{snapshot['rate']:.2f} 文件/秒（平均{snapshot['mean_rate']:.2f}，"
+                               f"已用时{format_seconds(snapshot['elapsed'])}）")
+        labels["eta"].setText("-" if snapshot['eta'] is None else format_seconds(snapshot['eta']))
+        if snapshot['p50'] is None:
+            labels["latency"].setText("-")
+        else:
+            labels["latency"].setText(f"p50 {snapshot['p50'] * 1000:.0f}ms，"
+                                      f"p95 {snapshot['p95'] * 1000:.0f}ms")
+        # 端到端延迟（文件到达到图像写出）只在监视目录时记录
+        if snapshot['arrival_p50'] is None:
+            labels["arrival"].setText("-")
+        else:
+            labels["arrival"].setText(f"p50 {snapshot['arrival_p50']:.2f}s，"
+                                      f"p95 {snapshot['arrival_p95']:.2f}s"
+                                      + (f"（排队{snapshot['queued']}）" if 'queued' in snapshot else ""))
+        # 经信号传递后字典键的顺序可能改变，按STAGES的顺序显示
+        stage_means = snapshot['stage_means']
+        labels["stages"].setText("，".join(f"{name}{stage_means[stage] * 1000:.0f}ms"
+                                          for stage, name in STAGES.items() if stage in stage_means)
+                                 or "-")
+        labels["memory"].setText("-" if not snapshot['peak_rss']
+                                 else f"{snapshot['peak_rss'] / 2**20:.0f}MB")
+        if snapshot['slowest']:
+            file_path, latency = snapshot['slowest'][0]
+            labels["slowest"].setText(f"{os.path.basename(file_path)}（{latency * 1000:.0f}ms）")
+            labels["slowest"].setToolTip("\n".join(f"{path}（{seconds * 1000:.0f}ms）"
+                                                    for path, seconds in snapshot['slowest']))
+        else:
+            labels["slowest"].setText("-")
+    
     def batch_file_processed(self, file_path, save_path):
         """批处理单个文件完成"""
         # 可以在这里添加更多处理逻辑，如更新UI等
@@ -571,17 +2173,45 @@ class PRPDVisualizer(QMainWindow):
         
         # 启用开始按钮
         self.start_batch_button.setEnabled(True)
+        self.cancel_batch_button.setEnabled(False)
         
-        # 更新状态
-        self.statusBar.showMessage("批处理完成")
+        if self.batch_thread.cancelled:
+            QMessageBox.information(self, "已取消", "批处理已取消，再次运行将跳过已完成的文件")
+            return
         
         # 显示完成消息
         QMessageBox.information(self, "完成", "批处理已完成")
 
+    def show_startup_time(self):
+        """在状态栏显示从导入到窗口显示的启动耗时"""
+        self.startup_time = time.perf_counter() - _IMPORT_START
+        self.statusBar.showMessage(f"就绪（启动耗时{self.startup_time * 1000:.0f} ms）")
+    
+    def closeEvent(self, event):
+        """关闭窗口时停止后台线程"""
+        self.stop_stream()
+        self.plot_thread.stop()
+        self.plot_thread.wait()
+        if self.batch_tab_created:
+            self.thumbnail_loader.stop()
+            self.batch_file_model.pixmaps.clear()
+        if self.compare_thread is not None:
+            self.compare_thread.wait()
+        if self.sequence_dialog is not None:
+            self.sequence_dialog.stop_loading()
+        for thread in (self.batch_thread, self.feature_thread, self.contact_thread,
+                       self.watch_thread):
+            if thread is not None and thread.isRunning():
+                thread.stop()
+                thread.wait()
+        super().closeEvent(event)
+
 def main():
     app = QApplication(sys.argv)
     window = PRPDVisualizer()
     window.show()
+    # 事件循环开始后（窗口已显示）记录启动耗时
+    QTimer.singleShot(0, window.show_startup_time)
     sys.exit(app.exec())
 
 if __name__ == "__main__":
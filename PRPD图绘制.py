@@ -1,8 +1,8 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 import numpy as np
 from matplotlib.colors import LinearSegmentedColormap, ListedColormap
+from prpd_cache import load_prpd_matrix
 
 def plot_prpd(file_path, save_path=None):
     """
@@ -12,8 +12,8 @@ def plot_prpd(file_path, save_path=None):
     file_path (str): PRPD数据文件的路径。
     save_path (str, optional): 保存图像的路径，如果为None则不保存。
     """
-    # 读取数据
-    df = pd.read_csv(file_path, header=None)
+    # 读取数据（经由二进制缓存）
+    data = load_prpd_matrix(file_path)
     # 创建自定义颜色方案
     #               黑     白         黄         红
     colors = ['#000000', '#FFFFFE', '#FFFF13', '#FF0000']
@@ -23,7 +23,7 @@ def plot_prpd(file_path, save_path=None):
     fig, ax = plt.subplots(figsize=(10,6))
     
     # 绘制2D图
-    img = ax.imshow(df.values, cmap=custom_cmap, origin='lower', 
+    img = ax.imshow(data, cmap=custom_cmap, origin='lower', 
                     extent=[0, 360, 0, 100], aspect='auto')
     ax.set_title('2D PRPD Plot')
     ax.set_xlabel('Phase (°)')
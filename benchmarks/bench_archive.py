@@ -0,0 +1,120 @@
+"""
+比较PRPD图谱库的存储大小和读取吞吐量（图谱/秒）：CSV文件、二进制缓存、内存映射数组（.npy）
+和压缩归档（.prpda，顺序读取和随机读取）。
+
+默认使用合成图谱（放电簇加稀疏噪声，行尾NaN列与原始CSV一致），也可用--input-dir指定
+实际数据目录。
+
+用法:
+    python benchmarks/bench_archive.py [--count 2000] [--shape 64x65] [--chunk-size 64]
+    python benchmarks/bench_archive.py --input-dir 尖端放电
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from prpd_archive import CHUNK_SIZE, LEVEL, PRPDArchive, pack_files
+from prpd_cache import PRPDCache, from_compact, open_archive, pack_archive, read_prpd_csv
+from prpd_stream import write_prpd_csv
+
+def make_map(rows, cols, rng):
+    """生成模拟PRPD图：正负半周各一个放电簇加稀疏噪声，最后一列为NaN"""
+    phase = np.arange(cols - 1)
+    amp = np.arange(rows)[:, None]
+    data = np.zeros((rows, cols))
+    for center in rng.uniform(0, cols - 1, 2):
+        width = rng.uniform(2, 6)
+        height = rng.uniform(5, rows / 2)
+        cluster = np.exp(-((phase - center) / width) ** 2) * np.exp(-amp / height)
+        data[:, :-1] += np.round(cluster * rng.uniform(50, 2000))
+    data[:, :-1] += rng.random((rows, cols - 1)) < 0.02
+    data[:, -1] = np.nan
+    return data
+
+def throughput(func, count):
+    """运行func()，返回图谱/秒"""
+    start = time.perf_counter()
+    func()
+    return count / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--count', type=int, default=2000, help="合成图谱数")
+    parser.add_argument('--shape', default='64x65', help="合成图谱的行x列")
+    parser.add_argument('--input-dir', help="实际PRPD CSV目录（代替合成图谱）")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--level', type=int, default=LEVEL)
+    parser.add_argument('--random', type=int, default=500, help="随机读取的次数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.input_dir:
+            files = sorted(glob.glob(os.path.join(args.input_dir, '*.csv')))
+            csv_dir = args.input_dir
+        else:
+            rows, cols = (int(v) for v in args.shape.lower().split('x'))
+            rng = np.random.default_rng(0)
+            csv_dir = os.path.join(tmp_dir, 'csv')
+            os.makedirs(csv_dir)
+            files = []
+            for i in range(args.count):
+                file_path = os.path.join(csv_dir, f"map{i:06d}.csv")
+                write_prpd_csv(file_path, make_map(rows, cols, rng))
+                files.append(file_path)
+        count = len(files)
+        if not count:
+            parser.error("没有找到CSV文件")
+
+        archive_path = os.path.join(tmp_dir, 'maps.prpda')
+        pack_prefix = os.path.join(tmp_dir, 'maps_pack')
+        cache_dir = os.path.join(tmp_dir, 'cache')
+        pack_rate = throughput(lambda: pack_files(files, archive_path, 'bench', args.chunk_size,
+                                                  args.level, csv_dir), count)
+        pack_archive(csv_dir, pack_prefix, cache_dir=cache_dir)  # 同时预热二进制缓存
+
+        cache_size = sum(os.path.getsize(p) for p in glob.glob(os.path.join(cache_dir, 'data', '*')))
+        sizes = [("CSV", sum(os.path.getsize(f) for f in files)),
+                 ("二进制缓存(.npy)", cache_size),
+                 ("内存映射数组(.npy)", os.path.getsize(f"{pack_prefix}.npy")),
+                 ("压缩归档(.prpda)", os.path.getsize(archive_path))]
+        print(f"图谱数: {count}，归档每块{args.chunk_size}个，zlib级别{args.level}，"
+              f"打包{pack_rate:,.0f} 图谱/秒")
+        print("存储大小:")
+        for name, size in sizes:
+            print(f"  {name:<20}: {size / 2**20:9.2f} MB  {size / count:8.0f} 字节/图谱  "
+                  f"{size / sizes[0][1] * 100:6.1f}%")
+
+        cache = PRPDCache(cache_dir)
+        stack, _ = open_archive(pack_prefix)
+        random_order = np.random.default_rng(1).integers(0, count, args.random)
+
+        def archive_sequential():
+            with PRPDArchive(archive_path) as archive:
+                for i in range(len(archive)):
+                    archive[i]
+
+        def archive_random():
+            with PRPDArchive(archive_path) as archive:
+                for i in random_order:
+                    archive[int(i)]
+
+        rates = [
+            ("CSV解析", throughput(lambda: [read_prpd_csv(f) for f in files], count)),
+            ("二进制缓存", throughput(lambda: [cache.load(f) for f in files], count)),
+            ("内存映射数组", throughput(lambda: [from_compact(stack[i]) for i in range(count)], count)),
+            ("归档顺序读取", throughput(archive_sequential, count)),
+            ("归档随机读取", throughput(archive_random, len(random_order))),
+        ]
+        print("读取吞吐量:")
+        for name, rate in rates:
+            print(f"  {name:<16}: {rate:12,.0f} 图谱/秒")
+
+if __name__ == '__main__':
+    main()
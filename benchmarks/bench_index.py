@@ -0,0 +1,73 @@
+"""
+测量相似图谱索引的查询延迟与图谱库大小的关系（单个查询和批量查询，余弦和L2）。
+
+用法:
+    python benchmarks/bench_index.py [--sizes 1000 10000 50000] [--dim 64] [-k 5]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from prpd_index import METRICS, PCA_DIM, PRPDIndex
+
+def make_maps(count, rows=64, cols=65, seed=0):
+    """生成模拟PRPD矩阵：两个半周期的放电簇，位置和幅值随机变化，最后一列为NaN"""
+    rng = np.random.default_rng(seed)
+    phase = np.arange(cols - 1)
+    amp = np.arange(rows)[:, np.newaxis]
+    for _ in range(count):
+        shift, center = rng.uniform(-8, 8), rng.uniform(10, 40)
+        cluster = (np.exp(-((phase - 16 - shift) ** 2) / 40 - ((amp - center) ** 2) / 30) +
+                   np.exp(-((phase - 48 - shift) ** 2) / 40 - ((amp - center * 1.1) ** 2) / 30))
+        data = np.full((rows, cols), np.nan)
+        data[:, :cols - 1] = rng.poisson(cluster * 100)
+        yield data
+
+def timed_ms(func, repeat):
+    """返回多次运行耗时的中位数（毫秒）"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return np.median(times) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--dim', type=int, default=PCA_DIM)
+    parser.add_argument('-k', type=int, default=5)
+    parser.add_argument('--batch', type=int, default=32, help="批量查询的查询数")
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    sizes = sorted(args.sizes)
+    queries = list(make_maps(args.batch, seed=1))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        maps = make_maps(sizes[-1])
+        first = [next(maps) for _ in range(sizes[0])]
+        start = time.perf_counter()
+        index = PRPDIndex.create(tmp_dir, first, [f"{i}.csv" for i in range(len(first))],
+                                 ["模拟"] * len(first), args.dim)
+        elapsed = time.perf_counter() - start
+        print(f"建立索引: {len(first) / elapsed:,.0f} 图谱/秒，{index.dim}维")
+        embedded = index.embed(queries)
+        print(f"{'图谱数':>8} {'度量':>6} {'单个查询(ms)':>12} {'批量每查询(ms)':>14}")
+        for size in sizes:
+            while len(index) < size:
+                chunk = [next(maps) for _ in range(min(10000, size - len(index)))]
+                index.add(chunk, [f"{len(index) + i}.csv" for i in range(len(chunk))],
+                          ["模拟"] * len(chunk))
+            for metric in METRICS:
+                single = timed_ms(lambda: index.search(embedded[0], args.k, metric), args.repeat)
+                batch = timed_ms(lambda: index.search(embedded, args.k, metric), args.repeat)
+                print(f"{size:>10} {metric:>8} {single:>14.3f} {batch / len(embedded):>16.3f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+比较批处理顺序执行与读取、渲染、写出三级流水线的速度（文件/秒），并输出各阶段计时。
+
+可用--read-latency和--write-latency模拟网络存储的延迟（毫秒/文件）。
+
+用法:
+    python benchmarks/bench_pipeline.py [CSV目录] [--render raster] [--read-latency 50]
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import prpd_core
+from prpd_core import (COLOR_SCHEMES, RENDER_MODES, PipelineStats, make_jobs, render_prpd_file,
+                       run_pipeline)
+
+def add_latency(read_latency, write_latency):
+    """在读取和写出函数前加入固定延迟，模拟网络存储"""
+    load_job_data = prpd_core.load_job_data
+    write_job_file = prpd_core.write_job_file
+
+    def slow_load(job):
+        time.sleep(read_latency)
+        return load_job_data(job)
+
+    def slow_write(job, encoded):
+        time.sleep(write_latency)
+        write_job_file(job, encoded)
+
+    prpd_core.load_job_data = slow_load
+    prpd_core.write_job_file = slow_write
+
+def main():
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('data_dir', nargs='?', default=os.path.join(root, '尖端放电'))
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--render', choices=RENDER_MODES, default="raster")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--readers', type=int, default=2)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--prefetch', type=int, default=4)
+    parser.add_argument('--read-latency', type=float, default=0, help="毫秒")
+    parser.add_argument('--write-latency', type=float, default=0, help="毫秒")
+    args = parser.parse_args()
+
+    files = sorted(glob.glob(os.path.join(args.data_dir, '*.csv')))
+    if not files:
+        sys.exit(f"未找到CSV文件: {args.data_dir}")
+    add_latency(args.read_latency / 1000, args.write_latency / 1000)
+
+    print(f"文件数: {len(files)} x {args.repeat}, DPI: {args.dpi}, 渲染方式: {args.render}")
+    with tempfile.TemporaryDirectory() as out_dir:
+        jobs = make_jobs(files, out_dir, COLOR_SCHEMES["默认方案"], args.dpi, "2D",
+                         args.render) * args.repeat
+        # 预热（模板和栅格底图在第一次调用时创建）
+        render_prpd_file(jobs[0])
+
+        start = time.perf_counter()
+        for job in jobs:
+            render_prpd_file(job)
+        serial = len(jobs) / (time.perf_counter() - start)
+        print(f"  顺序执行: {serial:7.2f} 文件/秒")
+
+        stats = PipelineStats()
+        start = time.perf_counter()
+        for _, _, error in run_pipeline(jobs, args.readers, args.writers, args.prefetch, stats):
+            if error:
+                raise RuntimeError(error)
+        pipelined = len(jobs) / (time.perf_counter() - start)
+        print(f"  三级流水线: {pipelined:7.2f} 文件/秒  ({pipelined / serial:.1f}x)")
+        print(f"  {stats.summary()}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+测量预处理（prpd_preprocess.py）每个图谱的耗时：逐个矩阵处理与一次处理一组矩阵(N, 行, 列)，
+并与读取（二进制缓存）和渲染（raster/template）一个图谱的耗时比较。
+
+用法:
+    python benchmarks/bench_preprocess.py 尖端放电 [--stack 256] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from prpd_cache import load_prpd_matrix
+from prpd_core import COLOR_SCHEMES, RenderJob, expand_inputs, render_job_image
+from prpd_preprocess import Preprocess, global_color_limits, preprocess_maps
+
+# 测量的预处理组合
+CONFIGS = [
+    ("阈值", Preprocess(threshold=2)),
+    ("阈值+对数", Preprocess(threshold=2, log=True)),
+    ("中值3×3", Preprocess(median=3)),
+    ("高斯σ=1", Preprocess(sigma=1.0)),
+    ("全部(阈值+中值+高斯+对数)", Preprocess(threshold=2, median=3, sigma=1.0, log=True)),
+]
+
+def per_map(func, count, repeat):
+    """运行func() repeat次，返回每个图谱的最短耗时（微秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best / count * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('inputs', nargs='+', help="PRPD CSV文件、目录或通配符")
+    parser.add_argument('--stack', type=int, default=256, help="一组处理的矩阵数（由输入文件重复组成）")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    files = expand_inputs(args.inputs)
+    if not files:
+        parser.error("没有找到文件")
+    maps = [load_prpd_matrix(f) for f in files]
+    shape = maps[0].shape
+    maps = [m for m in maps if m.shape == shape]
+    stack = np.stack([maps[i % len(maps)] for i in range(args.stack)])
+    print(f"图谱: {len(maps)}个{shape[0]}×{shape[1]}，一组{len(stack)}个")
+
+    scheme = COLOR_SCHEMES["默认方案"]
+    jobs = {mode: RenderJob('', 'bench.png', scheme, 100, "2D", mode)
+            for mode in ("raster", "template")}
+    reference = [("读取（二进制缓存）", per_map(lambda: [load_prpd_matrix(f) for f in files],
+                                              len(files), args.repeat))]
+    for mode, job in jobs.items():
+        reference.append((f"渲染{mode} 100dpi", per_map(
+            lambda: [render_job_image(job, m) for m in maps], len(maps), args.repeat)))
+    print("参考（每个图谱）:")
+    for name, us in reference:
+        print(f"  {name:<24}: {us:9.1f} µs")
+
+    print("预处理（每个图谱）:        逐个矩阵      一组矩阵")
+    for name, params in CONFIGS:
+        single = per_map(lambda: [preprocess_maps(m, params) for m in stack], len(stack),
+                         args.repeat)
+        batched = per_map(lambda: preprocess_maps(stack, params), len(stack), args.repeat)
+        print(f"  {name:<24}: {single:9.1f} µs  {batched:9.1f} µs")
+
+    params = CONFIGS[-1][1]
+    scan = per_map(lambda: global_color_limits(iter(stack), params), len(stack), args.repeat)
+    print(f"统一颜色范围扫描（{CONFIGS[-1][0]}）: {scan:.1f} µs/图谱")
+
+if __name__ == '__main__':
+    main()
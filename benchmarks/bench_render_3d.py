@@ -0,0 +1,92 @@
+"""
+比较3D导出的单文件耗时：原plot_surface路径、向量化曲面、3D图形模板及不同细节级别。
+
+用法:
+    python benchmarks/bench_render_3d.py [CSV目录] [--dpi 150]
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.figure import Figure
+from mpl_toolkits.mplot3d import Axes3D  # noqa: F401
+
+from prpd_cache import load_prpd_matrix
+from prpd_core import COLOR_SCHEMES, SURFACE_COUNT, make_jobs, render_prpd_file
+
+def render_plot_surface(data, color_scheme, save_path, dpi):
+    """原3D导出路径：每个文件创建Figure并调用Axes3D.plot_surface"""
+    custom_cmap = LinearSegmentedColormap.from_list('custom', color_scheme)
+    fig = Figure(figsize=(10, 6), dpi=100)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111, projection='3d')
+    x = np.arange(0, 360, 360/data.shape[1])
+    y = np.arange(0, 100, 100/data.shape[0])
+    X, Y = np.meshgrid(x, y)
+    surf = ax.plot_surface(X, Y, data, cmap=custom_cmap, linewidth=0, antialiased=False)
+    ax.set_title('3D PRPD图')
+    ax.set_xlabel('相位 (°)')
+    ax.set_ylabel('电压 (%)')
+    ax.set_zlabel('幅值')
+    ax.view_init(elev=30, azim=45)
+    fig.colorbar(surf, ax=ax, shrink=0.5, aspect=5)
+    fig.tight_layout()
+    fig.savefig(save_path, dpi=dpi, bbox_inches='tight')
+
+def time_per_file(render, items, repeat):
+    """预热一次后返回每个文件的平均耗时（秒）"""
+    render(items[0])
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            render(item)
+    return (time.perf_counter() - start) / (len(items) * repeat)
+
+def run_jobs_serial(jobs):
+    def render(job):
+        _, _, error = render_prpd_file(job)
+        if error:
+            raise RuntimeError(error)
+    return render
+
+def main():
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('data_dir', nargs='?', default=os.path.join(root, '尖端放电'))
+    parser.add_argument('--dpi', type=int, default=150)
+    parser.add_argument('--repeat', type=int, default=2)
+    parser.add_argument('--lod', type=int, nargs='*', default=[25, 12],
+                        help="额外测试的3D网格数（细节级别）")
+    args = parser.parse_args()
+    
+    files = sorted(glob.glob(os.path.join(args.data_dir, '*.csv')))
+    if not files:
+        sys.exit(f"未找到CSV文件: {args.data_dir}")
+    scheme = COLOR_SCHEMES["默认方案"]
+    
+    print(f"文件数: {len(files)} x {args.repeat}, DPI: {args.dpi}")
+    with tempfile.TemporaryDirectory() as out_dir:
+        save_path = os.path.join(out_dir, 'plot_surface.png')
+        baseline = time_per_file(
+            lambda f: render_plot_surface(load_prpd_matrix(f), scheme, save_path, args.dpi),
+            files, args.repeat)
+        print(f"{'plot_surface':>22}: {baseline * 1000:7.1f} ms/文件  (1.0x)")
+        
+        cases = [("figure", SURFACE_COUNT), ("template", SURFACE_COUNT)]
+        cases += [("template", count) for count in args.lod]
+        for mode, count in cases:
+            jobs = make_jobs(files, out_dir, scheme, args.dpi, "3D", mode, surface_count=count)
+            elapsed = time_per_file(run_jobs_serial(jobs), jobs, args.repeat)
+            label = f"{mode} (网格数{count})"
+            print(f"{label:>22}: {elapsed * 1000:7.1f} ms/文件  ({baseline / elapsed:.1f}x)")
+
+if __name__ == '__main__':
+    main()
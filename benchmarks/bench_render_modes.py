@@ -0,0 +1,55 @@
+"""
+比较2D批处理各渲染方式（figure/template/raster）的速度（文件/秒）。
+
+用法:
+    python benchmarks/bench_render_modes.py [CSV目录] [--dpi 300]
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from prpd_core import COLOR_SCHEMES, RENDER_MODES, make_jobs, render_prpd_file
+
+def run(files, out_dir, dpi, render_mode, repeat):
+    """渲染文件列表repeat次，返回文件/秒"""
+    jobs = make_jobs(files, out_dir, COLOR_SCHEMES["默认方案"], dpi, "2D", render_mode)
+    
+    # 预热（模板和栅格底图在第一次调用时创建，计入预热）
+    render_prpd_file(jobs[0])
+    
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for job in jobs:
+            _, _, error = render_prpd_file(job)
+            if error:
+                raise RuntimeError(error)
+    elapsed = time.perf_counter() - start
+    return len(jobs) * repeat / elapsed
+
+def main():
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('data_dir', nargs='?', default=os.path.join(root, '尖端放电'))
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    files = sorted(glob.glob(os.path.join(args.data_dir, '*.csv')))
+    if not files:
+        sys.exit(f"未找到CSV文件: {args.data_dir}")
+    
+    print(f"文件数: {len(files)} x {args.repeat}, DPI: {args.dpi}")
+    with tempfile.TemporaryDirectory() as out_dir:
+        baseline = None
+        for mode in RENDER_MODES:
+            rate = run(files, out_dir, args.dpi, mode, args.repeat)
+            baseline = baseline or rate
+            print(f"{mode:>8}: {rate:7.2f} 文件/秒  ({rate / baseline:.1f}x)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+测量序列趋势分析（prpd_sequence.py）的耗时：整个序列一次计算、分批追加与逐帧追加，
+以及序列较长时追加一帧的增量更新与从头重新计算的比较；同时检查超过阈值时是否改用
+内存映射。
+
+用法:
+    python benchmarks/bench_sequence.py [--frames 5000] [--window 100] [--mmap-mb 64]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from prpd_sequence import LOAD_BATCH, PRPDSequence
+
+def make_series(count, rows=64, cols=65, seed=0):
+    """生成逐渐增强、中途突变一次的模拟PRPD序列（最后一列为NaN，与样例数据相同）"""
+    rng = np.random.default_rng(seed)
+    phase = np.arange(cols - 1)
+    amp = np.arange(rows)[:, np.newaxis]
+    stack = np.full((count, rows, cols), np.nan)
+    for i in range(count):
+        center = 20 + 10 * (i >= count // 2)
+        cluster = (np.exp(-((phase - 16) ** 2) / 40 - ((amp - center) ** 2) / 30) +
+                   np.exp(-((phase - 48) ** 2) / 40 - ((amp - center * 1.1) ** 2) / 30))
+        stack[i, :, :cols - 1] = rng.poisson(cluster * (500 + i / count * 500))
+    return stack
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--frames', type=int, default=5000)
+    parser.add_argument('--window', type=int, help="斜率窗口（默认整个序列）")
+    parser.add_argument('--mmap-mb', type=float, default=64, help="内存映射阈值（MB）")
+    args = parser.parse_args()
+
+    stack = make_series(args.frames)
+    threshold = args.mmap_mb * 2**20
+    print(f"帧数: {len(stack)}，形状{stack.shape[1:]}，{stack.nbytes / 2**20:.0f} MB，"
+          f"内存映射阈值{args.mmap_mb:g} MB")
+
+    def build(batch):
+        sequence = PRPDSequence(args.window, threshold)
+        sequence.reserve(len(stack))
+        for start in range(0, len(stack), batch):
+            sequence.extend(stack[start:start + batch])
+        return sequence
+
+    for name, batch in (("一次计算", len(stack)), (f"每批{LOAD_BATCH}帧", LOAD_BATCH), ("逐帧", 1)):
+        sequence, elapsed = timed(lambda: build(batch))
+        print(f"  {name:<10}: {elapsed:7.2f}s（{len(stack) / elapsed:9,.0f} 帧/秒）"
+              f"{'，内存映射' if sequence.is_mapped else ''}，突变帧{sequence.change_points().tolist()}")
+
+    # 已有len(stack)-1帧时追加最后一帧：增量更新与从头重新计算
+    sequence = build(LOAD_BATCH)
+    base = PRPDSequence(args.window, threshold)
+    base.reserve(len(stack))
+    base.extend(stack[:-1])
+    _, append_time = timed(lambda: (base.extend(stack[-1:]), base.slope_map(), base.series()))
+    _, full_time = timed(lambda: PRPDSequence(args.window, threshold).extend(stack).slope_map())
+    assert np.allclose(base.slope_map(), sequence.slope_map(), equal_nan=True)
+    print(f"追加一帧: 增量更新{append_time * 1000:.2f}ms，从头重新计算{full_time * 1000:.0f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+渲染服务（prpd_server.py）的负载测试：多个并发客户端持续请求图像，报告吞吐量（请求/秒）、
+延迟分位数（p50/p95/p99）和缓存命中、合并情况。
+
+未指定--url时在子进程中启动服务（自动选择端口），测试结束后关闭。请求从--inputs的文件
+中随机选择，--hot为请求同一个"热门"图像的比例（测试缓存和合并），--matrix为直接发送
+随机矩阵的比例（每次内容不同，总是需要渲染）。
+
+用法:
+    python benchmarks/bench_server.py 尖端放电 [--clients 8] [--duration 10] [--workers 2]
+    python benchmarks/bench_server.py 尖端放电 --url http://127.0.0.1:8765 --dpis 100 150
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from prpd_core import expand_inputs
+from prpd_server import request_render
+
+def start_server(workers, cache_mb):
+    """在子进程中启动服务，返回(进程, 地址)，工作进程就绪后返回"""
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'prpd_server.py'), '--port', '0',
+         '--workers', str(workers), '--cache-mb', str(cache_mb)],
+        cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    url = process.stdout.readline().split(': ', 1)[-1].strip()
+    if not url.startswith('http'):
+        process.kill()
+        raise RuntimeError("服务启动失败")
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/health", timeout=5):
+                return process, url
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("等待渲染进程就绪超时")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('inputs', nargs='+', help="PRPD CSV文件、目录或通配符")
+    parser.add_argument('--url', help="已运行的服务地址（默认启动新服务）")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="新服务的渲染进程数")
+    parser.add_argument('--cache-mb', type=float, default=256, help="新服务的结果缓存上限（MB）")
+    parser.add_argument('--clients', type=int, default=8, help="并发客户端数")
+    parser.add_argument('--duration', type=float, default=10.0, help="测试时长（秒）")
+    parser.add_argument('--dpis', type=int, nargs='+', default=[100], help="请求的DPI（随机选择）")
+    parser.add_argument('--view', choices=['2D', '3D'], default='2D')
+    parser.add_argument('--render', default='template', help="渲染方式")
+    parser.add_argument('--hot', type=float, default=0.2, help="请求同一图像的比例")
+    parser.add_argument('--matrix', type=float, default=0.1, help="发送随机矩阵的比例")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    files = [os.path.abspath(f) for f in expand_inputs(args.inputs)]
+    if not files:
+        parser.error("没有找到要请求的文件")
+    process = None
+    url = args.url
+    if url is None:
+        process, url = start_server(args.workers, args.cache_mb)
+    print(f"服务: {url}，{args.clients}个客户端，{args.duration:.0f}秒，{len(files)}个文件，"
+          f"DPI {args.dpis}，热门比例{args.hot:.0%}，矩阵比例{args.matrix:.0%}")
+
+    results = []  # (延迟, 缓存状态)，状态为None表示失败
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + args.duration
+
+    def client(index):
+        rng = random.Random(args.seed + index)
+        matrix_rng = np.random.default_rng(args.seed + index)
+        params = {'view': args.view, 'render': args.render}
+        while time.perf_counter() < stop_at:
+            roll = rng.random()
+            start = time.perf_counter()
+            try:
+                if roll < args.hot:
+                    _, status = request_render(url, files[0], dpi=args.dpis[0], **params)
+                elif roll < args.hot + args.matrix:
+                    data = matrix_rng.integers(0, 1000, (64, 65)).astype(np.float64)
+                    _, status = request_render(url, data=data, dpi=rng.choice(args.dpis), **params)
+                else:
+                    _, status = request_render(url, rng.choice(files), dpi=rng.choice(args.dpis),
+                                               **params)
+            except (urllib.error.URLError, ConnectionError) as e:
+                print(f"请求失败: {e}", file=sys.stderr)
+                status = None
+            with lock:
+                results.append((time.perf_counter() - start, status))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    with urllib.request.urlopen(f"{url}/stats") as response:
+        server_stats = json.load(response)
+    if process is not None:
+        process.terminate()
+        process.wait()
+
+    latencies = np.array([latency for latency, status in results if status is not None])
+    failed = sum(status is None for _, status in results)
+    print(f"请求: {len(results)}，失败{failed}，吞吐量{len(results) / elapsed:.1f} 请求/秒")
+    if len(latencies):
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+        print(f"延迟: p50 {p50:.1f}ms，p95 {p95:.1f}ms，p99 {p99:.1f}ms，"
+              f"最大{latencies.max() * 1000:.1f}ms")
+    for status, name in (("hit", "缓存命中"), ("coalesced", "合并"), ("miss", "渲染")):
+        count = sum(s == status for _, s in results)
+        print(f"  {name:<6}: {count:6d}（{count / max(len(results), 1):.0%}）")
+    print(f"服务端: 渲染耗时{server_stats['render_seconds']:.2f}s，缓存{server_stats['cache']}")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+测量PRPD_GUI.py的启动时间（从启动Python进程到主窗口显示），并检查是否达到目标。
+
+每次在新的子进程中启动（与用户双击启动相同，磁盘缓存已预热），取各次的中位数；
+同时检查启动时没有导入应延迟导入的模块（pandas、pyplot），批处理选项卡尚未创建。
+超过目标或检查失败时返回码为1，可在持续集成中作为启动时间的回归检查。
+
+用法:
+    python benchmarks/bench_startup.py [--repeat 5] [--target 1.5]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# 启动时间目标（秒，进程启动到窗口显示的中位数）
+STARTUP_TARGET = 1.5
+
+# 启动时不应导入的模块（第一次使用时才导入）
+# mpl_toolkits.mplot3d不在其中: matplotlib.projections导入时即导入它，导入Figure就会加载
+LAZY_MODULES = ('pandas', 'matplotlib.pyplot')
+
+# 子进程中执行的代码：导入、创建窗口、进入事件循环后输出各阶段耗时并退出
+CHILD = r'''
+import json, sys, time
+start = time.perf_counter()
+import PRPD_GUI
+from PySide6.QtCore import QTimer
+from PySide6.QtWidgets import QApplication
+imported = time.perf_counter()
+app = QApplication(sys.argv)
+window = PRPD_GUI.PRPDVisualizer()
+created = time.perf_counter()
+window.show()
+
+def report():
+    shown = time.perf_counter()
+    try:
+        print(json.dumps({
+            'import': imported - start, 'create': created - imported, 'show': shown - created,
+            'loaded': [name for name in %r if name in sys.modules],
+            'batch_tab_created': window.batch_tab_created,
+        }), flush=True)
+    finally:
+        app.quit()
+
+QTimer.singleShot(0, report)
+app.exec()
+'''
+
+def run_once():
+    """启动一次子进程，返回各阶段耗时（total为进程启动到窗口显示的时间）"""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-c', CHILD % (LAZY_MODULES,)], cwd=ROOT,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    line = process.stdout.readline()
+    total = time.perf_counter() - start
+    process.wait()
+    if not line:
+        raise RuntimeError(f"启动失败（返回码{process.returncode}）")
+    result = json.loads(line)
+    result['total'] = total
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--target', type=float, default=STARTUP_TARGET, help="启动时间目标（秒）")
+    args = parser.parse_args()
+
+    # 第一次启动预热磁盘缓存（字体列表、.pyc），不计入结果
+    run_once()
+    results = [run_once() for _ in range(args.repeat)]
+
+    def median(key):
+        values = sorted(result[key] for result in results)
+        return values[len(values) // 2]
+
+    print(f"启动{args.repeat}次（中位数）:")
+    for key, label in (('import', "导入模块"), ('create', "创建窗口"), ('show', "显示窗口"),
+                       ('total', "进程启动到窗口显示")):
+        print(f"  {label:<10}: {median(key) * 1000:8.0f} ms")
+
+    ok = True
+    total = median('total')
+    if total > args.target:
+        ok = False
+        print(f"未达到启动时间目标: {total:.2f}s > {args.target:.2f}s")
+    loaded = sorted({name for result in results for name in result['loaded']})
+    if loaded:
+        ok = False
+        print(f"启动时导入了应延迟导入的模块: {', '.join(loaded)}")
+    if any(result['batch_tab_created'] for result in results):
+        ok = False
+        print("启动时创建了批处理选项卡")
+    if ok:
+        print(f"达到启动时间目标（{args.target:.2f}s）")
+    return 0 if ok else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
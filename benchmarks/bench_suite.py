@@ -0,0 +1,327 @@
+"""
+读取、渲染、保存各阶段的基准测试套件，结果写为JSON，便于在版本之间比较性能回退。
+
+用合成的PRPD矩阵（默认66x65到1024x360）分别测量:
+- batch: 批处理（BatchProcessThread，figure方式）的各阶段: CSV解析、二进制缓存读取、
+  创建Figure、imshow/plot_surface、colorbar、tight_layout、计算裁剪框、渲染像素、PNG编码写出
+- script: PRPD图绘制.py中plot_prpd的各阶段: pd.read_csv、plt.subplots、imshow、colorbar、
+  savefig(bbox_inches='tight')（该脚本只有2D视图）
+- template/raster: 复用模板和快速栅格方式的渲染和写出（模板在预热时创建，不计入）
+
+每个组合按顺序执行全部阶段repeat次，记录每个阶段耗时的中位数和最小值。
+--profile对每个阶段额外运行一次并保存性能分析结果（cProfile的.prof，或pyinstrument的.html）。
+
+用法:
+    python benchmarks/bench_suite.py -o results.json
+    python benchmarks/bench_suite.py --sizes 66x65 1024x360 --views 2D --dpis 300 --profile cprofile
+    python benchmarks/bench_suite.py -o new.json --compare results.json
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.figure import Figure
+
+from prpd_cache import load_prpd_matrix, read_prpd_csv
+from prpd_core import (COLOR_SCHEMES, SURFACE_COUNT, add_prpd_surface, make_jobs,
+                       render_figure_pixels, render_job_image, tight_bbox, write_job_image,
+                       write_png)
+from prpd_stream import write_prpd_csv
+
+DEFAULT_SIZES = ["66x65", "256x180", "1024x360"]
+
+def parse_size(value):
+    """解析"行x列"格式的矩阵大小"""
+    try:
+        rows, cols = (int(v) for v in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"矩阵大小格式应为 行x列: {value}")
+    return rows, cols
+
+def make_matrix(rows, cols, seed=0):
+    """生成合成PRPD计数矩阵（两个半周期的放电簇，最后一列为NaN，与样例数据相同）"""
+    rng = np.random.default_rng(seed)
+    phase = np.linspace(0, 360, cols - 1)
+    amp = np.linspace(0, 100, rows)[:, np.newaxis]
+    cluster = (np.exp(-((phase - 90) ** 2) / 800 - ((amp - 30) ** 2) / 200) +
+               np.exp(-((phase - 270) ** 2) / 800 - ((amp - 35) ** 2) / 200))
+    data = np.full((rows, cols), np.nan)
+    data[:, :cols - 1] = rng.poisson(cluster * 5000)
+    return data
+
+def _new_axes(view_mode):
+    fig = Figure(figsize=(10, 6), dpi=100)
+    FigureCanvasAgg(fig)
+    if view_mode == "2D":
+        return fig, fig.add_subplot(111)
+    from mpl_toolkits.mplot3d import Axes3D  # noqa: F401 注册3d投影
+    return fig, fig.add_subplot(111, projection='3d')
+
+def batch_stages(csv_path, out_path, view_mode, dpi, cache_dir):
+    """批处理figure方式的各阶段（与prpd_core.render_prpd_figure和render_job_image相同）"""
+    cmap = LinearSegmentedColormap.from_list('custom', COLOR_SCHEMES["默认方案"])
+
+    def read_csv(state):
+        read_prpd_csv(csv_path)
+
+    def read_cache(state):
+        state['data'] = load_prpd_matrix(csv_path, cache_dir)
+
+    def figure(state):
+        state['fig'], state['ax'] = _new_axes(view_mode)
+
+    def plot(state):
+        ax, data = state['ax'], state['data']
+        if view_mode == "2D":
+            state['mappable'] = ax.imshow(data, cmap=cmap, origin='lower',
+                                          extent=[0, 360, 0, 100], aspect='auto')
+            ax.set_xticks(np.arange(0, 361, 90))
+            ax.set_yticks(np.arange(0, 101, 25))
+        else:
+            state['mappable'] = add_prpd_surface(ax, data, cmap, SURFACE_COUNT)
+            ax.set_zlabel('幅值')
+            ax.view_init(elev=30, azim=45)
+        ax.set_title(f'{view_mode} PRPD图')
+        ax.set_xlabel('相位 (°)')
+        ax.set_ylabel('电压 (%)')
+
+    def colorbar(state):
+        if view_mode == "2D":
+            state['fig'].colorbar(state['mappable'], ax=state['ax'])
+        else:
+            state['fig'].colorbar(state['mappable'], ax=state['ax'], shrink=0.5, aspect=5)
+
+    def tight_layout(state):
+        state['fig'].tight_layout()
+
+    def bbox(state):
+        state['bbox'] = tight_bbox(state['fig'], dpi)
+
+    def render(state):
+        state['pixels'] = render_figure_pixels(state['fig'], dpi, state['bbox'])
+
+    def write(state):
+        write_png(out_path, state['pixels'], dpi)
+
+    return [('read_csv', read_csv), ('read_cache', read_cache), ('figure', figure),
+            ('plot', plot), ('colorbar', colorbar), ('tight_layout', tight_layout),
+            ('tight_bbox', bbox), ('render', render), ('write_png', write)]
+
+def script_stages(csv_path, out_path, dpi):
+    """PRPD图绘制.py中plot_prpd的各阶段（pyplot，savefig(bbox_inches='tight')）"""
+    import matplotlib.pyplot as plt
+    import pandas as pd
+    cmap = LinearSegmentedColormap.from_list('custom', COLOR_SCHEMES["默认方案"])
+
+    def read_pandas(state):
+        state['data'] = pd.read_csv(csv_path, header=None).values
+
+    def subplots(state):
+        state['fig'], state['ax'] = plt.subplots(figsize=(10, 6))
+
+    def imshow(state):
+        ax = state['ax']
+        state['img'] = ax.imshow(state['data'], cmap=cmap, origin='lower',
+                                 extent=[0, 360, 0, 100], aspect='auto')
+        ax.set_title('2D PRPD Plot')
+        ax.set_xlabel('Phase (°)')
+        ax.set_ylabel('Voltage (%)')
+        ax.set_xticks(np.arange(0, 361, 90))
+        ax.set_yticks(np.arange(0, 101, 25))
+
+    def colorbar(state):
+        state['fig'].colorbar(state['img'], ax=state['ax'])
+
+    def savefig(state):
+        state['fig'].savefig(out_path, dpi=dpi, bbox_inches='tight')
+
+    def close(state):
+        plt.close(state['fig'])
+
+    return [('read_pandas', read_pandas), ('subplots', subplots), ('imshow', imshow),
+            ('colorbar', colorbar), ('savefig_tight', savefig), ('close', close)]
+
+def job_stages(csv_path, out_dir, view_mode, dpi, render_mode, cache_dir):
+    """复用模板或快速栅格方式的渲染和写出（先预热一次，创建模板）"""
+    job = make_jobs([csv_path], out_dir, COLOR_SCHEMES["默认方案"], dpi, view_mode,
+                    render_mode)[0]
+    data = load_prpd_matrix(csv_path, cache_dir)
+    write_job_image(job, render_job_image(job, data))
+
+    def render(state):
+        state['image'] = render_job_image(job, data)
+
+    def write(state):
+        write_job_image(job, state['image'])
+
+    return [('render', render), ('write', write)]
+
+@contextlib.contextmanager
+def profiled(profiler, path):
+    """在上下文中运行性能分析器，结束后保存结果"""
+    if profiler == 'cprofile':
+        import cProfile
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(path + '.prof')
+    else:
+        from pyinstrument import Profiler
+        profile = Profiler()
+        profile.start()
+        try:
+            yield
+        finally:
+            profile.stop()
+            with open(path + '.html', 'w', encoding='utf-8') as f:
+                f.write(profile.output_html())
+
+def run_stages(stages, repeat, profiler=None, profile_prefix=None):
+    """按顺序执行全部阶段repeat次，返回{阶段: [耗时]}；指定profiler时再分析一次"""
+    times = {name: [] for name, _ in stages}
+    for _ in range(repeat):
+        state = {}
+        for name, func in stages:
+            start = time.perf_counter()
+            func(state)
+            times[name].append(time.perf_counter() - start)
+    if profiler:
+        state = {}
+        for name, func in stages:
+            with profiled(profiler, f"{profile_prefix}_{name}"):
+                func(state)
+    return times
+
+def environment():
+    """记录测试环境，便于解释不同机器或版本间的差异"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'time': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'matplotlib': matplotlib.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+def result_key(result):
+    return (result['group'], result['view'], result['size'], result['dpi'], result['stage'])
+
+def compare(results, baseline_path, threshold):
+    """与基准结果比较，打印各阶段耗时比值，返回变慢超过阈值的阶段数"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {result_key(r): r for r in json.load(f)['results']}
+    regressions = 0
+    print(f"\n与{baseline_path}比较（新/旧，中位数）:")
+    for result in results:
+        old = baseline.get(result_key(result))
+        if old is None or not old['median']:
+            continue
+        ratio = result['median'] / old['median']
+        slower = ratio > 1 + threshold
+        regressions += slower
+        group, view, size, dpi, stage = result_key(result)
+        print(f"  {group:>8} {view} {size:>9} {dpi:>4}dpi {stage:>13}: "
+              f"{ratio:6.2f}x{'  变慢' if slower else ''}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=parse_size, nargs='+',
+                        default=[parse_size(s) for s in DEFAULT_SIZES], help="矩阵大小，如66x65")
+    parser.add_argument('--views', nargs='+', choices=['2D', '3D'], default=['2D', '3D'])
+    parser.add_argument('--dpis', type=int, nargs='+', default=[100, 300])
+    parser.add_argument('--groups', nargs='+', choices=['batch', 'script', 'template', 'raster'],
+                        default=['batch', 'script', 'template', 'raster'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('-o', '--output', help="结果JSON路径")
+    parser.add_argument('--profile', choices=['cprofile', 'pyinstrument'],
+                        help="对每个阶段额外运行一次性能分析")
+    parser.add_argument('--profile-dir', default='profiles', help="性能分析结果目录")
+    parser.add_argument('--compare', help="与之前的结果JSON比较")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="比较时判定为变慢的比例（默认0.1即慢10%%）")
+    args = parser.parse_args()
+
+    # 缺少中文字体时不逐条打印警告
+    logging.getLogger('matplotlib.font_manager').setLevel(logging.ERROR)
+    warnings.filterwarnings('ignore', message='Glyph .* missing from font')
+    if args.profile:
+        os.makedirs(args.profile_dir, exist_ok=True)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_dir = os.path.join(tmp_dir, 'cache')
+        for rows, cols in args.sizes:
+            size = f"{rows}x{cols}"
+            csv_path = os.path.join(tmp_dir, f"prpd_{size}.csv")
+            write_prpd_csv(csv_path, make_matrix(rows, cols))
+            load_prpd_matrix(csv_path, cache_dir)  # 预先写入二进制缓存
+            for view_mode in args.views:
+                for dpi in args.dpis:
+                    out_path = os.path.join(tmp_dir, 'out.png')
+                    suites = []
+                    if 'batch' in args.groups:
+                        suites.append(('batch', batch_stages(csv_path, out_path, view_mode, dpi,
+                                                             cache_dir)))
+                    if 'script' in args.groups and view_mode == "2D":
+                        suites.append(('script', script_stages(csv_path, out_path, dpi)))
+                    for render_mode in ('template', 'raster'):
+                        if render_mode in args.groups and not (render_mode == 'raster'
+                                                               and view_mode == "3D"):
+                            suites.append((render_mode, job_stages(
+                                csv_path, tmp_dir, view_mode, dpi, render_mode, cache_dir)))
+                    for group, stages in suites:
+                        prefix = os.path.join(args.profile_dir, f"{group}_{view_mode}_{size}_{dpi}")
+                        times = run_stages(stages, args.repeat, args.profile, prefix)
+                        total = sum(np.median(t) for t in times.values())
+                        print(f"{group:>8} {view_mode} {size:>9} {dpi:>4}dpi  总计{total:7.3f}s  "
+                              + "  ".join(f"{name} {np.median(t):.3f}" for name, t in times.items()))
+                        for name, t in times.items():
+                            results.append({'group': group, 'view': view_mode, 'size': size,
+                                            'dpi': dpi, 'stage': name,
+                                            'median': float(np.median(t)), 'min': float(min(t)),
+                                            'runs': len(t)})
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'environment': environment(), 'results': results}, f,
+                      ensure_ascii=False, indent=1)
+        print(f"结果已保存到: {args.output}")
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f"{regressions}个阶段变慢超过{args.threshold:.0%}")
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""
+长时间运行的内存检查：反复打开和渲染大量模拟PRPD图谱，检查常驻内存不持续增长。
+
+分两部分（都在同一进程中，先预热再开始计量）：
+- gui: 在主窗口中逐个打开模拟的PRPD文件，2D/3D视图交替，每个文件都同步绘制画布；
+  期间定期打开再关闭对比窗口和序列分析窗口
+- render: 无界面渲染（prpd_core.render_job_image），2D/3D视图、各渲染方式轮流，
+  颜色方案和DPI组合多于渲染器缓存上限，检查淘汰的模板和每个文件新建的Figure被释放
+
+预热（gui部分GUI_WARMUP次，render部分RENDER_WARMUP次）后的内存增长超过--tolerance时
+返回码为1，可作为内存泄漏的回归检查。
+
+用法:
+    QT_QPA_PLATFORM=offscreen python benchmarks/soak_memory.py [--files 2000] [--renders 2000] [--tolerance 24]
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from prpd_core import COLOR_SCHEMES, RENDERER_CACHE_SIZE, RenderJob, render_job_image
+from prpd_metrics import current_rss_bytes
+from prpd_stream import write_prpd_csv
+
+# 预热的迭代次数（此后的内存增长计入检查）。按次数而不按比例：gui部分打开约150~200个
+# 文件后内存缓存和画布缓冲区才填满，按比例预热时次数少的运行会把填满缓存算作增长
+GUI_WARMUP = 250
+# render部分每48次轮换完所有视图、渲染方式、颜色方案和DPI的组合
+RENDER_WARMUP = 200
+
+# 每部分预热期间和预热后记录内存的次数
+WARMUP_SAMPLES = 5
+SAMPLES = 20
+
+def make_map(rng, rows=64, cols=65):
+    """生成一个模拟的PRPD矩阵（两个放电簇，最后一列为NaN，与样例数据相同）"""
+    phase = np.arange(cols - 1)
+    amp = np.arange(rows)[:, np.newaxis]
+    center = rng.uniform(10, 50)
+    cluster = (np.exp(-((phase - 16) ** 2) / 40 - ((amp - center) ** 2) / 30) +
+               np.exp(-((phase - 48) ** 2) / 40 - ((amp - center * 1.1) ** 2) / 30))
+    data = np.full((rows, cols), np.nan)
+    data[:, :cols - 1] = rng.poisson(cluster * rng.uniform(100, 1000))
+    return data
+
+class MemoryTrace:
+    """按迭代次数记录常驻内存，预热后的增长作为检查结果"""
+    def __init__(self, name, total, warmup):
+        self.name = name
+        self.total = total
+        self.warmup = warmup
+        # 预热期间记录约WARMUP_SAMPLES次，预热后记录约SAMPLES次，与总次数无关
+        self.warmup_interval = max(1, warmup // WARMUP_SAMPLES)
+        self.interval = max(1, (total - warmup) // SAMPLES)
+        self.samples = []  # [(迭代次数, MB)]
+        self.start = time.perf_counter()
+
+    def step(self, done):
+        """完成done次迭代后调用，到达记录间隔（以及预热结束、全部完成）时记录内存"""
+        if done < self.warmup:
+            if done % self.warmup_interval:
+                return
+        elif (done - self.warmup) % self.interval and done != self.total:
+            return
+        self.samples.append((done, current_rss_bytes() / 2**20))
+
+    def growth(self):
+        """预热后到结束的内存增长（MB，结束值取最后3次记录的中位数，减少抖动的影响）"""
+        after = [mb for done, mb in self.samples if done >= self.warmup]
+        return float(np.median(after[-3:]) - after[0])
+
+    def report(self, tolerance):
+        elapsed = time.perf_counter() - self.start
+        curve = " ".join(f"{mb:.0f}" for _, mb in self.samples)
+        growth = self.growth()
+        passed = growth <= tolerance
+        print(f"{self.name}: {self.total}次，{elapsed:.1f}s，内存(MB): {curve}")
+        print(f"  预热（前{self.warmup}次）后增长{growth:+.1f} MB，上限{tolerance:g} MB "
+              f"→ {'通过' if passed else '失败'}")
+        return passed
+
+def soak_gui(count, tmp_dir, rng):
+    """在主窗口中打开count个模拟文件，2D/3D视图交替，定期打开和关闭对比/序列窗口"""
+    from PySide6.QtWidgets import QApplication
+    import PRPD_GUI
+    from prpd_compare import load_maps
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    window = PRPD_GUI.PRPDVisualizer()
+    window.resize(1200, 800)
+    window.show()
+    window.ensure_batch_tab()  # 对比和序列分析使用批处理选项卡的设置
+    # 内存缓存按设置的上限增长是预期的，设得较小使其在预热期间就达到上限
+    window.cache_size_spinbox.setValue(16)
+
+    # 文件数多于缓存可容纳的数量，打开的每个文件都需要重新读取和准备
+    file_count = min(count, 500)
+    files = []
+    for i in range(file_count):
+        file_path = os.path.join(tmp_dir, f"soak{i}_PRPD.csv")
+        write_prpd_csv(file_path, make_map(rng))
+        files.append(file_path)
+
+    def open_and_draw(file_path, view_mode):
+        window.view_mode = view_mode
+        previous = window.displayed_plot
+        window.load_file(file_path)
+        window.plot_timer.stop()
+        window.submit_plot()
+        while window.displayed_plot is previous:
+            app.processEvents()
+            time.sleep(0.001)
+        window.canvas.draw()
+        app.processEvents()
+
+    trace = MemoryTrace("gui（打开文件并绘制画布）", count, GUI_WARMUP)
+    for i in range(count):
+        open_and_draw(files[i % file_count], "2D" if i % 2 == 0 else "3D")
+        if i % 100 == 50:
+            window.show_comparison(load_maps(files[i % file_count:][:16]))
+            window.compare_dialog.canvas.draw()
+            window.compare_dialog.close()
+        if i % 100 == 99:
+            window.sequence_dialog = window.sequence_dialog or PRPD_GUI.SequenceDialog(window)
+            window.sequence_dialog.start(files[:32])
+            window.sequence_dialog.show()
+            window.sequence_dialog.load_thread.wait()
+            app.processEvents()  # 接收读取线程发出的各批帧
+            window.sequence_dialog.canvas.draw()
+            window.sequence_dialog.close()
+        trace.step(i + 1)
+    window.close()
+    app.processEvents()
+    return trace
+
+def soak_render(count, tmp_dir, rng):
+    """无界面渲染count个模拟矩阵，视图、渲染方式、颜色方案和DPI轮流变化"""
+    schemes = list(COLOR_SCHEMES.values())
+    # 颜色方案和DPI的组合多于渲染器缓存上限，检查淘汰的渲染器被释放
+    dpis = [72 + 8 * i for i in range(RENDERER_CACHE_SIZE // len(schemes) + 2)]
+    configs = [(view, mode) for view in ("2D", "3D") for mode in ("template", "raster")]
+    maps = [make_map(rng) for _ in range(64)]
+    trace = MemoryTrace("render（2D/3D，模板/栅格/每个文件新建Figure）", count, RENDER_WARMUP)
+    for i in range(count):
+        view, mode = configs[i % len(configs)]
+        if i % 20 == 0:
+            mode = "figure"  # 每个文件新建Figure的方式较慢，只占一部分
+        scheme = schemes[(i // len(configs)) % len(schemes)]
+        dpi = dpis[(i // (len(configs) * len(schemes))) % len(dpis)]
+        job = RenderJob('', os.path.join(tmp_dir, 'soak.png'), scheme, dpi, view, mode, 25)
+        render_job_image(job, maps[i % len(maps)])
+        trace.step(i + 1)
+    return trace
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=2000, help="gui部分打开的文件次数（0表示跳过）")
+    parser.add_argument('--renders', type=int, default=2000, help="render部分的渲染次数（0表示跳过）")
+    parser.add_argument('--tolerance', type=float, default=24, help="预热后允许的内存增长（MB）")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if 0 < args.files <= GUI_WARMUP or 0 < args.renders <= RENDER_WARMUP:
+        parser.error(f"--files应大于{GUI_WARMUP}，--renders应大于{RENDER_WARMUP}（预热次数）")
+
+    if current_rss_bytes() is None:
+        print("无法获取当前进程的内存（非Linux系统需要安装psutil）")
+        return 1
+    rng = np.random.default_rng(args.seed)
+    tmp_dir = tempfile.mkdtemp(prefix='prpd_soak_')
+    passed = True
+    try:
+        if args.files:
+            passed &= soak_gui(args.files, tmp_dir, rng).report(args.tolerance)
+        if args.renders:
+            passed &= soak_render(args.renders, tmp_dir, rng).report(args.tolerance)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return 0 if passed else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
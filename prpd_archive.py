@@ -0,0 +1,394 @@
+"""
+PRPD图谱归档（.prpda）。
+
+将大量PRPD矩阵保存在一个文件中：矩阵按紧凑整数类型（uint8/uint16等，NaN用最大值表示，
+见prpd_cache.to_compact）每chunk_size个合为一块，按字节重排（同一字节位置的数据放在一起，
+对小整数的高字节效果明显）后用zlib压缩。每个图谱记录来源文件、时间戳（来源文件的修改时间）
+和标签，可按序号随机读取（只解压所在的块，最近读取的块保存在内存中）。
+
+文件结构:
+    魔数(8字节) 块1 块2 ... 索引(npz) 索引偏移(8字节) 魔数(8字节)
+
+归档中的单个图谱用"<归档路径>::<序号>/<原文件名>"形式的路径表示，可像普通CSV路径一样
+传给load_prpd_matrix，因此单文件打开、批处理、缩略图等都可直接使用归档。
+
+用法:
+    python prpd_archive.py pack 尖端放电 -o 尖端放电.prpda --label 尖端放电
+    python prpd_archive.py info 尖端放电.prpda
+    python prpd_archive.py extract 尖端放电.prpda 3 -o corona3.csv
+"""
+import argparse
+import datetime
+import glob
+import io
+import json
+import os
+import re
+import struct
+import sys
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from prpd_cache import from_compact, read_prpd_csv, to_compact
+
+ARCHIVE_EXT = '.prpda'
+MAGIC = b'PRPDARC1'
+TRAILER = struct.Struct('<Q8s')
+
+# 每块的图谱数（越大压缩率略高，但随机读取单个图谱时需解压的数据也越多；
+# 64x65的图谱每块16个与64个压缩率相差不到1%，随机读取快约3倍）
+CHUNK_SIZE = 16
+
+# zlib压缩级别
+LEVEL = 6
+
+# 每个打开的归档在内存中保留的已解压块数
+CACHED_CHUNKS = 8
+
+# 每个进程最多保持打开的归档数（按最近使用淘汰，淘汰时关闭文件）
+ARCHIVE_CACHE_SIZE = 16
+
+# 归档成员路径: <归档路径>::<序号>/<原文件名>
+ARCHIVE_MEMBER_SEP = '::'
+_MEMBER_PATTERN = re.compile(r'^(.*?' + re.escape(ARCHIVE_EXT) + r')' +
+                             re.escape(ARCHIVE_MEMBER_SEP) + r'(\d+)(?:[/\\]|$)')
+
+def split_member_path(file_path):
+    """拆分归档成员路径，返回(归档路径, 序号)，不是归档成员时返回None"""
+    match = _MEMBER_PATTERN.match(file_path)
+    if match is None:
+        return None
+    return match.group(1), int(match.group(2))
+
+def stat_source(file_path):
+    """返回文件的os.stat结果，归档成员返回归档文件的（用于按大小和修改时间判断是否变化）"""
+    member = split_member_path(file_path)
+    return os.stat(member[0] if member else file_path)
+
+def _shuffle(data):
+    """字节重排：(元素数, 字节数)转置为(字节数, 元素数)"""
+    return data.view(np.uint8).reshape(-1, data.itemsize).T.tobytes()
+
+def _unshuffle(raw, dtype):
+    dtype = np.dtype(dtype)
+    return np.frombuffer(raw, dtype=np.uint8).reshape(dtype.itemsize, -1).T.copy().view(dtype).ravel()
+
+def _pack_strings(strings):
+    """将字符串列表编码为(UTF-8字节数组, 偏移数组)"""
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+class ArchiveWriter:
+    """逐个写入图谱，close时写出索引"""
+    def __init__(self, path, chunk_size=CHUNK_SIZE, level=LEVEL, source_dir=None):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.level = level
+        self.source_dir = source_dir  # 来源文件相对于此目录保存
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC)
+        self._pending = []  # 当前块中的紧凑矩阵
+        self.chunks = []  # (偏移, 长度, 类型)
+        self.maps = []  # (块, 块内元素偏移, 行, 列)
+        self.sources = []
+        self.labels = []
+        self.timestamps = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.maps)
+
+    def add(self, data, source='', label='', timestamp=np.nan):
+        """添加一个PRPD矩阵（float或紧凑整数），timestamp为Unix时间（秒）"""
+        compact = data if data.dtype.kind == 'u' else to_compact(data)
+        if self._pending and (compact.dtype != self._pending[0].dtype
+                              or len(self._pending) >= self.chunk_size):
+            self._flush()
+        start = sum(m.size for m in self._pending)
+        self.maps.append((len(self.chunks), start) + compact.shape)
+        self._pending.append(compact)
+        if self.source_dir and source:
+            source = os.path.relpath(source, self.source_dir)
+        self.sources.append(source)
+        self.labels.append(label)
+        self.timestamps.append(timestamp)
+
+    def _flush(self):
+        """压缩并写出当前块"""
+        dtype = self._pending[0].dtype
+        data = np.concatenate([m.ravel() for m in self._pending])
+        payload = zlib.compress(_shuffle(data), self.level)
+        self.chunks.append((self._file.tell(), len(payload), dtype.str))
+        self._file.write(payload)
+        self._pending = []
+
+    def close(self):
+        """写出最后一块和索引"""
+        if self._file is None:
+            return
+        if self._pending:
+            self._flush()
+        label_names = sorted(set(self.labels))
+        label_codes = {name: code for code, name in enumerate(label_names)}
+        sources, source_offsets = _pack_strings(self.sources)
+        maps = np.array(self.maps, dtype=np.uint64).reshape(-1, 4)
+        buf = io.BytesIO()
+        np.savez_compressed(
+            buf,
+            chunk_offsets=np.array([c[0] for c in self.chunks], dtype=np.uint64),
+            chunk_lengths=np.array([c[1] for c in self.chunks], dtype=np.uint64),
+            chunk_dtypes=np.array([c[2] for c in self.chunks], dtype='U8'),
+            map_chunks=maps[:, 0].astype(np.uint32),
+            map_starts=maps[:, 1],
+            map_shapes=maps[:, 2:].astype(np.uint32),
+            timestamps=np.array(self.timestamps, dtype=np.float64),
+            label_codes=np.array([label_codes[label] for label in self.labels], dtype=np.uint32),
+            sources=sources,
+            source_offsets=source_offsets,
+            meta=np.frombuffer(json.dumps({
+                'version': 1, 'chunk_size': self.chunk_size, 'labels': label_names,
+                'source_dir': os.path.abspath(self.source_dir) if self.source_dir else None,
+            }, ensure_ascii=False).encode('utf-8'), dtype=np.uint8),
+        )
+        index_offset = self._file.tell()
+        self._file.write(buf.getvalue())
+        self._file.write(TRAILER.pack(index_offset, MAGIC))
+        self._file.close()
+        self._file = None
+
+class PRPDArchive:
+    """只读打开的PRPD归档，可在多个线程中同时读取"""
+    def __init__(self, path, cached_chunks=CACHED_CHUNKS):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._lock = threading.Lock()
+        self._chunks = OrderedDict()  # 块序号 -> 解压后的一维数组（LRU）
+        self.cached_chunks = cached_chunks
+        if self._file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"不是PRPD归档文件: {path}")
+        self._file.seek(-TRAILER.size, os.SEEK_END)
+        index_offset, magic = TRAILER.unpack(self._file.read(TRAILER.size))
+        if magic != MAGIC:
+            raise ValueError(f"归档文件不完整: {path}")
+        index_length = self._file.seek(0, os.SEEK_END) - TRAILER.size - index_offset
+        self._file.seek(index_offset)
+        with np.load(io.BytesIO(self._file.read(index_length))) as index:
+            self.index = {name: index[name] for name in index.files}
+        self.meta = json.loads(self.index.pop('meta').tobytes().decode('utf-8'))
+        self.labels = self.meta['labels']
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        # 等待其他线程正在进行的读取完成
+        with self._lock:
+            self._file.close()
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def __len__(self):
+        return len(self.index['map_chunks'])
+
+    def __getitem__(self, i):
+        """第i个图谱（float64矩阵，NaN已还原）"""
+        return from_compact(self.read_compact(i))
+
+    def _read_chunk(self, chunk):
+        """返回解压后的块（一维紧凑整数数组）"""
+        with self._lock:
+            data = self._chunks.get(chunk)
+            if data is not None:
+                self._chunks.move_to_end(chunk)
+                return data
+            if self._file.closed:
+                raise ValueError(f"归档已关闭: {self.path}")
+            self._file.seek(int(self.index['chunk_offsets'][chunk]))
+            payload = self._file.read(int(self.index['chunk_lengths'][chunk]))
+        data = _unshuffle(zlib.decompress(payload), self.index['chunk_dtypes'][chunk])
+        with self._lock:
+            self._chunks[chunk] = data
+            while len(self._chunks) > self.cached_chunks:
+                self._chunks.popitem(last=False)
+        return data
+
+    def read_compact(self, i):
+        """第i个图谱的紧凑整数矩阵（只读）"""
+        if not 0 <= i < len(self):
+            raise IndexError(f"归档中没有第{i}个图谱（共{len(self)}个）")
+        data = self._read_chunk(int(self.index['map_chunks'][i]))
+        start = int(self.index['map_starts'][i])
+        rows, cols = (int(v) for v in self.index['map_shapes'][i])
+        return data[start:start + rows * cols].reshape(rows, cols)
+
+    def iter_compact(self, start=0, stop=None):
+        """按顺序产出(序号, 紧凑整数矩阵)，每块只解压一次"""
+        for i in range(start, len(self) if stop is None else min(stop, len(self))):
+            yield i, self.read_compact(i)
+
+    def source(self, i):
+        """第i个图谱的来源文件（打包时相对于来源目录）"""
+        offsets = self.index['source_offsets']
+        return self.index['sources'][int(offsets[i]):int(offsets[i + 1])].tobytes().decode('utf-8')
+
+    def label(self, i):
+        return self.labels[int(self.index['label_codes'][i])]
+
+    def timestamp(self, i):
+        """第i个图谱的时间戳（Unix时间，未知时为None）"""
+        value = float(self.index['timestamps'][i])
+        return None if np.isnan(value) else value
+
+    def info(self, i):
+        """第i个图谱的元数据"""
+        return {'index': i, 'source': self.source(i), 'label': self.label(i),
+                'timestamp': self.timestamp(i),
+                'shape': tuple(int(v) for v in self.index['map_shapes'][i])}
+
+    def member_path(self, i):
+        """第i个图谱的成员路径（可传给load_prpd_matrix）"""
+        return f"{self.path}{ARCHIVE_MEMBER_SEP}{i}/{os.path.basename(self.source(i)) or i}"
+
+    def member_paths(self):
+        return [self.member_path(i) for i in range(len(self))]
+
+# 每个进程内按路径缓存的已打开归档（按最近使用排序）: 绝对路径 -> (大小, 修改时间, 归档)
+_archives = OrderedDict()
+_archives_lock = threading.Lock()
+
+def get_archive(path):
+    """获取（必要时打开）归档，文件变化后关闭旧的归档并重新打开"""
+    key = os.path.abspath(path)
+    stat = os.stat(key)
+    with _archives_lock:
+        cached = _archives.get(key)
+        if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            _archives.move_to_end(key)
+            return cached[2]
+        archive = PRPDArchive(path)
+        if cached is not None:
+            cached[2].close()
+        _archives[key] = (stat.st_size, stat.st_mtime_ns, archive)
+        _archives.move_to_end(key)
+        while len(_archives) > ARCHIVE_CACHE_SIZE:
+            _archives.popitem(last=False)[1][2].close()
+        return archive
+
+def read_member_compact(file_path):
+    """读取归档成员的紧凑整数矩阵"""
+    archive_path, index = split_member_path(file_path)
+    archive = get_archive(archive_path)
+    try:
+        return archive.read_compact(index)
+    except ValueError:
+        if not archive.closed:
+            raise
+    # 取得归档后、读取前被其他线程关闭（从缓存中淘汰，或文件变化后被替换），重新获取一次
+    return get_archive(archive_path).read_compact(index)
+
+def read_member(file_path):
+    """读取归档成员（float64矩阵）"""
+    return from_compact(read_member_compact(file_path))
+
+def expand_archive(path):
+    """归档文件展开为成员路径列表"""
+    return get_archive(path).member_paths()
+
+def pack_files(files, output_path, label=None, chunk_size=CHUNK_SIZE, level=LEVEL,
+               source_dir=None):
+    """将PRPD CSV文件打包为归档，label为None时使用文件所在目录名，返回失败的[(文件, 错误信息)]"""
+    errors = []
+    with ArchiveWriter(output_path, chunk_size, level, source_dir) as writer:
+        for file_path in files:
+            try:
+                data = read_prpd_csv(file_path)
+                timestamp = os.stat(file_path).st_mtime
+            except (OSError, ValueError) as e:
+                errors.append((file_path, str(e)))
+                continue
+            file_label = label or os.path.basename(os.path.dirname(os.path.abspath(file_path)))
+            writer.add(data, file_path, file_label, timestamp)
+    return errors
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PRPD图谱归档工具")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    pack_parser = subparsers.add_parser('pack', help="将CSV文件打包为归档")
+    pack_parser.add_argument('inputs', nargs='+', help="PRPD CSV文件、目录或通配符")
+    pack_parser.add_argument('-o', '--output', help=f"输出文件（默认为第一个输入的名称+{ARCHIVE_EXT}）")
+    pack_parser.add_argument('--label', help="标签（默认为文件所在目录名）")
+    pack_parser.add_argument('--pattern', default='*.csv', help="目录中的文件匹配模式")
+    pack_parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="每块的图谱数")
+    pack_parser.add_argument('--level', type=int, default=LEVEL, help="zlib压缩级别（1-9）")
+
+    info_parser = subparsers.add_parser('info', help="显示归档信息")
+    info_parser.add_argument('archive')
+    info_parser.add_argument('--list', action='store_true', help="列出所有图谱")
+
+    extract_parser = subparsers.add_parser('extract', help="将图谱导出为CSV")
+    extract_parser.add_argument('archive')
+    extract_parser.add_argument('indices', nargs='+', type=int, help="图谱序号")
+    extract_parser.add_argument('-o', '--output-dir', default='.', help="输出目录")
+
+    args = parser.parse_args(argv)
+    if args.command == 'pack':
+        files = []
+        for item in args.inputs:
+            if os.path.isdir(item):
+                files.extend(sorted(glob.glob(os.path.join(item, args.pattern))))
+            else:
+                files.extend(sorted(glob.glob(item)) if glob.has_magic(item) else [item])
+        if not files:
+            parser.error("没有找到要打包的文件")
+        output = args.output or os.path.normpath(args.inputs[0]) + ARCHIVE_EXT
+        source_dir = os.path.commonpath([os.path.dirname(os.path.abspath(f)) for f in files])
+        errors = pack_files(files, output, args.label, args.chunk_size, args.level, source_dir)
+        for file_path, error in errors:
+            print(f"读取文件失败: {file_path} - {error}", file=sys.stderr)
+        csv_size = sum(os.path.getsize(f) for f in files if os.path.exists(f))
+        size = os.path.getsize(output)
+        print(f"已打包{len(files) - len(errors)}个文件到: {output}（{size / 1024:.1f} KB，"
+              f"CSV共{csv_size / 1024:.1f} KB，压缩为{size / max(csv_size, 1) * 100:.1f}%）")
+        return 1 if errors else 0
+
+    with PRPDArchive(args.archive) as archive:
+        if args.command == 'info':
+            print(f"{args.archive}: {len(archive)}个图谱，{len(archive.index['chunk_offsets'])}块"
+                  f"（每块{archive.meta['chunk_size']}个），{os.path.getsize(args.archive) / 1024:.1f} KB")
+            print(f"来源目录: {archive.meta['source_dir']}")
+            print(f"标签: {', '.join(archive.labels)}")
+            if args.list:
+                for i in range(len(archive)):
+                    info = archive.info(i)
+                    time_text = (datetime.datetime.fromtimestamp(info['timestamp']).isoformat(' ', 'seconds')
+                                 if info['timestamp'] is not None else '-')
+                    print(f"{i}\t{info['label']}\t{time_text}\t{info['shape'][0]}x{info['shape'][1]}\t"
+                          f"{info['source']}")
+        else:
+            from prpd_stream import write_prpd_csv
+            os.makedirs(args.output_dir, exist_ok=True)
+            for i in args.indices:
+                name = os.path.basename(archive.source(i)) or f"{i}.csv"
+                save_path = os.path.join(args.output_dir, name)
+                write_prpd_csv(save_path, archive[i])
+                print(f"{archive.member_path(i)} -> {save_path}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
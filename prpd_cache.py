@@ -0,0 +1,298 @@
+"""
+PRPD矩阵的二进制缓存。
+
+CSV解析后的矩阵以紧凑整数.npy格式保存在缓存目录中，之后可直接（或内存映射）加载，
+无需再次解析文本。缓存按文件内容哈希存储，并通过文件大小和修改时间判断是否失效。
+LRUCache是按内存大小限制的进程内缓存，界面用它保存解析后的矩阵和绘图数据。
+
+用法:
+    python prpd_cache.py pack 尖端放电 -o 尖端放电_pack
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# 缓存目录，可通过环境变量PRPD_CACHE_DIR修改
+DEFAULT_CACHE_DIR = os.environ.get(
+    'PRPD_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.prpd_cache'))
+
+def read_prpd_csv(file_path):
+    """解析PRPD CSV文件，返回float64矩阵（与pd.read_csv(header=None).values一致）
+
+    空行被跳过，空字段（如行尾逗号）和较短的行补为NaN。
+    """
+    with open(file_path, 'r', encoding='utf-8-sig') as f:
+        rows = [line.rstrip('\r\n').split(',') for line in f if line.strip()]
+    if not rows:
+        raise ValueError(f"文件中没有数据: {file_path}")
+    return rows_to_matrix(rows)
+
+def rows_to_matrix(rows):
+    """将已按逗号拆分的文本行转换为float64矩阵，空字段和较短的行补为NaN"""
+    width = max(len(row) for row in rows)
+    data = np.full((len(rows), width), np.nan)
+    for i, row in enumerate(rows):
+        data[i, :len(row)] = [float(v) if v.strip() else np.nan for v in row]
+    return data
+
+def to_compact(data):
+    """将PRPD矩阵转换为紧凑整数数组
+
+    NaN（如行尾逗号产生的空列）用对应整数类型的最大值表示。
+    含负数或非整数值的矩阵无法压缩，原样返回。
+    """
+    data = np.asarray(data, dtype=np.float64)
+    nan_mask = np.isnan(data)
+    finite = data[~nan_mask]
+    if finite.size and (finite.min() < 0 or not np.array_equal(finite, np.round(finite))):
+        return data
+    max_value = finite.max() if finite.size else 0
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_value < np.iinfo(dtype).max:
+            break
+    else:
+        return data
+    compact = np.where(nan_mask, np.iinfo(dtype).max, data).astype(dtype)
+    return compact
+
+def from_compact(compact):
+    """将紧凑整数数组还原为float64矩阵（哨兵值还原为NaN）"""
+    if compact.dtype.kind not in 'ui':
+        return np.asarray(compact, dtype=np.float64)
+    data = compact.astype(np.float64)
+    data[compact == np.iinfo(compact.dtype).max] = np.nan
+    return data
+
+def _atomic_write(path, writer, mode='wb'):
+    """先写临时文件再替换，避免并行进程（或线程）读到半写入的文件"""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, mode, **({} if 'b' in mode else {'encoding': 'utf-8'})) as f:
+        writer(f)
+    os.replace(tmp_path, path)
+
+class PRPDCache:
+    """PRPD矩阵的磁盘缓存"""
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.data_dir = os.path.join(self.cache_dir, 'data')
+        self.index_dir = os.path.join(self.cache_dir, 'index')
+        os.makedirs(self.data_dir, exist_ok=True)
+        os.makedirs(self.index_dir, exist_ok=True)
+
+    def _index_path(self, file_path):
+        key = hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()
+        return os.path.join(self.index_dir, f"{key}.json")
+
+    def _data_path(self, content_hash):
+        return os.path.join(self.data_dir, f"{content_hash}.npy")
+
+    def _lookup(self, file_path, stat):
+        """根据大小和修改时间查找已缓存的内容哈希"""
+        try:
+            with open(self._index_path(file_path), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get('size') != stat.st_size or entry.get('mtime_ns') != stat.st_mtime_ns:
+            return None
+        return entry.get('hash')
+
+    def load_compact(self, file_path, mmap=False):
+        """加载紧凑整数矩阵，缓存未命中时解析CSV并写入缓存"""
+        stat = os.stat(file_path)
+        content_hash = self._lookup(file_path, stat)
+        if content_hash is not None:
+            try:
+                return np.load(self._data_path(content_hash), mmap_mode='r' if mmap else None)
+            except (OSError, ValueError):
+                pass
+
+        # 按内容哈希查找，内容相同的文件共用一份缓存
+        with open(file_path, 'rb') as f:
+            content_hash = hashlib.sha1(f.read()).hexdigest()
+        data_path = self._data_path(content_hash)
+        if os.path.exists(data_path):
+            compact = np.load(data_path, mmap_mode='r' if mmap else None)
+        else:
+            compact = to_compact(read_prpd_csv(file_path))
+            _atomic_write(data_path, lambda f: np.save(f, compact))
+
+        entry = {'path': os.path.abspath(file_path), 'size': stat.st_size,
+                 'mtime_ns': stat.st_mtime_ns, 'hash': content_hash}
+        _atomic_write(self._index_path(file_path), lambda f: json.dump(entry, f), mode='w')
+        return compact
+
+    def load(self, file_path):
+        """加载PRPD矩阵（float64，NaN与pd.read_csv结果一致）"""
+        return from_compact(self.load_compact(file_path))
+
+_default_cache = None
+
+def load_prpd_matrix(file_path, cache_dir=None):
+    """通过缓存加载PRPD矩阵，缓存不可用时直接解析CSV（归档成员直接从归档读取）"""
+    global _default_cache
+    # 延迟导入，prpd_archive依赖本模块
+    from prpd_archive import read_member, split_member_path
+    if split_member_path(file_path) is not None:
+        return read_member(file_path)
+    try:
+        if cache_dir is not None:
+            return PRPDCache(cache_dir).load(file_path)
+        if _default_cache is None:
+            _default_cache = PRPDCache()
+        return _default_cache.load(file_path)
+    except OSError:
+        # 缓存目录不可写等情况，退回直接解析
+        return read_prpd_csv(file_path)
+
+def estimate_nbytes(value):
+    """估算缓存值占用的内存（数组按nbytes计，字典、列表和元组递归累加）"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(estimate_nbytes(v) for v in value.values()) + sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_nbytes(v) for v in value) + sys.getsizeof(value)
+    return sys.getsizeof(value)
+
+class LRUCache:
+    """按内存大小限制的LRU缓存（不是线程安全的，应只在一个线程中使用）"""
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()  # 键 -> (值, 字节数)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        """查找并标记为最近使用"""
+        item = self._items.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._items.move_to_end(key)
+        return item[0]
+
+    def put(self, key, value, nbytes=None):
+        """写入缓存，超出上限时淘汰最久未使用的项（单项超过上限时不缓存）"""
+        nbytes = estimate_nbytes(value) if nbytes is None else nbytes
+        if key in self._items:
+            self.size_bytes -= self._items.pop(key)[1]
+        if nbytes > self.max_bytes:
+            return
+        self._items[key] = (value, nbytes)
+        self.size_bytes += nbytes
+        self._evict()
+
+    def resize(self, max_bytes):
+        """修改大小上限"""
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def clear(self):
+        self._items.clear()
+        self.size_bytes = 0
+
+    def _evict(self):
+        while self.size_bytes > self.max_bytes:
+            _, (_, nbytes) = self._items.popitem(last=False)
+            self.size_bytes -= nbytes
+            self.evictions += 1
+
+    def summary(self):
+        """返回命中统计和占用的文字说明"""
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0
+        return (f"命中{self.hits}/{total}（{rate:.0f}%），{len(self)}项，"
+                f"{self.size_bytes / 2**20:.1f}/{self.max_bytes / 2**20:.0f} MB")
+
+def pack_archive(input_dir, output_prefix, pattern='*.csv', cache_dir=None):
+    """将目录中的PRPD文件合并为一个可内存映射的三维数组和文件索引
+
+    生成output_prefix.npy（形状为(N, 行, 列)）和output_prefix.json（文件索引），
+    形状与第一个文件不一致的文件会被跳过。返回(已打包文件列表, 跳过文件列表)。
+    """
+    files = sorted(glob.glob(os.path.join(input_dir, pattern)))
+    if not files:
+        raise FileNotFoundError(f"未找到匹配的文件: {os.path.join(input_dir, pattern)}")
+
+    cache = PRPDCache(cache_dir)
+    matrices = []
+    packed, skipped = [], []
+    for file_path in files:
+        compact = cache.load_compact(file_path)
+        if matrices and compact.shape != matrices[0].shape:
+            skipped.append(file_path)
+            continue
+        matrices.append(compact)
+        packed.append(file_path)
+
+    # 统一为能容纳所有矩阵的类型，直接写入内存映射文件，并保持NaN哨兵值
+    if all(m.dtype.kind == 'u' for m in matrices):
+        dtype = max((m.dtype for m in matrices), key=lambda d: d.itemsize)
+    else:
+        dtype = np.dtype(np.float64)
+
+    output_dir = os.path.dirname(os.path.abspath(output_prefix))
+    os.makedirs(output_dir, exist_ok=True)
+    stack = np.lib.format.open_memmap(f"{output_prefix}.npy", mode='w+', dtype=dtype,
+                                      shape=(len(matrices),) + matrices[0].shape)
+    for i, compact in enumerate(matrices):
+        if dtype.kind == 'u':
+            stack[i] = compact
+            stack[i][compact == np.iinfo(compact.dtype).max] = np.iinfo(dtype).max
+        else:
+            stack[i] = from_compact(compact)
+    stack.flush()
+    index = {
+        'shape': list(stack.shape),
+        'dtype': str(stack.dtype),
+        'files': [os.path.relpath(p, input_dir) for p in packed],
+        'source_dir': os.path.abspath(input_dir),
+    }
+    with open(f"{output_prefix}.json", 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+    return packed, skipped
+
+def open_archive(output_prefix):
+    """以内存映射方式打开打包的数组，返回(数组, 文件索引)"""
+    with open(f"{output_prefix}.json", 'r', encoding='utf-8') as f:
+        index = json.load(f)
+    stack = np.load(f"{output_prefix}.npy", mmap_mode='r')
+    return stack, index
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PRPD二进制缓存工具")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    pack_parser = subparsers.add_parser('pack', help="将目录打包为内存映射数组")
+    pack_parser.add_argument('input_dir', help="PRPD CSV文件所在目录")
+    pack_parser.add_argument('-o', '--output', help="输出文件前缀（默认为目录名_pack）")
+    pack_parser.add_argument('--pattern', default='*.csv', help="文件匹配模式")
+    pack_parser.add_argument('--cache-dir', help="缓存目录")
+
+    args = parser.parse_args(argv)
+    if args.command == 'pack':
+        output = args.output or os.path.normpath(args.input_dir) + '_pack'
+        packed, skipped = pack_archive(args.input_dir, output, args.pattern, args.cache_dir)
+        print(f"已打包{len(packed)}个文件到: {output}.npy")
+        for file_path in skipped:
+            print(f"形状不一致，已跳过: {file_path}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
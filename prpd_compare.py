@@ -0,0 +1,216 @@
+"""
+多图谱对比（无界面）。
+
+将多个PRPD图按网格排列在同一个Figure中：子图共享相位/电压坐标轴，所有图像共用一个
+颜色范围和colorbar，布局只计算一次。文件在线程池中并发读取。整个目录可按页导出为
+对比总览图（contact sheet），读取下一页与渲染当前页同时进行。
+
+用法:
+    python prpd_compare.py 尖端放电 -o 输出目录 --columns 4 --per-page 16 --dpi 200
+"""
+import argparse
+import math
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import LinearSegmentedColormap, Normalize
+from matplotlib.figure import Figure
+
+from prpd_cache import load_prpd_matrix
+from prpd_core import (COLOR_SCHEMES, PRPDRenderTemplate, expand_inputs, parse_color_scheme,
+                       save_figure, tight_bbox)
+from prpd_events import AMP_BINS, PHASE_BINS, EventBinning, events_to_prpd
+
+# 对比总览图的文件名模板，可用字段: name（名称）、page（页码，从1开始）
+CONTACT_NAME_TEMPLATE = "{name}_对比_{page:03d}.png"
+
+# 每页对比总览图的图谱数
+PER_PAGE = 16
+
+# 并发读取的线程数
+LOAD_WORKERS = 4
+
+def load_map(file_path, events=None):
+    """读取PRPD矩阵（或由脉冲事件分箱），返回(文件路径, 矩阵, 错误信息)，失败时矩阵为None"""
+    try:
+        if events is not None:
+            return file_path, events_to_prpd(file_path, events), None
+        return file_path, load_prpd_matrix(file_path), None
+    except Exception as e:
+        return file_path, None, str(e)
+
+def load_maps(file_list, events=None, workers=LOAD_WORKERS):
+    """并发读取多个文件，按输入顺序返回[(文件路径, 矩阵, 错误信息)]"""
+    with ThreadPoolExecutor(workers) as pool:
+        return list(pool.map(lambda file_path: load_map(file_path, events), file_list))
+
+def grid_shape(count, columns=None):
+    """返回count个子图的(行数, 列数)，未指定列数时接近正方形排列"""
+    count = max(count, 1)
+    columns = min(columns or math.ceil(math.sqrt(count)), count)
+    return math.ceil(count / columns), columns
+
+def shared_clim(maps):
+    """所有矩阵共同的颜色范围（忽略NaN和读取失败的矩阵）"""
+    valid = [data for data in maps if data is not None and np.isfinite(data).any()]
+    if not valid:
+        return 0, 1
+    low = min(np.nanmin(data) for data in valid)
+    high = max(np.nanmax(data) for data in valid)
+    return low, high if high > low else low + 1
+
+def map_title(file_path):
+    """子图标题（文件名，不含扩展名）"""
+    return os.path.splitext(os.path.basename(file_path))[0]
+
+class PRPDComparisonFigure:
+    """PRPD对比网格图
+
+    rows×columns个2D子图共享坐标轴和同一个Normalize，右侧只有一个colorbar。
+    Figure、坐标轴和colorbar只创建一次，布局和裁剪框也只计算一次，之后通过update
+    更新图像数据、标题和颜色范围（与PRPDRenderTemplate相同），图谱数少于网格时
+    隐藏多余的子图。fig为None时创建Agg后端的Figure，也可传入界面画布的Figure。
+    """
+    PANEL_SIZE = (3.2, 2.4)  # 每个子图的大小（英寸）
+
+    def __init__(self, color_scheme, count, columns=None, dpi=100, fig=None):
+        self.dpi = dpi
+        self.rows, self.columns = grid_shape(count, columns)
+        if fig is None:
+            width, height = self.PANEL_SIZE
+            fig = Figure(figsize=(width * self.columns + 1, height * self.rows), dpi=100)
+            FigureCanvasAgg(fig)
+        self.fig = fig
+        self.norm = Normalize()
+        custom_cmap = LinearSegmentedColormap.from_list('custom', color_scheme)
+
+        # 最后一列为colorbar
+        grid = fig.add_gridspec(self.rows, self.columns + 1,
+                                width_ratios=[1] * self.columns + [0.05])
+        self.axes = []
+        self.images = []
+        for index in range(self.rows * self.columns):
+            row, column = divmod(index, self.columns)
+            first = self.axes[0] if self.axes else None
+            ax = fig.add_subplot(grid[row, column], sharex=first, sharey=first)
+            img = ax.imshow(np.zeros((2, 2)), cmap=custom_cmap, norm=self.norm, origin='lower',
+                            extent=[0, 360, 0, 100], aspect='auto')
+            ax.set_xticks(np.arange(0, 361, 90))
+            ax.set_yticks(np.arange(0, 101, 25))
+            ax.set_title(' ', fontsize=9)
+            if column == 0:
+                ax.set_ylabel('电压 (%)')
+            else:
+                ax.tick_params(labelleft=False)
+            self.axes.append(ax)
+            self.images.append(img)
+        self.set_outer_labels(count)
+        self.cbar = fig.colorbar(self.images[0], cax=fig.add_subplot(grid[:, -1]))
+
+        # 按较宽的colorbar刻度标签只调整一次布局
+        self.norm.vmin, self.norm.vmax = PRPDRenderTemplate.RESERVED_CLIM
+        fig.tight_layout()
+        self.bbox_inches = None
+
+    def set_outer_labels(self, count):
+        """相位标签和刻度标签只显示在每列最下方的子图上"""
+        for index, ax in enumerate(self.axes):
+            bottom = index + self.columns >= count
+            ax.set_xlabel('相位 (°)' if bottom else '')
+            ax.tick_params(labelbottom=bottom)
+
+    def update(self, maps, titles, clim=None):
+        """更新图像数据和标题，所有图像使用同一颜色范围（默认为所有矩阵的范围）"""
+        if clim is None:
+            clim = shared_clim(maps)
+        for index, (ax, img) in enumerate(zip(self.axes, self.images)):
+            ax.set_visible(index < len(maps))
+            if index >= len(maps):
+                continue
+            # 读取失败的图谱显示为空白
+            img.set_data(maps[index] if maps[index] is not None else np.full((2, 2), np.nan))
+            ax.set_title(titles[index], fontsize=9)
+        self.set_outer_labels(len(maps))
+        self.images[0].set_clim(*clim)
+
+    def save(self, save_path):
+        """保存图像（Agg后端，裁剪框在第一次保存时计算）"""
+        if self.bbox_inches is None:
+            self.bbox_inches = tight_bbox(self.fig, self.dpi)
+        save_figure(self.fig, save_path, self.dpi, self.bbox_inches)
+
+def iter_contact_sheets(file_list, save_dir, color_scheme, dpi=200, per_page=PER_PAGE,
+                        columns=None, events=None, name="PRPD", clim=None, workers=LOAD_WORKERS):
+    """将文件列表按页导出为对比总览图，逐页产出(保存路径, 该页文件列表, [(文件路径, 错误信息)])
+
+    每页共用一个颜色范围（clim为None时取该页所有矩阵的范围，指定时所有页相同，
+    便于跨页比较）。所有页复用同一个PRPDComparisonFigure，读取线程池预取下一页。
+    """
+    pages = [file_list[start:start + per_page] for start in range(0, len(file_list), per_page)]
+    if not pages:
+        return
+    sheet = PRPDComparisonFigure(color_scheme, len(pages[0]), columns, dpi)
+    with ThreadPoolExecutor(workers) as pool:
+        def submit(page):
+            return [pool.submit(load_map, file_path, events) for file_path in page]
+
+        pending = submit(pages[0])
+        for number, page in enumerate(pages, 1):
+            results = [future.result() for future in pending]
+            if number < len(pages):
+                pending = submit(pages[number])
+            sheet.update([data for _, data, _ in results],
+                         [map_title(file_path) for file_path in page], clim)
+            save_path = os.path.join(save_dir, CONTACT_NAME_TEMPLATE.format(name=name, page=number))
+            sheet.save(save_path)
+            yield save_path, page, [(file_path, error) for file_path, _, error in results if error]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PRPD多图谱对比总览图（无界面）")
+    parser.add_argument('inputs', nargs='+', help="PRPD CSV文件、目录或通配符")
+    parser.add_argument('-o', '--output-dir', default='.', help="输出目录")
+    parser.add_argument('--name', help="输出文件名中的名称（默认为第一个输入的名称）")
+    parser.add_argument('--per-page', type=int, default=PER_PAGE, help="每页的图谱数")
+    parser.add_argument('--columns', type=int, help="每行的图谱数（默认接近正方形排列）")
+    parser.add_argument('--scheme', type=parse_color_scheme, default=COLOR_SCHEMES["默认方案"],
+                        help="颜色方案名称或逗号分隔的颜色列表")
+    parser.add_argument('--dpi', type=int, default=200, help="保存DPI")
+    parser.add_argument('--vmin', type=float, help="固定颜色范围下限（与--vmax一起指定时所有页相同）")
+    parser.add_argument('--vmax', type=float, help="固定颜色范围上限")
+    parser.add_argument('--pattern', default='*.csv', help="目录中的文件匹配模式")
+    parser.add_argument('--workers', type=int, default=LOAD_WORKERS, help="并发读取的线程数")
+    parser.add_argument('--events', action='store_true',
+                        help="输入为原始脉冲事件（列: 相位或时间戳, 放电量），按分箱生成PRPD图")
+    parser.add_argument('--phase-bins', type=int, default=PHASE_BINS, help="脉冲事件的相位分箱数")
+    parser.add_argument('--amp-bins', type=int, default=AMP_BINS, help="脉冲事件的幅值分箱数")
+    parser.add_argument('--frequency', type=float,
+                        help="脉冲事件第一列为时间戳（秒）时的工频（Hz）")
+    args = parser.parse_args(argv)
+
+    files = expand_inputs(args.inputs, args.pattern)
+    if not files:
+        parser.error("没有找到要处理的文件")
+    if (args.vmin is None) != (args.vmax is None):
+        parser.error("--vmin和--vmax需要同时指定")
+    os.makedirs(args.output_dir, exist_ok=True)
+    name = args.name or os.path.splitext(os.path.basename(os.path.normpath(args.inputs[0])))[0]
+    clim = None if args.vmin is None else (args.vmin, args.vmax)
+    events = None
+    if args.events:
+        events = EventBinning(args.phase_bins, args.amp_bins, frequency=args.frequency)
+
+    failed = 0
+    for save_path, page, errors in iter_contact_sheets(files, args.output_dir, args.scheme,
+                                                       args.dpi, args.per_page, args.columns,
+                                                       events, name, clim, args.workers):
+        print(f"{len(page)}个文件 -> {save_path}")
+        for file_path, error in errors:
+            failed += 1
+            print(f"读取文件失败: {file_path} - {error}", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,993 @@
+"""
+PRPD渲染核心（无界面）。
+
+只依赖NumPy和Matplotlib的Agg后端（不导入pyplot和Qt），可在无显示器的渲染节点上使用，
+PRPD_GUI.py的批处理也基于此模块。
+
+用法:
+    python prpd_core.py 尖端放电 -o 输出目录 --view 2D --scheme 默认方案 --dpi 300 --workers 4 --render raster
+"""
+import time
+
+_IMPORT_START = time.perf_counter()
+
+import argparse
+import contextlib
+import glob
+import io
+import json
+import multiprocessing
+import os
+import struct
+import sys
+import threading
+import zlib
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import matplotlib
+import numpy as np
+from matplotlib import font_manager, ticker
+from matplotlib import image as mimage
+from matplotlib import transforms as mtransforms
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import LinearSegmentedColormap
+from matplotlib.figure import Figure
+from matplotlib.font_manager import FontProperties
+from matplotlib.ft2font import FT2Font
+
+from prpd_archive import ARCHIVE_EXT, expand_archive
+from prpd_cache import DEFAULT_CACHE_DIR, load_prpd_matrix
+from prpd_events import AMP_BINS, PHASE_BINS, EventBinning, events_to_prpd
+from prpd_manifest import JobManifest
+from prpd_metrics import BATCH_LOG_NAME, STAGES, BatchMetrics, format_snapshot, peak_rss_bytes
+from prpd_preprocess import (add_preprocess_arguments, color_limits, data_limits,
+                             fix_global_limits, preprocess_from_args, preprocess_maps)
+
+# 中文字体候选（按优先顺序），使用第一个已安装的字体
+CJK_FONTS = ['SimHei', 'Microsoft YaHei', 'PingFang SC', 'Noto Sans CJK SC', 'Source Han Sans SC',
+             'WenQuanYi Micro Hei', 'WenQuanYi Zen Hei']
+
+def resolve_cjk_font(cache_dir=None):
+    """返回第一个已安装的中文字体名称（都没有时返回None）
+
+    查找结果按Matplotlib版本和字体数缓存在缓存目录的font.json中，之后启动时直接使用。
+    rcParams中只放已安装的字体，绘图时不会因查找不存在的字体而反复遍历字体列表。
+    """
+    cache_path = os.path.join(cache_dir or DEFAULT_CACHE_DIR, 'font.json')
+    key = [matplotlib.__version__, len(font_manager.fontManager.ttflist), CJK_FONTS]
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            cached = json.load(f)
+        if cached['key'] == key:
+            return cached['font']
+    except (OSError, ValueError, KeyError):
+        pass
+
+    installed = {entry.name for entry in font_manager.fontManager.ttflist}
+    font = next((name for name in CJK_FONTS if name in installed), None)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, 'w', encoding='utf-8') as f:
+            json.dump({'key': key, 'font': font}, f, ensure_ascii=False)
+    except OSError:
+        pass  # 缓存目录不可写时每次启动重新查找
+    return font
+
+def configure_fonts():
+    """设置中文字体（没有中文字体时保留Matplotlib的默认字体）"""
+    font = resolve_cjk_font()
+    if font is not None:
+        matplotlib.rcParams['font.sans-serif'] = [font] + matplotlib.rcParams['font.sans-serif']
+    # 解决负号"-"显示为方块的问题
+    matplotlib.rcParams['axes.unicode_minus'] = False
+
+configure_fonts()
+
+# 预定义颜色方案
+COLOR_SCHEMES = {
+    "默认方案": ['#000000', '#FFFFFE', '#FFFF13', '#FF0000'],
+    "蓝绿红": ['#0000FF', '#00FFFF', '#00FF00', '#FF0000'],
+    "黑蓝紫": ['#000000', '#0000FF', '#800080', '#FF00FF'],
+    "绿黄红": ['#006400', '#7FFF00', '#FFFF00', '#FF0000']
+}
+
+# 批处理输出文件名模板，可用字段: name（原文件名，不含扩展名）、view、dpi
+DEFAULT_NAME_TEMPLATE = "{name}_{view}.png"
+
+# 3D曲面默认网格数（与plot_surface默认的rcount/ccount一致）
+SURFACE_COUNT = 50
+
+# 批处理渲染任务（可pickle，便于发送到工作进程）
+# render_mode: "figure"每个文件创建Figure, "template"复用图形模板（2D/3D）,
+# "raster"直接生成像素（仅2D，3D视图按template处理）
+# surface_count: 3D曲面每个方向的最大网格数（细节级别），与plot_surface的rcount/ccount相同
+# events: 输入为原始脉冲事件时的分箱参数（prpd_events.EventBinning），None表示PRPD矩阵文件
+# preprocess: 读取后、绘图前的预处理参数（prpd_preprocess.Preprocess），None表示不处理
+RenderJob = namedtuple('RenderJob', ['file_path', 'save_path', 'color_scheme', 'dpi', 'view_mode',
+                                     'render_mode', 'surface_count', 'events', 'preprocess'],
+                       defaults=("figure", SURFACE_COUNT, None, None))
+
+# 渲染方式
+RENDER_MODES = ("figure", "template", "raster")
+
+def surface_polygons(data, rcount=SURFACE_COUNT, ccount=SURFACE_COUNT):
+    """向量化地生成与plot_surface等价的3D曲面多边形
+
+    按plot_surface的步长规则对网格抽样，每个面片取四个角点组成四边形，
+    颜色值为面片边界上有效点的平均值（与plot_surface的avg_z一致，用积分图一次算出）。
+    末尾全为NaN的行列（如行尾逗号产生的空列）处的角点收缩到最后一个有效行列，
+    其余含NaN角点的面片被丢弃。返回(多边形数组(N, 4, 3), 颜色值数组(N,))。
+    """
+    rows, cols = data.shape
+    x = np.arange(0, 360, 360/cols)
+    y = np.arange(0, 100, 100/rows)
+    finite = np.isfinite(data)
+    valid_rows = np.flatnonzero(finite.any(axis=1))
+    valid_cols = np.flatnonzero(finite.any(axis=0))
+    if len(valid_rows) < 2 or len(valid_cols) < 2:
+        return np.empty((0, 4, 3)), np.empty(0)
+
+    # 与plot_surface相同的抽样步长和行列索引（包含两端）
+    rstride = int(max(np.ceil(rows / rcount), 1))
+    cstride = int(max(np.ceil(cols / ccount), 1))
+    row_inds = np.array(list(range(0, rows - 1, rstride)) + [rows - 1])
+    col_inds = np.array(list(range(0, cols - 1, cstride)) + [cols - 1])
+    r0, r1 = row_inds[:-1, None], row_inds[1:, None]
+    c0, c1 = col_inds[None, :-1], col_inds[None, 1:]
+
+    # 积分图求面片边界上有效点之和与个数：整块减去内部
+    def integral(a):
+        result = np.zeros((a.shape[0] + 1, a.shape[1] + 1))
+        result[1:, 1:] = a.cumsum(axis=0).cumsum(axis=1)
+        return result
+    def perimeter_sum(table):
+        block = table[r1 + 1, c1 + 1] - table[r0, c1 + 1] - table[r1 + 1, c0] + table[r0, c0]
+        ri, ci = np.maximum(r1, r0 + 1), np.maximum(c1, c0 + 1)
+        inner = table[ri, ci] - table[r0 + 1, ci] - table[ri, c0 + 1] + table[r0 + 1, c0 + 1]
+        return block - inner
+    total = perimeter_sum(integral(np.where(finite, data, 0.0)))
+    count = perimeter_sum(integral(finite))
+
+    # 角点收缩到最后一个有效行列
+    last_row, last_col = valid_rows[-1], valid_cols[-1]
+    r1c, c1c = np.minimum(r1, last_row), np.minimum(c1, last_col)
+    shape = total.shape
+    corner_rows = np.stack([np.broadcast_to(r, shape) for r in (r0, r0, r1c, r1c)], axis=-1)
+    corner_cols = np.stack([np.broadcast_to(c, shape) for c in (c0, c1c, c1c, c0)], axis=-1)
+    polys = np.stack([x[corner_cols], y[corner_rows], data[corner_rows, corner_cols]], axis=-1)
+    keep = (finite[corner_rows, corner_cols].all(axis=-1)
+            & (np.broadcast_to(r1c, shape) > r0) & (np.broadcast_to(c1c, shape) > c0))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_z = total / count
+    return polys[keep], avg_z[keep]
+
+def add_prpd_surface(ax, data, cmap, count=SURFACE_COUNT):
+    """在3D坐标轴上添加PRPD曲面（代替plot_surface），返回Poly3DCollection"""
+    from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+    polys, avg_z = surface_polygons(data, count, count)
+    surf = Poly3DCollection(polys, cmap=cmap, linewidth=0, antialiased=False)
+    surf.set_array(avg_z)
+    ax.add_collection3d(surf, autolim=False)
+    auto_scale_surface(ax, data)
+    return surf
+
+def auto_scale_surface(ax, data):
+    """按完整网格（与plot_surface一致）自动设置坐标范围"""
+    x = np.arange(0, 360, 360/data.shape[1])
+    y = np.arange(0, 100, 100/data.shape[0])
+    X, Y = np.meshgrid(x, y)
+    ax.auto_scale_xyz(X, Y, data, had_data=False)
+
+def release_canvas_buffer(fig):
+    """释放Figure画布的Agg渲染缓冲区（下次绘制时按需重新创建）"""
+    canvas = fig.canvas
+    if 'renderer' in vars(canvas):
+        del canvas.renderer
+        canvas._lastKey = None
+
+def release_figure(fig):
+    """立即释放Figure的所有图形对象和渲染缓冲区
+
+    Figure与画布互相引用，只能由循环垃圾回收释放；长时间运行时应在不再使用后调用，
+    像素缓冲区（高DPI时每个数十MB）和坐标轴等对象不必等待垃圾回收。
+    """
+    fig.clear()
+    release_canvas_buffer(fig)
+
+def render_prpd_figure(data, color_scheme, view_mode, surface_count=SURFACE_COUNT, clim=None):
+    """根据PRPD矩阵创建用于保存的Figure（clim为固定颜色范围，None表示自动）"""
+    # 创建颜色方案
+    custom_cmap = LinearSegmentedColormap.from_list('custom', color_scheme)
+
+    # 创建图像
+    fig = Figure(figsize=(10, 6), dpi=100)
+    FigureCanvasAgg(fig)
+
+    if view_mode == "2D":
+        ax = fig.add_subplot(111)
+        img = ax.imshow(data, cmap=custom_cmap, origin='lower',
+                    extent=[0, 360, 0, 100], aspect='auto')
+        if clim is not None:
+            img.set_clim(*clim)
+        ax.set_title('2D PRPD图')
+        ax.set_xlabel('相位 (°)')
+        ax.set_ylabel('电压 (%)')
+        ax.set_xticks(np.arange(0, 361, 90))
+        ax.set_yticks(np.arange(0, 101, 25))
+        fig.colorbar(img, ax=ax)
+    else:
+        from mpl_toolkits.mplot3d import Axes3D  # noqa: F401 注册3d投影
+        ax = fig.add_subplot(111, projection='3d')
+        surf = add_prpd_surface(ax, data, custom_cmap, surface_count)
+        if clim is not None:
+            surf.set_clim(*clim)
+        ax.set_title('3D PRPD图')
+        ax.set_xlabel('相位 (°)')
+        ax.set_ylabel('电压 (%)')
+        ax.set_zlabel('幅值')
+        ax.view_init(elev=30, azim=45)
+        fig.colorbar(surf, ax=ax, shrink=0.5, aspect=5)
+
+    fig.tight_layout()
+    return fig
+
+class PRPDRenderTemplate:
+    """可复用的2D PRPD图模板
+
+    Figure、坐标轴、刻度和colorbar只创建一次，之后每个文件仅通过
+    AxesImage.set_data和set_clim更新像素数据，布局和裁剪框也只计算一次。
+    """
+    # 计算裁剪框时colorbar使用的占位范围，为较宽的刻度标签预留空间
+    RESERVED_CLIM = (0, 10000)
+
+    def __init__(self, color_scheme, dpi):
+        self.dpi = dpi
+        custom_cmap = LinearSegmentedColormap.from_list('custom', color_scheme)
+
+        self.fig = Figure(figsize=(10, 6), dpi=100)
+        self.ax = ax = self.fig.add_subplot(111)
+        self.img = ax.imshow(np.zeros((2, 2)), cmap=custom_cmap, origin='lower',
+                    extent=[0, 360, 0, 100], aspect='auto')
+        ax.set_title('2D PRPD图')
+        ax.set_xlabel('相位 (°)')
+        ax.set_ylabel('电压 (%)')
+        ax.set_xticks(np.arange(0, 361, 90))
+        ax.set_yticks(np.arange(0, 101, 25))
+        self.cbar = self.fig.colorbar(self.img, ax=ax)
+
+        # 只调整一次布局并计算保存时的裁剪框（等价于bbox_inches='tight'）
+        self.img.set_clim(*self.RESERVED_CLIM)
+        self.fig.tight_layout()
+        FigureCanvasAgg(self.fig)
+        renderer = self.fig.canvas.get_renderer()
+        self.bbox_inches = self.fig.get_tightbbox(renderer).padded(0.1)
+
+    def update(self, data, clim=None):
+        """更新图像数据和颜色范围（clim为None时按数据自动）"""
+        self.img.set_data(data)
+        self.img.set_clim(*data_limits(data, clim))
+
+    def save(self, data, save_path):
+        """使用新数据保存图像"""
+        self.update(data)
+        save_figure(self.fig, save_path, self.dpi, self.bbox_inches)
+
+    def close(self):
+        """释放Figure和渲染缓冲区"""
+        release_figure(self.fig)
+
+class PRPD3DRenderTemplate:
+    """可复用的3D PRPD图模板
+
+    3D坐标轴、标签、视角和colorbar只创建一次，每个文件只替换曲面多边形
+    （由surface_polygons向量化生成）、颜色值和坐标范围，布局和裁剪框只计算一次。
+    """
+    RESERVED_CLIM = PRPDRenderTemplate.RESERVED_CLIM
+
+    def __init__(self, color_scheme, dpi, surface_count=SURFACE_COUNT):
+        from mpl_toolkits.mplot3d.art3d import Poly3DCollection
+        self.dpi = dpi
+        self.surface_count = surface_count
+        custom_cmap = LinearSegmentedColormap.from_list('custom', color_scheme)
+
+        self.fig = Figure(figsize=(10, 6), dpi=100)
+        self.ax = ax = self.fig.add_subplot(111, projection='3d')
+        self.surface = Poly3DCollection(np.empty((0, 4, 3)), cmap=custom_cmap,
+                                        linewidth=0, antialiased=False)
+        self.surface.set_array(np.empty(0))
+        ax.add_collection3d(self.surface, autolim=False)
+        ax.set_title('3D PRPD图')
+        ax.set_xlabel('相位 (°)')
+        ax.set_ylabel('电压 (%)')
+        ax.set_zlabel('幅值')
+        ax.view_init(elev=30, azim=45)
+        self.surface.set_clim(*self.RESERVED_CLIM)
+        self.cbar = self.fig.colorbar(self.surface, ax=ax, shrink=0.5, aspect=5)
+
+        # 只调整一次布局并计算保存时的裁剪框，z轴和colorbar按较宽的刻度标签预留空间
+        ax.auto_scale_xyz([0, 360], [0, 100], list(self.RESERVED_CLIM), had_data=False)
+        self.fig.tight_layout()
+        FigureCanvasAgg(self.fig)
+        renderer = self.fig.canvas.get_renderer()
+        self.bbox_inches = self.fig.get_tightbbox(renderer).padded(0.1)
+
+    def update(self, data, clim=None):
+        """更新曲面、颜色范围（clim为None时按数据自动）和坐标范围"""
+        polys, avg_z = surface_polygons(data, self.surface_count, self.surface_count)
+        self.surface.set_verts(polys)
+        self.surface.set_array(avg_z)
+        if clim is not None or len(avg_z):
+            self.surface.set_clim(*data_limits(avg_z, clim))
+        auto_scale_surface(self.ax, data)
+
+    def save(self, data, save_path):
+        """使用新数据保存图像"""
+        self.update(data)
+        save_figure(self.fig, save_path, self.dpi, self.bbox_inches)
+
+    def close(self):
+        """释放Figure和渲染缓冲区"""
+        release_figure(self.fig)
+
+# 每个线程最多保留的渲染模板数和栅格渲染器数（各自按最近使用淘汰），
+# 长时间运行时不断更换颜色方案或DPI不会使内存持续增长
+RENDERER_CACHE_SIZE = 4
+
+# 渲染模板每个文件都要修改其Figure，栅格渲染器有FT2Font和刻度格式的状态，都不能在
+# 线程之间共享（如批处理线程、监视目录线程和界面保存图像同时渲染），每个线程使用自己的
+# 缓存；淘汰时也只会关闭本线程的渲染器
+_thread_caches = threading.local()
+
+def _thread_cache(name):
+    """本线程中名为name的渲染器缓存（按最近使用排序）"""
+    cache = getattr(_thread_caches, name, None)
+    if cache is None:
+        cache = OrderedDict()
+        setattr(_thread_caches, name, cache)
+    return cache
+
+def _get_cached(cache, key, create):
+    """从按最近使用排序的缓存中获取（必要时创建）渲染器，超出上限时释放最久未使用的"""
+    renderer = cache.get(key)
+    if renderer is None:
+        renderer = cache[key] = create()
+        while len(cache) > RENDERER_CACHE_SIZE:
+            cache.popitem(last=False)[1].close()
+    else:
+        cache.move_to_end(key)
+    return renderer
+
+def clear_render_caches():
+    """释放本线程缓存的所有渲染模板和栅格渲染器"""
+    for cache in (_thread_cache('templates'), _thread_cache('rasters')):
+        while cache:
+            cache.popitem()[1].close()
+
+def get_render_template(color_scheme, dpi, view_mode="2D", surface_count=SURFACE_COUNT):
+    """获取（必要时创建）本线程中指定参数的渲染模板（按视图模式、颜色方案、DPI和网格数缓存）"""
+    key = (view_mode, tuple(color_scheme), dpi, surface_count if view_mode == "3D" else None)
+    templates = _thread_cache('templates')
+    if view_mode == "2D":
+        return _get_cached(templates, key, lambda: PRPDRenderTemplate(color_scheme, dpi))
+    return _get_cached(templates, key,
+                       lambda: PRPD3DRenderTemplate(color_scheme, dpi, surface_count))
+
+class PRPDRasterRenderer:
+    """不经过Matplotlib绘制管线的2D PRPD图快速导出
+
+    坐标轴、标题和colorbar色带按PRPDRenderTemplate的布局预先绘制为底图，
+    每个文件只需用颜色查找表将矩阵映射为像素、最近邻放大后填入坐标区，
+    再绘制colorbar刻度和标签（用FT2Font直接渲染文字），最后直接写出PNG。
+    """
+    def __init__(self, color_scheme, dpi):
+        self.dpi = dpi
+        self.template = template = PRPDRenderTemplate(color_scheme, dpi)
+        cmap = template.img.get_cmap()
+        # RGBA颜色查找表（与Colormap.__call__(bytes=True)一致），按uint32查表一次得到整个像素
+        lut = cmap(np.arange(cmap.N), bytes=True)
+        self.lut = lut.view(np.uint32).ravel()
+        self.background = np.array([255, 255, 255, 255], dtype=np.uint8).view(np.uint32)[0]
+
+        # colorbar刻度的定位器和格式与原图一致，底图中不绘制刻度
+        cax = template.cbar.ax
+        self.locator = cax.yaxis.get_major_locator()
+        self.formatter = ticker.ScalarFormatter(useMathText=False)
+        self.formatter.create_dummy_axis()
+        cax.tick_params(which='both', length=0, labelright=False)
+        template.img.set_visible(False)
+
+        # 分别在白色和黑色坐标区背景下绘制底图，两者之差即前景的覆盖率，
+        # 填入数据像素时据此与坐标轴线、刻度等前景合成
+        white = self._draw_frame('white')
+        black = self._draw_frame('black')
+        self.frame = white
+
+        to_inches = lambda bbox: bbox.transformed(template.fig.dpi_scale_trans.inverted())
+        crop = template.bbox_inches
+        ax_box = to_inches(template.ax.get_window_extent())
+        self.x0 = int(round((ax_box.x0 - crop.x0) * dpi))
+        self.x1 = int(round((ax_box.x1 - crop.x0) * dpi))
+        self.y0 = int(round((crop.y1 - ax_box.y1) * dpi))
+        self.y1 = int(round((crop.y1 - ax_box.y0) * dpi))
+        region = (slice(self.y0, self.y1), slice(self.x0, self.x1))
+        coverage = white[region].astype(np.int16) - black[region]
+        # 坐标区内不能直接填入数据像素（有前景覆盖）的位置
+        self.edge = np.nonzero((coverage[:, :, :3] != 255).any(axis=2))
+        self.edge_black = black[region][self.edge].astype(np.uint16)
+        self.edge_coverage = coverage[self.edge].astype(np.uint16)
+
+        # 最近邻放大的行列索引（origin='lower'，第0行在底部），按矩阵形状缓存
+        self._index_cache = {}
+
+        # colorbar刻度线和标签的像素位置
+        cax_box = to_inches(cax.get_window_extent())
+        self.cbar_x = int(round((cax_box.x1 - crop.x0) * dpi))
+        self.cbar_y0 = (crop.y1 - cax_box.y1) * dpi
+        self.cbar_y1 = (crop.y1 - cax_box.y0) * dpi
+        points = dpi / 72
+        self.tick_length = max(1, int(round(matplotlib.rcParams['ytick.major.size'] * points)))
+        self.tick_width = max(1, int(round(matplotlib.rcParams['ytick.major.width'] * points)))
+        self.label_x = self.cbar_x + self.tick_length + int(round(
+            matplotlib.rcParams['ytick.major.pad'] * points))
+        font_props = FontProperties(size=matplotlib.rcParams['ytick.labelsize'])
+        self.font = FT2Font(font_manager.findfont(font_props))
+        self.font_size = font_props.get_size_in_points()
+        # 底图已绘制完成，模板的渲染缓冲区不再需要
+        release_canvas_buffer(template.fig)
+
+    def _draw_frame(self, axes_color):
+        """以指定坐标区背景色绘制底图，返回RGBA数组"""
+        self.template.ax.set_facecolor(axes_color)
+        buf = io.BytesIO()
+        self.template.fig.savefig(buf, format='png', dpi=self.dpi,
+                                  bbox_inches=self.template.bbox_inches)
+        buf.seek(0)
+        return (mimage.imread(buf) * 255).round().astype(np.uint8)
+
+    def colorize(self, data, vmin, vmax):
+        """用颜色查找表将矩阵映射为RGBA像素（uint32，NaN显示为背景色）"""
+        n = len(self.lut)
+        scale = n / (vmax - vmin) if vmax > vmin else 0.0
+        index = (data - vmin) * scale
+        nan_mask = np.isnan(index)
+        index[nan_mask] = 0
+        index = np.clip(index, 0, n - 1).astype(np.intp)
+        pixels = self.lut[index]
+        pixels[nan_mask] = self.background
+        return pixels
+
+    def _upscale_index(self, shape):
+        """返回将矩阵最近邻放大到坐标区大小的行列索引"""
+        index = self._index_cache.get(shape)
+        if index is None:
+            height, width = self.y1 - self.y0, self.x1 - self.x0
+            rows = shape[0] - 1 - ((np.arange(height) + 0.5) * shape[0] / height).astype(np.intp)
+            cols = ((np.arange(width) + 0.5) * shape[1] / width).astype(np.intp)
+            index = self._index_cache[shape] = (rows[:, None], cols[None, :])
+        return index
+
+    def _draw_text(self, image, text, x, y_center):
+        """在(x, y_center)左对齐、垂直居中绘制黑色文字"""
+        self.font.set_size(self.font_size, self.dpi)
+        self.font.set_text(text, 0.0)
+        self.font.draw_glyphs_to_bitmap(antialiased=True)
+        glyphs = np.asarray(self.font.get_image())
+        h, w = glyphs.shape
+        top = int(round(y_center - h / 2))
+        rows = slice(max(top, 0), min(top + h, image.shape[0]))
+        cols = slice(max(x, 0), min(x + w, image.shape[1]))
+        alpha = glyphs[rows.start - top:rows.stop - top, cols.start - x:cols.stop - x]
+        target = image[rows, cols, :3].astype(np.uint16)
+        image[rows, cols, :3] = target * (255 - alpha[:, :, None].astype(np.uint16)) // 255
+
+    def render(self, data, clim=None):
+        """生成RGBA图像数组（clim为固定颜色范围，None表示自动）"""
+        data = np.asarray(data, dtype=np.float64)
+        vmin, vmax = data_limits(data, clim)
+        pixels = self.colorize(data, vmin, vmax)[self._upscale_index(data.shape)]
+
+        # 与坐标轴线、刻度等前景合成
+        pixels = pixels.view(np.uint8).reshape(pixels.shape + (4,))
+        edge_pixels = pixels[self.edge].astype(np.uint16)
+        pixels[self.edge] = self.edge_black + (self.edge_coverage * edge_pixels + 127) // 255
+
+        image = self.frame.copy()
+        image[self.y0:self.y1, self.x0:self.x1] = pixels
+
+        # colorbar刻度线和标签
+        lo, hi = mtransforms.nonsingular(vmin, vmax, expander=0.1)
+        ticks = [t for t in self.locator.tick_values(lo, hi) if lo <= t <= hi]
+        self.formatter.axis.set_view_interval(lo, hi)
+        self.formatter.axis.set_data_interval(lo, hi)
+        labels = self.formatter.format_ticks(ticks)
+        for tick, label in zip(ticks, labels):
+            y = self.cbar_y1 - (tick - lo) / (hi - lo) * (self.cbar_y1 - self.cbar_y0)
+            top = int(round(y - self.tick_width / 2))
+            image[top:top + self.tick_width, self.cbar_x:self.cbar_x + self.tick_length, :3] = 0
+            self._draw_text(image, label, self.label_x, y)
+        offset = self.formatter.get_offset()
+        if offset:
+            self._draw_text(image, offset, self.cbar_x - self.tick_length,
+                            self.cbar_y0 - self.font_size * self.dpi / 72)
+        return image
+
+    def save(self, data, save_path, clim=None):
+        """渲染并直接写出图像文件（PNG，或按扩展名用Pillow写出JPEG）"""
+        write_image(save_path, self.render(data, clim), self.dpi)
+
+    def close(self):
+        """释放模板Figure和渲染缓冲区"""
+        self.template.close()
+
+def tight_bbox(fig, dpi):
+    """计算保存时的裁剪框（与savefig的bbox_inches='tight'一致）"""
+    original_dpi = fig.dpi
+    fig.set_dpi(dpi)
+    try:
+        renderer = FigureCanvasAgg(fig).get_renderer()
+        return fig.get_tightbbox(renderer).padded(matplotlib.rcParams['savefig.pad_inches'])
+    finally:
+        fig.set_dpi(original_dpi)
+
+def render_figure_pixels(fig, dpi, bbox_inches):
+    """将Figure按裁剪框渲染为RGBA uint8数组"""
+    buf = io.BytesIO()
+    fig.savefig(buf, format='rgba', dpi=dpi, bbox_inches=bbox_inches)
+    pixels = np.frombuffer(buf.getbuffer(), dtype=np.uint8).reshape(-1, 4)
+    # 渲染器宽度为裁剪框宽度（像素）取整，浮点误差可能使其相差1
+    guess = int(bbox_inches.width * dpi)
+    for width in (guess, guess + 1, guess - 1):
+        if len(pixels) % width == 0:
+            break
+    return pixels.reshape(-1, width, 4)
+
+def save_figure(fig, save_path, dpi, bbox_inches):
+    """保存Figure，PNG格式先渲染为RGBA再由write_png快速编码"""
+    if os.path.splitext(save_path)[1].lower() != '.png':
+        fig.savefig(save_path, dpi=dpi, bbox_inches=bbox_inches)
+        return
+    write_png(save_path, render_figure_pixels(fig, dpi, bbox_inches), dpi)
+
+def encode_image(save_path, image, dpi):
+    """将RGBA数组按保存路径的扩展名编码，返回图像字节（JPEG由Pillow编码，其余为PNG）"""
+    if os.path.splitext(save_path)[1].lower() in ('.jpg', '.jpeg'):
+        from PIL import Image  # Matplotlib自身的依赖
+        buf = io.BytesIO()
+        Image.fromarray(image[:, :, :3]).save(buf, format='JPEG', dpi=(dpi, dpi), quality=95)
+        return buf.getvalue()
+    return encode_png(image, dpi)
+
+def write_image(save_path, image, dpi):
+    """将RGBA数组写为图像文件"""
+    with open(save_path, 'wb') as f:
+        f.write(encode_image(save_path, image, dpi))
+
+def _png_chunk(chunk_type, payload):
+    return (struct.pack('>I', len(payload)) + chunk_type + payload
+            + struct.pack('>I', zlib.crc32(chunk_type + payload) & 0xFFFFFFFF))
+
+def encode_png(image, dpi, level=1):
+    """将RGBA uint8数组编码为PNG字节
+
+    所有行使用Up滤波（与上一行相减），PRPD图中连续相同的行滤波后全为0，
+    配合低压缩级别，编码速度远快于逐行自适应选择滤波方式。
+    """
+    height, width, _ = image.shape
+    rows = np.ascontiguousarray(image).reshape(height, width * 4)
+    filtered = np.empty((height, width * 4 + 1), dtype=np.uint8)
+    filtered[:, 0] = 2
+    filtered[0, 0] = 0
+    filtered[0, 1:] = rows[0]
+    np.subtract(rows[1:], rows[:-1], out=filtered[1:, 1:])
+
+    pixels_per_meter = int(round(dpi / 0.0254))
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        _png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)),
+        _png_chunk(b'pHYs', struct.pack('>IIB', pixels_per_meter, pixels_per_meter, 1)),
+        _png_chunk(b'IDAT', zlib.compress(filtered, level)),
+        _png_chunk(b'IEND', b''),
+    ])
+
+def write_png(save_path, image, dpi, level=1):
+    """将RGBA uint8数组写为PNG文件"""
+    with open(save_path, 'wb') as f:
+        f.write(encode_png(image, dpi, level))
+
+def get_raster_renderer(color_scheme, dpi):
+    """获取（必要时创建）本线程中指定参数的栅格渲染器（按颜色方案和DPI缓存）"""
+    key = (tuple(color_scheme), dpi)
+    return _get_cached(_thread_cache('rasters'), key,
+                       lambda: PRPDRasterRenderer(color_scheme, dpi))
+
+def load_job_data(job):
+    """读取任务数据：PRPD矩阵文件（经由二进制缓存）或由原始脉冲事件分箱，并按需预处理"""
+    if job.events is not None:
+        data = events_to_prpd(job.file_path, job.events)
+    else:
+        data = load_prpd_matrix(job.file_path)
+    if job.preprocess is not None:
+        data = preprocess_maps(data, job.preprocess)
+    return data
+
+def render_job_image(job, data):
+    """渲染任务图像，返回RGBA数组（PNG/JPEG，由write_job_image编码）或已编码的图像字节"""
+    clim = color_limits(job.preprocess)
+    if job.view_mode == "2D" and job.render_mode == "raster":
+        # 直接生成像素，不经过Matplotlib绘制
+        return get_raster_renderer(job.color_scheme, job.dpi).render(data, clim)
+    if job.render_mode in ("template", "raster"):
+        # 复用模板，只更新数据（3D视图没有栅格方式，使用模板）
+        template = get_render_template(job.color_scheme, job.dpi, job.view_mode,
+                                       job.surface_count)
+        template.update(data, clim)
+        fig, bbox_inches = template.fig, template.bbox_inches
+    else:
+        fig = render_prpd_figure(data, job.color_scheme, job.view_mode, job.surface_count, clim)
+        try:
+            return _figure_image(fig, job, 'tight')
+        finally:
+            release_figure(fig)  # 每个文件新建的Figure，不等待垃圾回收
+    return _figure_image(fig, job, bbox_inches)
+
+def _figure_image(fig, job, bbox_inches):
+    """按保存格式渲染Figure：PNG返回RGBA数组，其他格式返回已编码的字节"""
+    ext = os.path.splitext(job.save_path)[1].lower()
+    if ext == '.png':
+        if bbox_inches == 'tight':
+            bbox_inches = tight_bbox(fig, job.dpi)
+        return render_figure_pixels(fig, job.dpi, bbox_inches)
+    buf = io.BytesIO()
+    fig.savefig(buf, format=ext[1:] or None, dpi=job.dpi, bbox_inches=bbox_inches)
+    return buf.getvalue()
+
+def encode_job_image(job, image):
+    """编码任务图像，返回图像字节（render_job_image已编码时原样返回）"""
+    if isinstance(image, bytes):
+        return image
+    return encode_image(job.save_path, image, job.dpi)
+
+def write_job_file(job, encoded):
+    """将已编码的任务图像写到保存路径"""
+    with open(job.save_path, 'wb') as f:
+        f.write(encoded)
+
+def write_job_image(job, image):
+    """编码（如需要）并写出任务图像"""
+    write_job_file(job, encode_job_image(job, image))
+
+def _timed(timings, stage, func, *args):
+    """调用func并把耗时记入timings[stage]"""
+    stage_start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        timings[stage] = time.perf_counter() - stage_start
+
+def render_prpd_file_timed(job):
+    """渲染并保存单个PRPD文件，返回((文件路径, 保存路径, 错误信息), 各阶段耗时, 进程峰值内存)
+
+    该函数位于模块顶层，作为进程池的工作函数，计时随结果一起传回主进程。
+    """
+    timings = {}
+    try:
+        data = _timed(timings, "read", load_job_data, job)
+        image = _timed(timings, "render", render_job_image, job, data)
+        encoded = _timed(timings, "encode", encode_job_image, job, image)
+        _timed(timings, "write", write_job_file, job, encoded)
+        result = job.file_path, job.save_path, None
+    except Exception as e:
+        result = job.file_path, job.save_path, str(e)
+    return result, timings, peak_rss_bytes()
+
+def render_prpd_file(job):
+    """渲染并保存单个PRPD文件，返回(文件路径, 保存路径, 错误信息)
+
+    错误在此处捕获并以字符串返回，保证单个文件失败不影响其他文件，
+    该函数位于模块顶层，可作为进程池的工作函数。
+    """
+    return render_prpd_file_timed(job)[0]
+
+class PipelineStats:
+    """批处理流水线各阶段的计时
+
+    busy为各阶段的处理耗时（多线程阶段为各线程之和），wait为渲染线程
+    等待读取结果（read）和等待写出队列空位（write）的时间。
+    """
+    STAGES = STAGES  # 各阶段名称（与prpd_metrics相同）
+
+    def __init__(self):
+        self.busy = dict.fromkeys(self.STAGES, 0.0)
+        self.counts = dict.fromkeys(self.STAGES, 0)
+        self.threads = dict.fromkeys(self.STAGES, 1)
+        self.wait = {"read": 0.0, "write": 0.0}
+        self.elapsed = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        """累计一次阶段耗时（可在多个线程中调用）"""
+        with self._lock:
+            self.busy[stage] += seconds
+            self.counts[stage] += 1
+
+    def bottleneck(self):
+        """按每个线程的平均耗时判断瓶颈阶段"""
+        return max(self.STAGES, key=lambda stage: self.busy[stage] / self.threads[stage])
+
+    def summary(self):
+        """返回各阶段计时的文字说明"""
+        stages = "，".join(f"{name}{self.busy[stage]:.2f}s（{self.threads[stage]}线程）"
+                           for stage, name in self.STAGES.items())
+        return (f"{stages}；等待读取{self.wait['read']:.2f}s，等待写出{self.wait['write']:.2f}s；"
+                f"瓶颈: {self.STAGES[self.bottleneck()]}")
+
+def run_pipeline(jobs, readers=2, writers=2, prefetch=4, stats=None, metrics=None):
+    """以读取、渲染、写出三级流水线执行渲染任务，按完成顺序产出(文件路径, 保存路径, 错误信息)
+
+    读取线程池预取之后prefetch个文件，渲染在当前线程中进行（Matplotlib对象不跨线程使用），
+    写出线程池负责PNG编码和写文件。写出队列最多容纳writers * 2张图像，队列满时渲染等待，
+    内存占用因此有上限。stats为PipelineStats时记录各阶段计时，metrics为BatchMetrics时
+    记录每个文件的计时。readers、writers和prefetch小于1时按1处理。
+    """
+    # prefetch为0时不会读取任何文件，线程数为0时线程池无法创建
+    readers, writers, prefetch = max(1, readers), max(1, writers), max(1, prefetch)
+    stats = stats if stats is not None else PipelineStats()
+    stats.threads.update(read=readers, encode=writers, write=writers)
+    start = time.perf_counter()
+    for file_path, save_path, error, timings in _run_pipeline(jobs, readers, writers, prefetch,
+                                                              stats):
+        if metrics is not None:
+            metrics.file_done(file_path, save_path, error, timings)
+        yield file_path, save_path, error
+    stats.elapsed = time.perf_counter() - start
+
+def _run_pipeline(jobs, readers, writers, prefetch, stats):
+    """run_pipeline的实现，产出(文件路径, 保存路径, 错误信息, 各阶段耗时)"""
+    def timed(timings, stage, func, *args):
+        try:
+            return _timed(timings, stage, func, *args)
+        finally:
+            stats.add(stage, timings[stage])
+
+    def read(job, timings):
+        try:
+            return timed(timings, "read", load_job_data, job), None
+        except Exception as e:
+            return None, str(e)
+
+    def write(job, image, timings):
+        try:
+            encoded = timed(timings, "encode", encode_job_image, job, image)
+            timed(timings, "write", write_job_file, job, encoded)
+            return job.file_path, job.save_path, None, timings
+        except Exception as e:
+            return job.file_path, job.save_path, str(e), timings
+
+    pending_jobs = iter(jobs)
+    reading = deque()
+    writing = deque()
+    with ThreadPoolExecutor(readers) as read_pool, ThreadPoolExecutor(writers) as write_pool:
+        def prefetch_jobs():
+            while len(reading) < prefetch:
+                job = next(pending_jobs, None)
+                if job is None:
+                    break
+                timings = {}
+                reading.append((job, timings, read_pool.submit(read, job, timings)))
+
+        prefetch_jobs()
+        while reading:
+            job, timings, future = reading.popleft()
+            wait_start = time.perf_counter()
+            data, error = future.result()
+            stats.wait["read"] += time.perf_counter() - wait_start
+            prefetch_jobs()
+
+            if error is None:
+                try:
+                    image = timed(timings, "render", render_job_image, job, data)
+                except Exception as e:
+                    error = str(e)
+            if error is not None:
+                yield job.file_path, job.save_path, error, timings
+                continue
+
+            # 写出队列已满时等待最早的写出完成（背压）
+            while len(writing) >= writers * 2:
+                wait_start = time.perf_counter()
+                result = writing.popleft().result()
+                stats.wait["write"] += time.perf_counter() - wait_start
+                yield result
+            writing.append(write_pool.submit(write, job, image, timings))
+            while writing and writing[0].done():
+                yield writing.popleft().result()
+
+        while writing:
+            yield writing.popleft().result()
+
+def make_jobs(file_list, save_dir, color_scheme, dpi, view_mode, render_mode="figure",
+              name_template=DEFAULT_NAME_TEMPLATE, surface_count=SURFACE_COUNT, events=None,
+              preprocess=None):
+    """为文件列表生成渲染任务"""
+    jobs = []
+    for file_path in file_list:
+        # 创建保存路径
+        filename = os.path.splitext(os.path.basename(file_path))[0]
+        name = name_template.format(name=filename, view=view_mode, dpi=dpi)
+        save_path = os.path.join(save_dir, name)
+        jobs.append(RenderJob(file_path, save_path, color_scheme, dpi, view_mode, render_mode,
+                              surface_count, events, preprocess))
+    return jobs
+
+def fix_job_limits(jobs):
+    """预处理颜色范围为所有文件统一（global）时，读取全部任务数据计算统一范围，
+    返回改为固定范围的任务列表"""
+    if not jobs or jobs[0].preprocess is None or jobs[0].preprocess.normalize != "global":
+        return jobs
+    raw_jobs = (job._replace(preprocess=None) for job in jobs)
+    preprocess = fix_global_limits(jobs[0].preprocess, map(load_job_data, raw_jobs))
+    return [job._replace(preprocess=preprocess) for job in jobs]
+
+def create_process_pool(workers, initializer=None, initargs=()):
+    """创建渲染进程池（使用spawn方式启动子进程，避免fork已运行Qt的进程）"""
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                               initializer=initializer, initargs=initargs)
+
+def run_jobs(jobs, workers=1, stats=None, readers=2, writers=2, prefetch=4, metrics=None,
+             executor=None):
+    """执行渲染任务，按完成顺序逐个产出(文件路径, 保存路径, 错误信息)
+
+    workers为1时使用读取、渲染、编码写出三级流水线（见run_pipeline），
+    大于1时使用进程池并行渲染，各进程内顺序处理，计时由工作进程随结果传回。
+    executor为已创建的进程池时使用该进程池（多次调用时避免每次重新启动工作进程）。
+    """
+    workers = min(max(1, workers), len(jobs))
+    if workers <= 1:
+        yield from run_pipeline(jobs, readers, writers, prefetch, stats, metrics)
+        return
+
+    if stats is not None:
+        stats.threads = dict.fromkeys(stats.STAGES, workers)
+    start = time.perf_counter()
+    owned = executor is None
+    if owned:
+        executor = create_process_pool(workers)
+    with executor if owned else contextlib.nullcontext(executor):
+        futures = {executor.submit(render_prpd_file_timed, job): job for job in jobs}
+        try:
+            for future in as_completed(futures):
+                try:
+                    result, timings, worker_rss = future.result()
+                except Exception as e:
+                    # 工作进程异常退出等情况
+                    job = futures[future]
+                    result, timings, worker_rss = (job.file_path, job.save_path, str(e)), {}, None
+                if stats is not None:
+                    for stage, seconds in timings.items():
+                        stats.add(stage, seconds)
+                if metrics is not None:
+                    metrics.file_done(*result, timings, worker_rss)
+                yield result
+        finally:
+            # 提前停止迭代（取消批处理）时不再执行尚未开始的任务
+            for future in futures:
+                future.cancel()
+    if stats is not None:
+        stats.elapsed = time.perf_counter() - start
+
+def expand_inputs(inputs, pattern='*.csv'):
+    """将命令行中的文件、目录和通配符展开为文件列表（归档文件展开为其中的各个图谱）"""
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            files.extend(sorted(glob.glob(os.path.join(item, pattern))))
+        elif glob.has_magic(item):
+            files.extend(sorted(glob.glob(item, recursive=True)))
+        else:
+            files.append(item)
+    return [member for file_path in files
+            for member in (expand_archive(file_path) if file_path.endswith(ARCHIVE_EXT)
+                           else [file_path])]
+
+def parse_color_scheme(value):
+    """解析颜色方案：预定义方案名称或逗号分隔的颜色列表"""
+    if value in COLOR_SCHEMES:
+        return COLOR_SCHEMES[value]
+    colors = [c.strip() for c in value.split(',') if c.strip()]
+    if len(colors) < 2:
+        raise argparse.ArgumentTypeError(
+            f"未知颜色方案: {value}（可选: {', '.join(COLOR_SCHEMES)}，或逗号分隔的颜色列表）")
+    return colors
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PRPD图批量渲染（无界面）")
+    parser.add_argument('inputs', nargs='+', help="PRPD CSV文件、目录或通配符")
+    parser.add_argument('-o', '--output-dir', default='.', help="输出目录")
+    parser.add_argument('--view', choices=['2D', '3D'], default='2D', help="视图模式")
+    parser.add_argument('--scheme', type=parse_color_scheme, default=COLOR_SCHEMES["默认方案"],
+                        help="颜色方案名称或逗号分隔的颜色列表")
+    parser.add_argument('--dpi', type=int, default=300, help="保存DPI")
+    parser.add_argument('--name', default=DEFAULT_NAME_TEMPLATE,
+                        help="输出文件名模板，可用字段{name}、{view}、{dpi}")
+    parser.add_argument('--workers', type=int, default=1, help="并行进程数")
+    parser.add_argument('--render', choices=RENDER_MODES, default="figure",
+                        help="渲染方式: figure逐文件创建Figure, template复用图形模板, "
+                             "raster直接生成像素（仅2D）")
+    parser.add_argument('--surface-count', type=int, default=SURFACE_COUNT,
+                        help="3D曲面每个方向的最大网格数，越小越快")
+    parser.add_argument('--pattern', default='*.csv', help="目录中的文件匹配模式")
+    parser.add_argument('--force', action='store_true',
+                        help="忽略任务清单，重新渲染所有文件（默认跳过输入和参数均未变化的文件）")
+    parser.add_argument('--readers', type=int, default=2, help="单进程流水线的读取线程数")
+    parser.add_argument('--writers', type=int, default=2, help="单进程流水线的写出（PNG编码）线程数")
+    parser.add_argument('--prefetch', type=int, default=4, help="单进程流水线预取的文件数")
+    parser.add_argument('--events', action='store_true',
+                        help="输入为原始脉冲事件（列: 相位或时间戳, 放电量），按分箱生成PRPD图")
+    parser.add_argument('--phase-bins', type=int, default=PHASE_BINS, help="脉冲事件的相位分箱数")
+    parser.add_argument('--amp-bins', type=int, default=AMP_BINS, help="脉冲事件的幅值分箱数")
+    parser.add_argument('--frequency', type=float,
+                        help="脉冲事件第一列为时间戳（秒）时的工频（Hz）")
+    parser.add_argument('--log', help=f"逐文件计时的JSON Lines日志（默认为输出目录中的{BATCH_LOG_NAME}）")
+    parser.add_argument('--no-log', action='store_true', help="不写批处理日志")
+    add_preprocess_arguments(parser)
+    args = parser.parse_args(argv)
+    preprocess = preprocess_from_args(parser, args)
+    if min(args.readers, args.writers, args.prefetch) < 1:
+        parser.error("--readers、--writers和--prefetch应不小于1")
+
+    files = expand_inputs(args.inputs, args.pattern)
+    if not files:
+        parser.error("没有找到要处理的文件")
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    events = None
+    if args.events:
+        events = EventBinning(args.phase_bins, args.amp_bins, frequency=args.frequency)
+    jobs = make_jobs(files, args.output_dir, args.scheme, args.dpi, args.view,
+                     args.render, args.name, args.surface_count, events, preprocess)
+    # 所有文件统一颜色范围时先扫描一遍全部数据
+    jobs = fix_job_limits(jobs)
+
+    # 跳过已是最新的输出，中断的批处理从中断处继续
+    manifest = JobManifest(args.output_dir)
+    if not args.force:
+        jobs, skipped = manifest.split_jobs(jobs)
+        if skipped:
+            print(f"跳过{len(skipped)}个输入和参数均未变化的文件", file=sys.stderr)
+    jobs_by_output = {job.save_path: job for job in jobs}
+    startup = time.perf_counter() - _IMPORT_START
+
+    start = time.perf_counter()
+    failed = 0
+    stats = PipelineStats()
+    log_path = None if args.no_log else args.log or os.path.join(args.output_dir, BATCH_LOG_NAME)
+    metrics = BatchMetrics(len(jobs), log_path, params={
+        'view': args.view, 'dpi': args.dpi, 'render': args.render, 'workers': args.workers,
+        'events': args.events, 'preprocess': preprocess._asdict() if preprocess else None})
+    for file_path, save_path, error in run_jobs(jobs, args.workers, stats, args.readers,
+                                                args.writers, args.prefetch, metrics):
+        if error is None:
+            manifest.record(jobs_by_output[save_path])
+            print(f"{file_path} -> {save_path}")
+        else:
+            failed += 1
+            print(f"处理文件失败: {file_path} - {error}", file=sys.stderr)
+    elapsed = time.perf_counter() - start
+
+    print(f"完成: {len(jobs) - failed}/{len(jobs)}个文件，启动耗时{startup:.3f}s，"
+          f"渲染耗时{elapsed:.2f}s（{len(jobs) / max(elapsed, 1e-9):.2f} 文件/秒）",
+          file=sys.stderr)
+    if stats.counts["render"]:
+        print(f"各阶段耗时: {stats.summary()}", file=sys.stderr)
+    snapshot = metrics.snapshot()
+    print(f"运行统计: {format_snapshot(snapshot)}", file=sys.stderr)
+    for file_path, latency in snapshot['slowest'][:3]:
+        print(f"  较慢: {file_path}（{latency * 1000:.0f}ms）", file=sys.stderr)
+    metrics.close()
+    if log_path:
+        print(f"批处理日志: {log_path}", file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
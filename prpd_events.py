@@ -0,0 +1,178 @@
+"""
+由原始脉冲事件生成PRPD图。
+
+原始脉冲列表每行一个事件：第一列为相位角（度）或时间戳（秒），第二列为视在放电量。
+事件按相位和幅值分箱（向量化bincount）统计为PRPD计数矩阵，行对应幅值（由低到高），
+列对应相位（0-360°），可直接用于绘图和批处理。
+
+支持CSV（可带表头）和形状为(N, 2)的.npy文件，按块读取，内存占用只与块大小有关。
+
+用法:
+    python prpd_events.py 脉冲.csv -o 脉冲_PRPD.csv --phase-bins 64 --amp-bins 64 --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+import warnings
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from prpd_stream import write_prpd_csv
+
+# 默认分箱数（与现有PRPD矩阵的有效区域一致）
+PHASE_BINS = 64
+AMP_BINS = 64
+
+# 每块读取的事件数
+CHUNK_SIZE = 1_000_000
+
+# 分箱参数（可pickle，便于随渲染任务发送到工作进程）
+# amp_range: 幅值范围(最小, 最大)，为None时先扫描一遍文件确定
+# frequency: 为None时第一列是相位角（度），否则第一列是时间戳（秒），按该工频换算相位
+EventBinning = namedtuple('EventBinning', ['phase_bins', 'amp_bins', 'amp_range', 'frequency'],
+                          defaults=(PHASE_BINS, AMP_BINS, None, None))
+
+def _has_header(f):
+    """判断CSV第一行是否为表头，读取后将文件指针移回开头"""
+    first_line = f.readline()
+    f.seek(0)
+    try:
+        [float(v) for v in first_line.split(',')[:2]]
+    except ValueError:
+        return True
+    return False
+
+def iter_event_chunks(file_path, chunk_size=CHUNK_SIZE):
+    """按块读取脉冲事件，每块为形状(n, 2)的float64数组"""
+    if os.path.splitext(file_path)[1].lower() == '.npy':
+        events = np.load(file_path, mmap_mode='r')
+        if events.ndim != 2 or events.shape[1] < 2:
+            raise ValueError(f"事件数组形状应为(N, 2): {events.shape}")
+        for start in range(0, len(events), chunk_size):
+            yield np.asarray(events[start:start + chunk_size, :2], dtype=np.float64)
+        return
+
+    with open(file_path, 'r', encoding='utf-8-sig') as f:
+        if _has_header(f):
+            f.readline()
+        while True:
+            with warnings.catch_warnings():
+                # 事件数恰好为块大小整数倍时，最后一次读取为空
+                warnings.simplefilter('ignore', UserWarning)
+                chunk = np.loadtxt(f, delimiter=',', usecols=(0, 1), max_rows=chunk_size,
+                                   ndmin=2, dtype=np.float64)
+            if len(chunk):
+                yield chunk
+            if len(chunk) < chunk_size:
+                break
+
+def scan_amp_range(file_path, chunk_size=CHUNK_SIZE):
+    """扫描文件，返回幅值范围(最小, 最大)"""
+    lo, hi = np.inf, -np.inf
+    for chunk in iter_event_chunks(file_path, chunk_size):
+        amp = chunk[:, 1]
+        amp = amp[np.isfinite(amp)]
+        if amp.size:
+            lo = min(lo, amp.min())
+            hi = max(hi, amp.max())
+    if lo > hi:
+        raise ValueError(f"文件中没有有效事件: {file_path}")
+    if lo == hi:
+        hi = lo + 1
+    return float(lo), float(hi)
+
+def event_phase(events, frequency=None):
+    """返回事件相位角（度，0-360），360°按0°计"""
+    if frequency is None:
+        return np.mod(events[:, 0], 360.0)
+    return np.mod(events[:, 0] * frequency, 1.0) * 360.0
+
+def _bin_index(values, lo, hi, bins):
+    """等宽分箱的档位索引，边界处理与np.histogram相同"""
+    index = ((values - lo) * (bins / (hi - lo))).astype(np.intp)
+    index[index == bins] -= 1
+    # 按实际分箱边界修正浮点误差
+    edges = np.linspace(lo, hi, bins + 1)
+    index[values < edges[index]] -= 1
+    index[(values >= edges[index + 1]) & (index != bins - 1)] += 1
+    return index
+
+def bin_events(events, binning, amp_range):
+    """将一块事件分箱，返回形状(amp_bins, phase_bins)的int64计数矩阵
+
+    超出幅值范围或含NaN的事件被丢弃，幅值等于上限的事件计入最高一档。
+    """
+    phase_bins, amp_bins = binning.phase_bins, binning.amp_bins
+    lo, hi = amp_range
+    phase = event_phase(events, binning.frequency)
+    amp = events[:, 1]
+    keep = (amp >= lo) & (amp <= hi) & np.isfinite(phase)
+    if not keep.all():
+        phase, amp = phase[keep], amp[keep]
+
+    phase_idx = _bin_index(phase, 0.0, 360.0, phase_bins)
+    amp_idx = _bin_index(amp, lo, hi, amp_bins)
+    flat = amp_idx * phase_bins + phase_idx
+    counts = np.bincount(flat, minlength=amp_bins * phase_bins)
+    return counts.reshape(amp_bins, phase_bins)
+
+def events_to_prpd(file_path, binning=EventBinning(), chunk_size=CHUNK_SIZE, workers=1):
+    """由原始脉冲事件文件生成PRPD计数矩阵（float64）
+
+    workers大于1时用线程池并行分箱，读取下一块与分箱同时进行；
+    同时在处理中的块数不超过workers的两倍，保证内存占用有上限。
+    """
+    amp_range = binning.amp_range or scan_amp_range(file_path, chunk_size)
+    counts = np.zeros((binning.amp_bins, binning.phase_bins), dtype=np.int64)
+    chunks = iter_event_chunks(file_path, chunk_size)
+
+    if workers <= 1:
+        for chunk in chunks:
+            counts += bin_events(chunk, binning, amp_range)
+        return counts.astype(np.float64)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            if len(pending) >= workers * 2:
+                counts += pending.popleft().result()
+            pending.append(executor.submit(bin_events, chunk, binning, amp_range))
+        for future in pending:
+            counts += future.result()
+    return counts.astype(np.float64)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="由原始脉冲事件生成PRPD图数据")
+    parser.add_argument('input', help="脉冲事件文件（CSV或.npy，列: 相位或时间戳, 放电量）")
+    parser.add_argument('-o', '--output', help="输出路径（.csv或.npy，默认只打印统计）")
+    parser.add_argument('--phase-bins', type=int, default=PHASE_BINS, help="相位分箱数")
+    parser.add_argument('--amp-bins', type=int, default=AMP_BINS, help="幅值分箱数")
+    parser.add_argument('--amp-range', type=float, nargs=2, metavar=('MIN', 'MAX'),
+                        help="幅值范围（默认扫描文件确定）")
+    parser.add_argument('--frequency', type=float,
+                        help="第一列为时间戳（秒）时的工频（Hz），默认第一列为相位角")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="每块读取的事件数")
+    parser.add_argument('--workers', type=int, default=1, help="分箱线程数")
+    args = parser.parse_args(argv)
+
+    binning = EventBinning(args.phase_bins, args.amp_bins,
+                           tuple(args.amp_range) if args.amp_range else None, args.frequency)
+    start = time.perf_counter()
+    data = events_to_prpd(args.input, binning, args.chunk_size, args.workers)
+    elapsed = time.perf_counter() - start
+    total = int(data.sum())
+    print(f"已分箱{total}个事件，形状{data.shape}，耗时{elapsed:.2f}s"
+          f"（{total / elapsed:,.0f} 事件/秒）", file=sys.stderr)
+    if args.output:
+        if args.output.lower().endswith('.npy'):
+            np.save(args.output, data)
+        else:
+            write_prpd_csv(args.output, data)
+        print(f"PRPD数据已保存到: {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
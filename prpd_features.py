@@ -0,0 +1,290 @@
+"""
+PRPD统计特征提取。
+
+用于放电类型识别（尖端、沿面、内部放电等）的PRPD统计特征，对形状为(N, 行, 列)的
+矩阵堆栈整体做向量化计算，不逐文件循环。行对应幅值（由低到高，按0-100%计），
+列对应相位（0-360°），所有矩阵中均为NaN的行、列（如行尾逗号产生的空列）被忽略。
+
+特征（pos为正半周0-180°，neg为负半周180-360°）:
+- pulse_count, pulse_count_pos/neg: 放电次数（矩阵元素之和）
+- amp_mean_pos/neg, amp_max_pos/neg: 半周内的平均、最大放电幅值（%）
+- hn_phase_mean/std/skew/kurt_pos/neg: 放电次数相位分布Hn(φ)的均值、标准差、偏斜度、峭度
+- hqmean_skew/kurt_pos/neg, hqmax_skew/kurt_pos/neg: 平均幅值分布Hqmean(φ)、
+  最大幅值分布Hqmax(φ)的偏斜度和峭度
+- cc_hn, cc_hqmean: 正、负半周分布的互相关系数
+- count_asymmetry, amp_asymmetry: 负半周与正半周放电次数、平均幅值之比
+- amp_mean_w{k}, amp_max_w{k}: 第k个相位窗口内的平均、最大放电幅值（%）
+
+用法:
+    python prpd_features.py 尖端放电 -o 特征.csv --windows 8
+    python prpd_features.py --archive 尖端放电_pack -o 特征.parquet
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+import numpy as np
+
+from prpd_cache import from_compact, load_prpd_matrix, open_archive
+from prpd_events import AMP_BINS, PHASE_BINS, EventBinning, events_to_prpd
+
+# 默认相位窗口数（每个窗口45°）
+PHASE_WINDOWS = 8
+
+# 每批堆叠的矩阵数，内存占用只与批大小有关
+BATCH_SIZE = 4096
+
+def _as_index(index):
+    """连续的索引转换为切片，取子数组时不复制"""
+    if len(index) and index[-1] - index[0] == len(index) - 1:
+        return slice(index[0], index[-1] + 1)
+    return index
+
+def _empty_maps(stack):
+    """矩阵堆栈中全为NaN（或没有元素）的矩阵，返回形状为(N,)的布尔数组"""
+    return np.isnan(stack).all(axis=(1, 2))
+
+def _valid_region(stack):
+    """返回所有矩阵中不全为NaN的行、列索引（连续时为切片）"""
+    all_nan = np.isnan(stack).all(axis=0)
+    rows = np.flatnonzero(~all_nan.all(axis=1))
+    cols = np.flatnonzero(~all_nan.all(axis=0))
+    if not len(rows) or not len(cols):
+        raise ValueError("矩阵中没有有效数据")
+    return _as_index(rows), _as_index(cols)
+
+def _divide(a, b):
+    """逐元素相除，分母为0时结果为0"""
+    return np.divide(a, b, out=np.zeros(np.broadcast(a, b).shape), where=b != 0)
+
+def _moments(weights, x):
+    """以weights为权重的分布在位置x上的均值、标准差、偏斜度和峭度（逐行计算）"""
+    w = _divide(weights, weights.sum(axis=1, keepdims=True))
+    mean = w @ x
+    d = x[np.newaxis, :] - mean[:, np.newaxis]
+    m2 = (w * d ** 2).sum(axis=1)
+    m3 = (w * d ** 3).sum(axis=1)
+    m4 = (w * d ** 4).sum(axis=1)
+    skew = _divide(m3, m2 ** 1.5)
+    kurt = np.where(m2 > 0, _divide(m4, m2 ** 2) - 3, 0.0)
+    return mean, np.sqrt(m2), skew, kurt
+
+def _correlate(a, b):
+    """逐行计算Pearson相关系数，任一行为常数时为0"""
+    length = min(a.shape[1], b.shape[1])
+    a = a[:, :length] - a[:, :length].mean(axis=1, keepdims=True)
+    b = b[:, :length] - b[:, :length].mean(axis=1, keepdims=True)
+    return _divide((a * b).sum(axis=1), np.sqrt((a * a).sum(axis=1) * (b * b).sum(axis=1)))
+
+def extract_features(stack, phase_windows=PHASE_WINDOWS):
+    """计算矩阵堆栈的统计特征，返回{特征名: 形状为(N,)的float64数组}（按固定顺序）"""
+    stack = np.asarray(stack, dtype=np.float64)
+    if stack.ndim == 2:
+        stack = stack[np.newaxis]
+    rows, cols = _valid_region(stack)
+    # NaN和负值按0计（fmax忽略NaN）
+    counts = np.fmax(stack[:, rows][:, :, cols], 0.0)
+    amp_bins, phase_bins = counts.shape[1:]
+    if not 1 <= phase_windows <= phase_bins:
+        raise ValueError(f"相位窗口数应在1到{phase_bins}之间: {phase_windows}")
+    amp = (np.arange(amp_bins) + 0.5) * (100.0 / amp_bins)
+    phase = (np.arange(phase_bins) + 0.5) * (360.0 / phase_bins)
+
+    # 相位分布: 放电次数Hn(φ)、平均幅值Hqmean(φ)、最大幅值Hqmax(φ)
+    hn = counts.sum(axis=1)
+    hq_sum = amp @ counts
+    hqmean = _divide(hq_sum, hn)
+    # 每个相位上最高的有放电的幅值档
+    nonzero = counts > 0
+    top = amp_bins - 1 - np.argmax(nonzero[:, ::-1], axis=1)
+    hqmax = np.where(hn > 0, amp[top], 0.0)
+
+    features = {'pulse_count': hn.sum(axis=1)}
+    halves = {'pos': phase < 180, 'neg': phase >= 180}
+    for suffix, mask in halves.items():
+        count = hn[:, mask].sum(axis=1)
+        features[f'pulse_count_{suffix}'] = count
+        features[f'amp_mean_{suffix}'] = _divide(hq_sum[:, mask].sum(axis=1), count)
+        features[f'amp_max_{suffix}'] = hqmax[:, mask].max(axis=1, initial=0.0)
+    for suffix, mask in halves.items():
+        mean, std, skew, kurt = _moments(hn[:, mask], phase[mask])
+        features[f'hn_phase_mean_{suffix}'] = mean
+        features[f'hn_phase_std_{suffix}'] = std
+        features[f'hn_skew_{suffix}'] = skew
+        features[f'hn_kurt_{suffix}'] = kurt
+        for name, dist in (('hqmean', hqmean), ('hqmax', hqmax)):
+            _, _, skew, kurt = _moments(dist[:, mask], phase[mask])
+            features[f'{name}_skew_{suffix}'] = skew
+            features[f'{name}_kurt_{suffix}'] = kurt
+    pos, neg = halves['pos'], halves['neg']
+    features['cc_hn'] = _correlate(hn[:, pos], hn[:, neg])
+    features['cc_hqmean'] = _correlate(hqmean[:, pos], hqmean[:, neg])
+    features['count_asymmetry'] = _divide(features['pulse_count_neg'],
+                                          features['pulse_count_pos'])
+    features['amp_asymmetry'] = _divide(features['amp_mean_neg'], features['amp_mean_pos'])
+
+    # 相位窗口内的平均、最大幅值（窗口按列连续，用reduceat分段求和）
+    starts = np.searchsorted(phase, np.arange(phase_windows) * (360.0 / phase_windows))
+    window_count = np.add.reduceat(hn, starts, axis=1)
+    window_mean = _divide(np.add.reduceat(hq_sum, starts, axis=1), window_count)
+    window_max = np.maximum.reduceat(hqmax, starts, axis=1)
+    for k in range(phase_windows):
+        features[f'amp_mean_w{k}'] = window_mean[:, k]
+    for k in range(phase_windows):
+        features[f'amp_max_w{k}'] = window_max[:, k]
+    return features
+
+def _load_map(file_path, events=None):
+    if events is not None:
+        return events_to_prpd(file_path, events)
+    return load_prpd_matrix(file_path)
+
+def iter_file_features(file_list, events=None, phase_windows=PHASE_WINDOWS,
+                       batch_size=BATCH_SIZE):
+    """分批读取文件并提取特征，每批产生(文件列表, 特征, 失败列表)
+
+    形状不同的矩阵分组堆叠；读取失败、没有有效数据或无法提取特征（如相位列数少于相位
+    窗口数）的文件以(文件路径, 错误信息)放入失败列表，其余文件照常处理。
+    """
+    for start in range(0, len(file_list), batch_size):
+        groups = {}  # 形状 -> (文件列表, 矩阵列表)
+        failed = []
+        for file_path in file_list[start:start + batch_size]:
+            try:
+                data = _load_map(file_path, events)
+                if _empty_maps(data[np.newaxis])[0]:
+                    raise ValueError("矩阵中没有有效数据")
+            except Exception as e:
+                failed.append((file_path, str(e)))
+                continue
+            names, maps = groups.setdefault(data.shape, ([], []))
+            names.append(file_path)
+            maps.append(data)
+        for names, maps in groups.values():
+            try:
+                features = extract_features(np.stack(maps), phase_windows)
+            except ValueError as e:
+                failed.extend((file_path, str(e)) for file_path in names)
+                continue
+            yield names, features, failed
+            failed = []
+        if failed:
+            yield [], {}, failed
+
+def iter_archive_features(prefix, phase_windows=PHASE_WINDOWS, batch_size=BATCH_SIZE):
+    """按批读取prpd_cache.py pack生成的内存映射数组并提取特征，每批产生(文件列表, 特征, 失败列表)
+
+    没有有效数据（全为NaN）的矩阵以(文件路径, 错误信息)放入失败列表，不计算其特征。
+    """
+    stack, index = open_archive(prefix)
+    source_dir = index.get('source_dir', '')
+    names = [os.path.join(source_dir, name) for name in index['files']]
+    for start in range(0, len(stack), batch_size):
+        batch = from_compact(np.asarray(stack[start:start + batch_size]))
+        batch_names = names[start:start + batch_size]
+        empty = _empty_maps(batch)
+        failed = [(batch_names[i], "矩阵中没有有效数据") for i in np.flatnonzero(empty)]
+        if failed:
+            batch = batch[~empty]
+            batch_names = [name for name, e in zip(batch_names, empty) if not e]
+        features = extract_features(batch, phase_windows) if len(batch) else {}
+        yield batch_names, features, failed
+
+class FeatureTable:
+    """按批累积的特征表"""
+    def __init__(self):
+        self.files = []
+        self.columns = None
+        self.batches = []
+
+    def __len__(self):
+        return len(self.files)
+
+    def append(self, files, features):
+        if not files:
+            return
+        if self.columns is None:
+            self.columns = list(features)
+        elif list(features) != self.columns:
+            raise ValueError("特征列与之前的批次不一致（相位窗口数不同？）")
+        self.files.extend(files)
+        self.batches.append(np.column_stack([features[name] for name in self.columns]))
+
+    def values(self):
+        """返回形状为(文件数, 特征数)的矩阵"""
+        if not self.batches:
+            return np.empty((0, len(self.columns or [])))
+        return np.concatenate(self.batches)
+
+    def write(self, path):
+        """写出特征表，扩展名为.parquet时写Parquet（需要pyarrow或fastparquet），否则写CSV"""
+        columns = self.columns or []
+        values = self.values()
+        if path.lower().endswith('.parquet'):
+            import pandas as pd
+            frame = pd.DataFrame(values, columns=columns)
+            frame.insert(0, 'file', self.files)
+            frame.to_parquet(path, index=False)
+            return
+        # 带BOM，便于Excel正确显示中文文件名
+        with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['file'] + columns)
+            for file_path, row in zip(self.files, values):
+                writer.writerow([file_path] + [f'{v:.10g}' for v in row])
+
+def main(argv=None):
+    from prpd_core import expand_inputs
+
+    parser = argparse.ArgumentParser(description="PRPD统计特征提取")
+    parser.add_argument('inputs', nargs='*', help="PRPD CSV文件、目录或通配符")
+    parser.add_argument('--archive', help="prpd_cache.py pack生成的数组前缀（代替输入文件）")
+    parser.add_argument('-o', '--output', required=True, help="特征表输出路径（.csv或.parquet）")
+    parser.add_argument('--windows', type=int, default=PHASE_WINDOWS, help="相位窗口数")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="每批堆叠的矩阵数")
+    parser.add_argument('--pattern', default='*.csv', help="目录中的文件匹配模式")
+    parser.add_argument('--events', action='store_true',
+                        help="输入为原始脉冲事件（列: 相位或时间戳, 放电量），先按分箱生成PRPD图")
+    parser.add_argument('--phase-bins', type=int, default=PHASE_BINS, help="脉冲事件的相位分箱数")
+    parser.add_argument('--amp-bins', type=int, default=AMP_BINS, help="脉冲事件的幅值分箱数")
+    parser.add_argument('--frequency', type=float,
+                        help="脉冲事件第一列为时间戳（秒）时的工频（Hz）")
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.archive:
+        parser.error("需要指定输入文件或--archive")
+
+    table = FeatureTable()
+    failed = 0
+    start = time.perf_counter()
+    if args.archive:
+        for files, features, errors in iter_archive_features(args.archive, args.windows,
+                                                             args.batch_size):
+            table.append(files, features)
+            for file_path, error in errors:
+                failed += 1
+                print(f"处理文件失败: {file_path} - {error}", file=sys.stderr)
+    else:
+        files = expand_inputs(args.inputs, args.pattern)
+        if not files:
+            parser.error("没有找到要处理的文件")
+        events = None
+        if args.events:
+            events = EventBinning(args.phase_bins, args.amp_bins, frequency=args.frequency)
+        for names, features, errors in iter_file_features(files, events, args.windows,
+                                                          args.batch_size):
+            table.append(names, features)
+            for file_path, error in errors:
+                failed += 1
+                print(f"处理文件失败: {file_path} - {error}", file=sys.stderr)
+    elapsed = time.perf_counter() - start
+
+    table.write(args.output)
+    print(f"已提取{len(table)}个矩阵的{len(table.columns or [])}个特征，耗时{elapsed:.2f}s"
+          f"（{len(table) / max(elapsed, 1e-9):,.0f} 矩阵/秒），已保存到: {args.output}",
+          file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,340 @@
+"""
+PRPD相似图谱索引。
+
+图谱库中的每个PRPD矩阵先归一化（去掉全为NaN的行列，缩放到固定网格，取log1p压缩动态范围，
+再按L2范数归一化），可选地用PCA降维，得到float32嵌入向量。嵌入保存在索引目录的
+vectors.npy中并以内存映射方式打开，查询时对全部向量做一次矩阵乘法，按余弦相似度或
+L2距离取前k个结果，多个查询可合并为一次计算。
+
+索引支持增量添加和删除：添加时在数组末尾写入（容量不足时按倍数扩容），删除只做标记，
+compact时才真正移除。
+
+索引目录内容:
+    index.json  参数（网格、维数）和条目列表（文件、标签、是否已删除）
+    vectors.npy 嵌入矩阵（容量×维数，float32）
+    pca.npz     PCA的均值和主成分（不降维时没有此文件）
+
+用法:
+    python prpd_index.py build 图谱库 -o 图谱索引 --dim 64
+    python prpd_index.py add 图谱索引 新图谱目录 --label 沿面放电
+    python prpd_index.py query 图谱索引 待识别.csv -k 5 --metric cosine
+    python prpd_index.py delete 图谱索引 旧图谱.csv
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from prpd_archive import get_archive, split_member_path
+from prpd_cache import load_prpd_matrix
+
+# 归一化网格（行, 列）
+GRID = (32, 32)
+
+# 默认PCA维数，0表示不降维
+PCA_DIM = 64
+
+# 拟合PCA时最多使用的图谱数
+PCA_SAMPLES = 5000
+
+METRICS = ("cosine", "l2")
+
+INDEX_NAME = 'index.json'
+VECTORS_NAME = 'vectors.npy'
+PCA_NAME = 'pca.npz'
+
+def _trim(data):
+    """去掉全为NaN的行和列，其余NaN和负值按0计"""
+    valid = ~np.isnan(data)
+    rows = np.flatnonzero(valid.any(axis=1))
+    cols = np.flatnonzero(valid.any(axis=0))
+    if not len(rows) or not len(cols):
+        raise ValueError("矩阵中没有有效数据")
+    return np.fmax(data[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1], 0.0)
+
+def _resample_axis(data, size, axis):
+    """沿一个轴缩放到size：缩小时按区间求平均，放大时取最近邻"""
+    length = data.shape[axis]
+    if length == size:
+        return data
+    if length > size:
+        starts = (np.arange(size) * length) // size
+        widths = np.diff(np.append(starts, length))
+        shape = [1] * data.ndim
+        shape[axis] = size
+        return np.add.reduceat(data, starts, axis=axis) / widths.reshape(shape)
+    index = ((np.arange(size) + 0.5) * length / size).astype(np.intp)
+    return np.take(data, index, axis=axis)
+
+def normalize_map(data, grid=GRID):
+    """将PRPD矩阵归一化为长度为rows*cols的单位向量（float32）"""
+    data = _trim(np.asarray(data, dtype=np.float64))
+    data = _resample_axis(_resample_axis(data, grid[0], 0), grid[1], 1)
+    vector = np.log1p(data).ravel()
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm > 0 else vector).astype(np.float32)
+
+def _unit_rows(vectors):
+    """逐行归一化为单位向量（零向量保持为零）"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+def fit_pca(vectors, dim):
+    """拟合PCA，返回(均值, 主成分)，主成分形状为(维数, 特征数)"""
+    mean = vectors.mean(axis=0)
+    _, _, vt = np.linalg.svd(vectors - mean, full_matrices=False)
+    return mean.astype(np.float32), vt[:dim].astype(np.float32)
+
+class PRPDIndex:
+    """内存映射的PRPD嵌入索引"""
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX_NAME), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.grid = tuple(meta['grid'])
+        self.dim = meta['dim']
+        self.entries = meta['entries']  # [{'file', 'label', 'deleted'}]
+        pca_path = os.path.join(path, PCA_NAME)
+        if os.path.exists(pca_path):
+            with np.load(pca_path) as pca:
+                self.pca_mean, self.pca_components = pca['mean'], pca['components']
+        else:
+            self.pca_mean = self.pca_components = None
+        self.vectors = np.load(os.path.join(path, VECTORS_NAME), mmap_mode='r+')
+        self._deleted = np.array([e['deleted'] for e in self.entries], dtype=bool)
+        self._sq_norms = None  # L2查询用的平方范数，按需计算
+
+    def __len__(self):
+        """有效（未删除）的条目数"""
+        return len(self.entries) - int(self._deleted.sum())
+
+    @classmethod
+    def create(cls, path, maps, files, labels, dim=PCA_DIM, grid=GRID):
+        """由图谱创建新索引（dim为0或不小于网格大小时不降维）"""
+        vectors = np.stack([normalize_map(data, grid) for data in maps])
+        os.makedirs(path, exist_ok=True)
+        pca_path = os.path.join(path, PCA_NAME)
+        if 0 < dim < vectors.shape[1]:
+            dim = min(dim, len(vectors))
+            sample = vectors[:PCA_SAMPLES]
+            mean, components = fit_pca(sample, dim)
+            np.savez(pca_path, mean=mean, components=components)
+        else:
+            dim = vectors.shape[1]
+            if os.path.exists(pca_path):
+                os.remove(pca_path)
+        meta = {'grid': list(grid), 'dim': dim, 'entries': []}
+        with open(os.path.join(path, INDEX_NAME), 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        np.lib.format.open_memmap(os.path.join(path, VECTORS_NAME), mode='w+',
+                                  dtype=np.float32, shape=(max(len(vectors), 1024), dim))
+        index = cls(path)
+        index._append(index._embed_vectors(vectors), files, labels)
+        return index
+
+    def embed(self, maps):
+        """将一组PRPD矩阵转换为嵌入向量，形状为(N, dim)"""
+        return self._embed_vectors(np.stack([normalize_map(data, self.grid) for data in maps]))
+
+    def _embed_vectors(self, vectors):
+        if self.pca_components is None:
+            return vectors
+        # 降维后重新归一化，余弦相似度只与方向有关
+        return _unit_rows((vectors - self.pca_mean) @ self.pca_components.T)
+
+    def _grow(self, capacity):
+        """扩容嵌入矩阵（复制到新文件后替换）"""
+        vectors_path = os.path.join(self.path, VECTORS_NAME)
+        tmp_path = f"{vectors_path}.{os.getpid()}.tmp.npy"
+        grown = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32,
+                                          shape=(capacity, self.dim))
+        grown[:len(self.entries)] = self.vectors[:len(self.entries)]
+        grown.flush()
+        del grown
+        self.vectors = None
+        os.replace(tmp_path, vectors_path)
+        self.vectors = np.load(vectors_path, mmap_mode='r+')
+
+    def _append(self, embeddings, files, labels):
+        count = len(self.entries)
+        if count + len(embeddings) > len(self.vectors):
+            self._grow(max(2 * len(self.vectors), count + len(embeddings), 1024))
+        self.vectors[count:count + len(embeddings)] = embeddings
+        self.vectors.flush()
+        for file_path, label in zip(files, labels):
+            self.entries.append({'file': os.path.abspath(file_path), 'label': label,
+                                 'deleted': False})
+        self._deleted = np.append(self._deleted, np.zeros(len(embeddings), dtype=bool))
+        if self._sq_norms is not None:
+            self._sq_norms = np.append(self._sq_norms, (embeddings ** 2).sum(axis=1))
+        self.save()
+        return list(range(count, count + len(embeddings)))
+
+    def add(self, maps, files, labels):
+        """添加图谱，返回新条目的编号"""
+        return self._append(self.embed(maps), files, labels)
+
+    def delete(self, ids):
+        """按编号删除条目（只做标记，compact时才移除）"""
+        for i in ids:
+            self.entries[i]['deleted'] = True
+            self._deleted[i] = True
+        self.save()
+
+    def find(self, file_path):
+        """返回文件对应的（未删除的）条目编号"""
+        file_path = os.path.abspath(file_path)
+        return [i for i, entry in enumerate(self.entries)
+                if entry['file'] == file_path and not entry['deleted']]
+
+    def compact(self):
+        """移除已删除的条目，返回移除的条数"""
+        keep = np.flatnonzero(~self._deleted)
+        removed = len(self.entries) - len(keep)
+        if removed:
+            self.vectors[:len(keep)] = self.vectors[keep]
+            self.vectors.flush()
+            self.entries = [self.entries[i] for i in keep]
+            self._deleted = np.zeros(len(keep), dtype=bool)
+            self._sq_norms = None
+            self.save()
+        return removed
+
+    def save(self):
+        """写出条目列表（先写临时文件再替换）"""
+        meta = {'grid': list(self.grid), 'dim': self.dim, 'entries': self.entries}
+        index_path = os.path.join(self.path, INDEX_NAME)
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, index_path)
+
+    def search(self, queries, k=5, metric="cosine"):
+        """查询最相似的k个条目，queries为嵌入向量（一维或(Q, dim)）
+
+        返回(编号, 得分)，形状均为(Q, k)；余弦得分越大越相似，L2得分为距离，越小越相似。
+        有效条目少于k个时编号以-1补齐。
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        vectors = self.vectors[:len(self.entries)]
+        if metric == "cosine":
+            scores = queries @ vectors.T
+        elif metric == "l2":
+            if self._sq_norms is None:
+                self._sq_norms = (vectors.astype(np.float32) ** 2).sum(axis=1)
+            # |v - q|^2 = |v|^2 - 2 v·q + |q|^2，取负后与余弦统一为越大越相似
+            scores = 2 * (queries @ vectors.T) - self._sq_norms - (queries ** 2).sum(axis=1,
+                                                                                   keepdims=True)
+        else:
+            raise ValueError(f"未知的距离度量: {metric}")
+        scores[:, self._deleted] = -np.inf
+
+        k = min(k, scores.shape[1])
+        ids = np.full((len(queries), k), -1, dtype=np.intp)
+        top_scores = np.full((len(queries), k), np.nan, dtype=np.float32)
+        if k:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_values = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_values, axis=1)
+            ids = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_values, order, axis=1)
+            invalid = np.isneginf(top_scores)
+            ids[invalid] = -1
+            top_scores[invalid] = np.nan
+        if metric == "l2":
+            top_scores = np.sqrt(np.maximum(-top_scores, 0))
+        return ids, top_scores
+
+    def search_maps(self, maps, k=5, metric="cosine"):
+        """查询与PRPD矩阵最相似的条目，返回每个矩阵的[(条目, 得分)]列表"""
+        ids, scores = self.search(self.embed(maps), k, metric)
+        return [[(self.entries[i], float(s)) for i, s in zip(row_ids, row_scores) if i >= 0]
+                for row_ids, row_scores in zip(ids, scores)]
+
+def default_label(file_path):
+    """默认标签: 文件所在目录名（如"尖端放电"），归档成员为打包时记录的标签"""
+    member = split_member_path(file_path)
+    if member is not None:
+        return get_archive(member[0]).label(member[1])
+    return os.path.basename(os.path.dirname(os.path.abspath(file_path)))
+
+def _load_files(files, label=None):
+    """读取文件，返回(矩阵列表, 文件列表, 标签列表)，读取失败的文件打印后跳过"""
+    maps, loaded, labels = [], [], []
+    for file_path in files:
+        try:
+            maps.append(load_prpd_matrix(file_path))
+        except Exception as e:
+            print(f"读取文件失败: {file_path} - {e}", file=sys.stderr)
+            continue
+        loaded.append(file_path)
+        labels.append(label or default_label(file_path))
+    return maps, loaded, labels
+
+def main(argv=None):
+    from prpd_core import expand_inputs
+
+    parser = argparse.ArgumentParser(description="PRPD相似图谱索引")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="由图谱库创建索引")
+    build_parser.add_argument('inputs', nargs='+', help="PRPD CSV文件、目录或通配符")
+    build_parser.add_argument('-o', '--output', required=True, help="索引目录")
+    build_parser.add_argument('--dim', type=int, default=PCA_DIM, help="PCA维数（0表示不降维）")
+    build_parser.add_argument('--label', help="标签（默认为文件所在目录名）")
+
+    add_parser = subparsers.add_parser('add', help="向索引添加图谱")
+    add_parser.add_argument('index', help="索引目录")
+    add_parser.add_argument('inputs', nargs='+', help="PRPD CSV文件、目录或通配符")
+    add_parser.add_argument('--label', help="标签（默认为文件所在目录名）")
+
+    delete_parser = subparsers.add_parser('delete', help="从索引删除图谱")
+    delete_parser.add_argument('index', help="索引目录")
+    delete_parser.add_argument('files', nargs='+', help="要删除的文件")
+    delete_parser.add_argument('--compact', action='store_true', help="删除后压缩索引")
+
+    query_parser = subparsers.add_parser('query', help="查询相似图谱")
+    query_parser.add_argument('index', help="索引目录")
+    query_parser.add_argument('inputs', nargs='+', help="待查询的PRPD CSV文件、目录或通配符")
+    query_parser.add_argument('-k', type=int, default=5, help="返回的结果数")
+    query_parser.add_argument('--metric', choices=METRICS, default="cosine", help="距离度量")
+
+    args = parser.parse_args(argv)
+    if args.command == 'build':
+        maps, files, labels = _load_files(expand_inputs(args.inputs), args.label)
+        if not maps:
+            parser.error("没有可用的图谱")
+        index = PRPDIndex.create(args.output, maps, files, labels, args.dim)
+        print(f"已建立索引: {len(index)}个图谱，{index.dim}维，保存在: {args.output}")
+    elif args.command == 'add':
+        index = PRPDIndex(args.index)
+        maps, files, labels = _load_files(expand_inputs(args.inputs), args.label)
+        if maps:
+            index.add(maps, files, labels)
+        print(f"已添加{len(maps)}个图谱，索引共{len(index)}个")
+    elif args.command == 'delete':
+        index = PRPDIndex(args.index)
+        ids = [i for file_path in args.files for i in index.find(file_path)]
+        index.delete(ids)
+        if args.compact:
+            index.compact()
+        print(f"已删除{len(ids)}个图谱，索引共{len(index)}个")
+    elif args.command == 'query':
+        index = PRPDIndex(args.index)
+        maps, files, _ = _load_files(expand_inputs(args.inputs))
+        start = time.perf_counter()
+        results = index.search_maps(maps, args.k, args.metric)
+        elapsed = time.perf_counter() - start
+        for file_path, matches in zip(files, results):
+            print(file_path)
+            for rank, (entry, score) in enumerate(matches, 1):
+                print(f"  {rank}. [{entry['label']}] {score:.4f} {entry['file']}")
+        print(f"查询{len(maps)}个图谱，索引{len(index)}个，耗时{elapsed * 1000:.1f}ms",
+              file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
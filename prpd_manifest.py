@@ -0,0 +1,136 @@
+"""
+批处理任务清单。
+
+输出目录中的prpd_manifest.jsonl记录每个已完成的渲染任务：输入文件哈希、渲染参数和输出文件。
+再次运行时，输入和参数都未变化且输出文件仍存在的任务会被跳过；中断（崩溃或取消）的批处理
+因此可以从中断处继续。每完成一个文件追加一行，不需要在结束时统一写入。
+"""
+import hashlib
+import json
+import os
+
+from prpd_archive import read_member_compact, split_member_path, stat_source
+
+MANIFEST_NAME = 'prpd_manifest.jsonl'
+
+def job_params(job):
+    """返回影响输出图像的渲染参数（按JSON规范化，便于与清单中的记录比较）"""
+    params = {
+        'color_scheme': list(job.color_scheme),
+        'dpi': job.dpi,
+        'view_mode': job.view_mode,
+        'render_mode': job.render_mode,
+        # 网格数只影响3D视图
+        'surface_count': job.surface_count if job.view_mode == "3D" else None,
+        'events': list(job.events) if job.events is not None else None,
+    }
+    # 不预处理时不记录，之前的清单记录仍然有效
+    if job.preprocess is not None:
+        params['preprocess'] = list(job.preprocess)
+    return json.loads(json.dumps(params))
+
+def file_hash(file_path):
+    """计算文件内容的SHA1（归档成员按矩阵数据计算）"""
+    digest = hashlib.sha1()
+    if split_member_path(file_path) is not None:
+        compact = read_member_compact(file_path)
+        digest.update(f"{compact.dtype.str}{compact.shape}".encode('ascii'))
+        digest.update(compact.tobytes())
+        return digest.hexdigest()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class JobManifest:
+    """输出目录中的任务清单"""
+    def __init__(self, output_dir):
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self.entries = {}  # 输出路径 -> 记录
+        self._fingerprints = {}  # 输入路径 -> (大小, 修改时间, 哈希)
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except OSError:
+            return
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # 崩溃时最后一行可能只写了一半
+                continue
+            self.entries[entry['output']] = entry
+            self._fingerprints[entry['input']] = (entry['input_size'], entry['input_mtime_ns'],
+                                                  entry['input_hash'])
+        # 同一输出被多次记录时压缩清单
+        if len(lines) > 2 * len(self.entries):
+            self._rewrite()
+
+    def _rewrite(self):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        os.replace(tmp_path, self.path)
+
+    def fingerprint(self, file_path):
+        """返回输入文件的(大小, 修改时间, 哈希)，大小和修改时间未变时不重新计算哈希"""
+        file_path = os.path.abspath(file_path)
+        stat = stat_source(file_path)
+        cached = self._fingerprints.get(file_path)
+        if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            return cached
+        fingerprint = (stat.st_size, stat.st_mtime_ns, file_hash(file_path))
+        self._fingerprints[file_path] = fingerprint
+        return fingerprint
+
+    def is_current(self, job):
+        """输入、渲染参数均未变化且输出文件完整存在时返回True"""
+        entry = self.entries.get(os.path.abspath(job.save_path))
+        if entry is None or entry['params'] != job_params(job):
+            return False
+        try:
+            if os.path.getsize(job.save_path) != entry['output_size']:
+                return False
+            return self.fingerprint(job.file_path)[2] == entry['input_hash']
+        except OSError:
+            return False
+
+    def split_jobs(self, jobs):
+        """将任务分为(待处理, 可跳过)两部分
+
+        待处理任务的输入在渲染前计算指纹，渲染期间被修改的文件下次运行时会重新处理。
+        """
+        pending, skipped = [], []
+        for job in jobs:
+            if self.is_current(job):
+                skipped.append(job)
+                continue
+            try:
+                self.fingerprint(job.file_path)
+            except OSError:
+                pass  # 读取失败由渲染阶段报告
+            pending.append(job)
+        return pending, skipped
+
+    def record(self, job):
+        """记录已完成的任务（立即追加到清单文件）"""
+        input_path = os.path.abspath(job.file_path)
+        # 优先使用渲染前计算的指纹
+        fingerprint = self._fingerprints.get(input_path) or self.fingerprint(input_path)
+        size, mtime_ns, content_hash = fingerprint
+        entry = {
+            'input': input_path,
+            'input_size': size,
+            'input_mtime_ns': mtime_ns,
+            'input_hash': content_hash,
+            'params': job_params(job),
+            'output': os.path.abspath(job.save_path),
+            'output_size': os.path.getsize(job.save_path),
+        }
+        self.entries[entry['output']] = entry
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
@@ -0,0 +1,213 @@
+"""
+批处理运行统计。
+
+BatchMetrics记录每个文件各阶段（读取解析、渲染、编码、写出）的耗时，随时可取出
+滚动吞吐量、预计剩余时间、p50/p95延迟、峰值内存和失败数；同时把每个文件的记录
+按JSON Lines追加到日志文件，便于之后分析（如找出慢文件、估算所需硬件）。
+监视目录时还记录从文件到达到图像写出的端到端延迟（见arrived）。
+
+日志每行一个JSON对象，type为start（批处理开始，含参数）、file（单个文件）或
+summary（结束时的统计）。
+"""
+import datetime
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# 批处理日志文件名（保存在输出目录中）
+BATCH_LOG_NAME = 'prpd_batch_log.jsonl'
+
+# 单个文件的处理阶段
+STAGES = {"read": "读取", "render": "渲染", "encode": "编码", "write": "写出"}
+
+# 延迟统计（处理耗时和端到端延迟）保留的最近文件数（长时间运行的监视进程内存有上限，
+# 计算百分位数的时间也不随处理的文件数增长）
+ARRIVAL_WINDOW = 10000
+
+def peak_rss_bytes():
+    """当前进程的峰值常驻内存（字节），无法获取时返回None"""
+    try:
+        import resource
+    except ImportError:
+        # Windows没有resource模块，安装了psutil时使用其峰值工作集
+        try:
+            import psutil
+        except ImportError:
+            return None
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss)
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux以KB为单位，macOS以字节为单位
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+def current_rss_bytes():
+    """当前进程的常驻内存（字节），无法获取时返回None"""
+    try:
+        # Linux: /proc/self/statm的第二项为常驻页数
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    return psutil.Process().memory_info().rss
+
+class BatchMetrics:
+    """批处理的逐文件统计（可在多个线程中调用）"""
+    SLOWEST_COUNT = 5
+
+    def __init__(self, total=0, log_path=None, window=10.0, params=None):
+        self.total = total
+        self.window = window  # 滚动吞吐量的时间窗口（秒）
+        self.done = 0
+        self.failed = 0
+        self.latencies = deque(maxlen=ARRIVAL_WINDOW)  # 最近成功文件的处理耗时（各阶段之和）
+        self.stage_totals = dict.fromkeys(STAGES, 0.0)
+        self.stage_counts = dict.fromkeys(STAGES, 0)
+        self.worker_peak_rss = 0  # 工作进程报告的峰值内存
+        self._slowest = []  # (耗时, 文件)的最小堆，保留最慢的几个文件
+        self._recent = deque()  # 最近完成的时间点
+        self._arrivals = {}  # 文件 -> 到达时间（Unix时间）
+        self.arrival_latencies = deque(maxlen=ARRIVAL_WINDOW)  # 最近文件的端到端延迟
+        self._lock = threading.Lock()
+        self.start = time.perf_counter()
+        self._log = None
+        if log_path:
+            self._log = open(log_path, 'a', encoding='utf-8')
+            self._write_log({'type': 'start', 'time': self._now(), 'total': total,
+                             'params': params})
+
+    @staticmethod
+    def _now():
+        return datetime.datetime.now().isoformat(timespec='milliseconds')
+
+    def _write_log(self, record):
+        self._log.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._log.flush()
+
+    def add_total(self, count):
+        """增加待处理文件数（监视目录时文件陆续到达）"""
+        with self._lock:
+            self.total += count
+
+    def arrived(self, file_path, arrival_time):
+        """记录文件的到达时间（Unix时间），该文件完成时计算端到端延迟"""
+        with self._lock:
+            self._arrivals[file_path] = arrival_time
+
+    def file_done(self, file_path, save_path, error, timings, worker_rss=None):
+        """记录一个已完成（或失败）的文件，timings为{阶段: 秒}"""
+        latency = sum(timings.values())
+        now = time.perf_counter()
+        with self._lock:
+            arrival = self._arrivals.pop(file_path, None)
+            arrival_latency = None if arrival is None else time.time() - arrival
+            if arrival_latency is not None and error is None:
+                self.arrival_latencies.append(arrival_latency)
+            self.done += 1
+            self._recent.append(now)
+            for stage, seconds in timings.items():
+                self.stage_totals[stage] += seconds
+                self.stage_counts[stage] += 1
+            if error is None:
+                self.latencies.append(latency)
+                if len(self._slowest) < self.SLOWEST_COUNT:
+                    heapq.heappush(self._slowest, (latency, file_path))
+                else:
+                    heapq.heappushpop(self._slowest, (latency, file_path))
+            else:
+                self.failed += 1
+            if worker_rss:
+                self.worker_peak_rss = max(self.worker_peak_rss, worker_rss)
+            if self._log is not None:
+                self._write_log({'type': 'file', 'time': self._now(),
+                                 'elapsed': round(now - self.start, 6), 'file': file_path,
+                                 'output': save_path, 'error': error,
+                                 'timings': {k: round(v, 6) for k, v in timings.items()},
+                                 'latency': round(latency, 6), 'worker_rss': worker_rss,
+                                 'arrival_latency': (None if arrival_latency is None
+                                                     else round(arrival_latency, 6))})
+
+    def rolling_rate(self):
+        """最近window秒内的吞吐量（文件/秒）"""
+        now = time.perf_counter()
+        with self._lock:
+            while self._recent and now - self._recent[0] > self.window:
+                self._recent.popleft()
+            count = len(self._recent)
+        span = min(self.window, now - self.start)
+        return count / span if span > 0 else 0.0
+
+    def snapshot(self):
+        """返回当前统计（字典，可跨线程传递）"""
+        rate = self.rolling_rate()
+        with self._lock:
+            elapsed = time.perf_counter() - self.start
+            remaining = max(self.total - self.done, 0)
+            latencies = np.array(self.latencies)
+            p50, p95 = (np.percentile(latencies, [50, 95]) if len(latencies) else (None, None))
+            arrival_latencies = np.array(self.arrival_latencies)
+            arrival_p50, arrival_p95 = (np.percentile(arrival_latencies, [50, 95])
+                                        if len(arrival_latencies) else (None, None))
+            stage_means = {stage: self.stage_totals[stage] / self.stage_counts[stage]
+                           for stage in STAGES if self.stage_counts[stage]}
+            slowest = sorted(self._slowest, reverse=True)
+            rss = [v for v in (peak_rss_bytes(), self.worker_peak_rss) if v]
+            return {
+                'total': self.total,
+                'done': self.done,
+                'failed': self.failed,
+                'elapsed': elapsed,
+                'rate': rate,
+                'mean_rate': self.done / elapsed if elapsed > 0 else 0.0,
+                'eta': remaining / rate if rate > 0 else None,
+                'p50': None if p50 is None else float(p50),
+                'p95': None if p95 is None else float(p95),
+                'arrival_p50': None if arrival_p50 is None else float(arrival_p50),
+                'arrival_p95': None if arrival_p95 is None else float(arrival_p95),
+                'stage_means': stage_means,
+                'peak_rss': max(rss) if rss else None,
+                'slowest': [(file_path, latency) for latency, file_path in slowest],
+            }
+
+    def summary(self):
+        """返回统计的文字说明"""
+        return format_snapshot(self.snapshot())
+
+    def close(self):
+        """写出结束统计并关闭日志"""
+        if self._log is not None:
+            self._write_log(dict(self.snapshot(), type='summary', time=self._now()))
+            self._log.close()
+            self._log = None
+
+def format_seconds(seconds):
+    """将秒数格式化为"1时02分03秒"形式"""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}时{minutes:02d}分{seconds:02d}秒"
+    if minutes:
+        return f"{minutes}分{seconds:02d}秒"
+    return f"{seconds}秒"
+
+def format_snapshot(snapshot):
+    """将snapshot()的结果格式化为一行文字"""
+    parts = [f"完成{snapshot['done']}/{snapshot['total']}，失败{snapshot['failed']}",
+             f"{snapshot['rate']:.2f} 文件/秒"]
+    if snapshot['p50'] is not None:
+        parts.append(f"延迟p50 {snapshot['p50'] * 1000:.0f}ms/p95 {snapshot['p95'] * 1000:.0f}ms")
+    if snapshot.get('arrival_p50') is not None:
+        parts.append(f"端到端延迟p50 {snapshot['arrival_p50']:.2f}s/p95 {snapshot['arrival_p95']:.2f}s")
+    if snapshot['peak_rss']:
+        parts.append(f"峰值内存{snapshot['peak_rss'] / 2**20:.0f}MB")
+    return "，".join(parts)
@@ -0,0 +1,222 @@
+"""
+PRPD图谱预处理（读取之后、绘图之前）。
+
+依次进行：
+1. 噪声阈值：低于阈值的计数置为0
+2. 中值滤波（去除孤立的噪声点）
+3. 高斯平滑
+4. 对数缩放：显示log10(1+值)
+5. 颜色范围：每个文件自动（file）、所有文件统一（global，批处理时先扫描一遍计算）
+   或固定的vmin/vmax（fixed，按原始单位，对数缩放时同样换算）
+
+所有步骤都是NumPy向量化运算，既可处理单个矩阵(行, 列)，也可一次处理形状相同的一组
+矩阵(N, 行, 列)。滤波时相位方向（列）首尾相接（0°与360°相邻），幅值方向（行）边缘按
+最近值延伸；全为NaN的列（行尾逗号产生的空列）不参与滤波，其他NaN按0参与计算后还原。
+"""
+import argparse
+import math
+import sys
+from collections import namedtuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 颜色范围方式
+NORMALIZE_MODES = {"file": "每个文件自动", "global": "所有文件统一", "fixed": "固定范围"}
+
+# 预处理参数（可pickle，随渲染任务发送到工作进程）
+# threshold: 噪声阈值，0表示不处理
+# median: 中值滤波窗口大小（奇数），1表示不处理
+# sigma: 高斯平滑的标准差（单元格数），0表示不处理
+# log: 是否显示log10(1+值)
+# normalize: 颜色范围方式，见NORMALIZE_MODES
+# vmin, vmax: 固定颜色范围（原始单位），normalize为fixed时使用
+Preprocess = namedtuple('Preprocess', ['threshold', 'median', 'sigma', 'log', 'normalize',
+                                       'vmin', 'vmax'],
+                        defaults=(0.0, 1, 0.0, False, "file", None, None))
+
+# 全局颜色范围扫描时每次读取、处理的矩阵数
+GLOBAL_CHUNK = 64
+
+# 一组矩阵每次滤波的矩阵数（滤波的临时数组较小，可留在CPU缓存中，比整组一次处理快）
+FILTER_BLOCK = 8
+
+# 3×3中值滤波的排序网络（19次比较交换后第4个元素为9个数的中位数）
+MEDIAN9_NETWORK = [(1, 2), (4, 5), (7, 8), (0, 1), (3, 4), (6, 7), (1, 2), (4, 5), (7, 8),
+                   (0, 3), (5, 8), (4, 7), (3, 6), (1, 4), (2, 5), (4, 7), (4, 2), (6, 4), (4, 2)]
+
+def is_identity(params):
+    """参数是否不做任何处理（与不预处理的结果相同）"""
+    return params is None or params == Preprocess()
+
+def _valid_columns(data):
+    """不全为NaN的列（对一组矩阵为所有矩阵中都不全为NaN的列）"""
+    return ~np.isnan(data).all(axis=tuple(range(data.ndim - 1)))
+
+def _pad(data, radius):
+    """相位方向（列）循环填充，幅值方向（行）按边缘值填充"""
+    pad = [(0, 0)] * (data.ndim - 2)
+    data = np.pad(data, pad + [(0, 0), (radius, radius)], mode='wrap')
+    return np.pad(data, pad + [(radius, radius), (0, 0)], mode='edge')
+
+def median_filter(data, size):
+    """size×size窗口的中值滤波（对最后两维）
+
+    窗口内的size²个位移矩阵逐元素比较：3×3窗口用排序网络（np.minimum/np.maximum），
+    其他大小叠成一个数组后用np.partition取中位数，都比对每个窗口调用np.median快。
+    """
+    padded = _pad(data, size // 2)
+    rows, cols = data.shape[-2:]
+    shifted = [padded[..., i:i + rows, j:j + cols] for i in range(size) for j in range(size)]
+    if size != 3:
+        middle = size * size // 2
+        return np.partition(np.stack(shifted), middle, axis=0)[middle]
+    values = [a.copy() for a in shifted]
+    low = np.empty_like(values[0])
+    for a, b in MEDIAN9_NETWORK:
+        np.minimum(values[a], values[b], out=low)
+        np.maximum(values[a], values[b], out=values[b])
+        values[a], low = low, values[a]
+    return values[4]
+
+def gaussian_kernel(sigma):
+    """截断于3σ的一维高斯核（和为1）"""
+    radius = max(1, int(math.ceil(3 * sigma)))
+    x = np.arange(-radius, radius + 1)
+    kernel = np.exp(-0.5 * (x / sigma) ** 2)
+    return kernel / kernel.sum()
+
+def gaussian_filter(data, sigma):
+    """高斯平滑（对最后两维，按行、列两次一维卷积）"""
+    kernel = gaussian_kernel(sigma)
+    radius = len(kernel) // 2
+    padded = _pad(data, radius)
+    rows = sliding_window_view(padded, len(kernel), axis=-2) @ kernel
+    return sliding_window_view(rows, len(kernel), axis=-1) @ kernel
+
+def _filter(values, params):
+    """中值滤波和高斯平滑（不含NaN的矩阵或一组矩阵）"""
+    if params.median > 1:
+        values = median_filter(values, params.median)
+    if params.sigma > 0:
+        values = gaussian_filter(values, params.sigma)
+    return values
+
+def preprocess_maps(data, params):
+    """对矩阵(行, 列)或一组形状相同的矩阵(N, 行, 列)进行预处理，返回新的float64数组"""
+    data = np.array(data, dtype=np.float64)
+    if is_identity(params):
+        return data
+    if params.threshold > 0:
+        data[data < params.threshold] = 0
+    if params.median > 1 or params.sigma > 0:
+        valid = _valid_columns(data)
+        values = data[..., valid]
+        nan_mask = np.isnan(values)
+        values[nan_mask] = 0
+        if values.ndim == 2:
+            values = _filter(values, params)
+        else:
+            for start in range(0, len(values), FILTER_BLOCK):
+                block = slice(start, start + FILTER_BLOCK)
+                values[block] = _filter(values[block], params)
+        values[nan_mask] = np.nan
+        data[..., valid] = values
+    if params.log:
+        # 原地计算log10(1+值)，不产生与整组矩阵同样大小的临时数组
+        np.maximum(data, 0, out=data)
+        np.log1p(data, out=data)
+        data /= np.log(10)
+    return data
+
+def _scale(params, value):
+    """将原始单位的值换算为显示单位（对数缩放时为log10(1+值)）"""
+    return float(np.log1p(max(value, 0)) / np.log(10)) if params.log else float(value)
+
+def color_limits(params):
+    """固定的颜色范围（显示单位），每个文件自动计算时返回None"""
+    if params is None or params.normalize != "fixed" or params.vmin is None or params.vmax is None:
+        return None
+    return _scale(params, params.vmin), _scale(params, params.vmax)
+
+def data_limits(data, clim=None):
+    """矩阵的颜色范围：指定clim时使用clim，否则为忽略NaN的最小值和最大值"""
+    if clim is not None:
+        return clim
+    return np.nanmin(data), np.nanmax(data)
+
+def global_color_limits(maps, params, chunk=GLOBAL_CHUNK):
+    """扫描一组矩阵（可迭代，形状可以不同），返回预处理后（对数缩放前）的(最小值, 最大值)
+
+    形状相同的连续矩阵每chunk个合为一组一次处理。
+    """
+    params = (params or Preprocess())._replace(log=False)
+    low, high = np.inf, -np.inf
+    group = []
+
+    def flush():
+        nonlocal low, high
+        stack = preprocess_maps(np.stack(group), params)
+        if np.isfinite(stack).any():
+            low = min(low, np.nanmin(stack))
+            high = max(high, np.nanmax(stack))
+        group.clear()
+
+    for data in maps:
+        if group and (data.shape != group[0].shape or len(group) >= chunk):
+            flush()
+        group.append(data)
+    if group:
+        flush()
+    if low > high:
+        return 0.0, 1.0
+    return float(low), float(high)
+
+def fix_global_limits(params, maps):
+    """normalize为global时扫描maps计算统一的颜色范围，返回normalize为fixed的参数"""
+    if params is None or params.normalize != "global":
+        return params
+    vmin, vmax = global_color_limits(maps, params)
+    return params._replace(normalize="fixed", vmin=vmin, vmax=vmax)
+
+def add_preprocess_arguments(parser):
+    """向命令行解析器添加预处理参数"""
+    group = parser.add_argument_group("预处理")
+    group.add_argument('--threshold', type=float, default=0.0, help="噪声阈值，低于该值的计数置为0")
+    group.add_argument('--median', type=int, default=1, help="中值滤波窗口大小（奇数，1表示不滤波）")
+    group.add_argument('--sigma', type=float, default=0.0, help="高斯平滑的标准差（单元格数，0表示不平滑）")
+    group.add_argument('--log-scale', action='store_true', help="显示log10(1+值)")
+    group.add_argument('--normalize', choices=list(NORMALIZE_MODES), default="file",
+                       help="颜色范围: file每个文件自动, global所有文件统一, fixed使用--vmin/--vmax")
+    group.add_argument('--vmin', type=float, help="固定颜色范围下限（原始单位）")
+    group.add_argument('--vmax', type=float, help="固定颜色范围上限（原始单位）")
+    return group
+
+def preprocess_from_args(parser, args):
+    """由命令行参数生成预处理参数，不做任何处理时返回None"""
+    if args.median < 1 or args.median % 2 == 0:
+        parser.error("--median应为正奇数")
+    if args.normalize == "fixed" and (args.vmin is None or args.vmax is None):
+        parser.error("--normalize fixed需要同时指定--vmin和--vmax")
+    params = Preprocess(args.threshold, args.median, args.sigma, args.log_scale, args.normalize,
+                        args.vmin, args.vmax)
+    return None if is_identity(params) else params
+
+def main(argv=None):
+    """预处理单个文件并写为CSV（便于检查参数效果）"""
+    from prpd_cache import load_prpd_matrix
+    from prpd_stream import write_prpd_csv
+    parser = argparse.ArgumentParser(description="PRPD图谱预处理")
+    parser.add_argument('input', help="PRPD CSV文件")
+    parser.add_argument('-o', '--output', required=True, help="输出CSV文件")
+    add_preprocess_arguments(parser)
+    args = parser.parse_args(argv)
+    params = preprocess_from_args(parser, args)
+    data = preprocess_maps(load_prpd_matrix(args.input), params)
+    write_prpd_csv(args.output, data)
+    print(f"已保存到: {args.output}（范围{np.nanmin(data):.4g}~{np.nanmax(data):.4g}，"
+          f"颜色范围{color_limits(params) or '自动'}）")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,507 @@
+"""
+按时间顺序排列的PRPD序列的趋势分析。
+
+编号连续的文件（如corona1_PRPD.csv…corona10_PRPD.csv）按文件名中的数字排序后
+读取为一个(T, 行, 列)数组：文件在线程池中并发读取，数组较大时存放在临时文件的内存映射
+中，不占用内存。PRPDSequence对整个数组（或每次追加的一批帧）向量化地增量计算：
+- 每个相位/幅值单元的趋势斜率（放电次数/帧，最小二乘，可只取最近window帧）
+- 累积活动：各单元的累加图和每帧总放电次数的累加曲线
+- 相邻两帧之间的变化得分（差值绝对值之和/两帧放电次数之和，0~1）及异常突变的帧
+追加新帧时只计算新帧（和滑出窗口的帧）的贡献，不重新计算整个序列。
+
+PRPDTrendFigure显示趋势曲线、斜率图和相邻两帧的差值图，同样按新帧增量更新。
+
+用法:
+    python prpd_sequence.py 尖端放电 -o 趋势.csv --plot 趋势.png --window 5
+    python prpd_sequence.py --archive 尖端放电_pack -o 趋势.csv --slope-map 斜率.csv
+"""
+import argparse
+import csv
+import os
+import re
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from prpd_cache import DEFAULT_CACHE_DIR, from_compact, open_archive
+from prpd_compare import LOAD_WORKERS, load_map, map_title
+from prpd_core import expand_inputs, save_figure, tight_bbox
+from prpd_events import AMP_BINS, PHASE_BINS, EventBinning
+from prpd_stream import write_prpd_csv
+
+# 每批读取的帧数（读取一批后增量更新一次）
+LOAD_BATCH = 32
+
+# 帧数组超过此大小（字节）时存放在临时文件的内存映射中
+MMAP_THRESHOLD = 256 * 2**20
+
+# 趋势曲线的滑动平均窗口（帧数）
+ROLLING_WINDOW = 5
+
+# 变化得分的稳健z分数（相对中位数，以MAD为尺度）超过此值的帧视为突变
+CHANGE_THRESHOLD = 3.5
+
+def natural_key(file_path):
+    """按文件名中的数字大小排序的键（corona2排在corona10之前）"""
+    parts = re.split(r'(\d+)', os.path.basename(file_path))
+    return [int(part) if part.isdigit() else part.lower() for part in parts], file_path
+
+def sort_series(file_list):
+    """按文件名中的编号排序"""
+    return sorted(file_list, key=natural_key)
+
+def iter_sequence_batches(file_list, events=None, batch_size=LOAD_BATCH, workers=LOAD_WORKERS):
+    """按顺序分批并发读取文件，每批产生(文件列表, 帧数组(n, 行, 列), 失败列表)
+
+    读取失败或形状与第一帧不同的文件以(文件路径, 错误信息)放入失败列表。
+    线程池在产出当前批的同时读取下一批。
+    """
+    shape = None
+    with ThreadPoolExecutor(workers) as pool:
+        def submit(start):
+            return [pool.submit(load_map, file_path, events)
+                    for file_path in file_list[start:start + batch_size]]
+
+        pending = submit(0)
+        for start in range(0, len(file_list), batch_size):
+            results = [future.result() for future in pending]
+            pending = submit(start + batch_size)
+            names, frames, failed = [], [], []
+            for file_path, data, error in results:
+                if error is None and shape is not None and data.shape != shape:
+                    error = f"形状{data.shape}与序列的{shape}不同"
+                if error is not None:
+                    failed.append((file_path, error))
+                    continue
+                shape = data.shape
+                names.append(file_path)
+                frames.append(data)
+            stack = np.stack(frames) if frames else np.empty((0,) + (shape or (0, 0)))
+            yield names, stack, failed
+
+def iter_archive_batches(prefix, batch_size=LOAD_BATCH):
+    """按批读取prpd_cache.py pack生成的内存映射数组，每批产生(文件列表, 帧数组, [])"""
+    stack, index = open_archive(prefix)
+    source_dir = index.get('source_dir', '')
+    names = [os.path.join(source_dir, name) for name in index['files']]
+    for start in range(0, len(stack), batch_size):
+        batch = from_compact(np.asarray(stack[start:start + batch_size]))
+        yield names[start:start + batch_size], batch, []
+
+def rolling_mean(values, window):
+    """滑动平均（前window-1个点按已有的点平均），用累加和一次算出"""
+    values = np.asarray(values, dtype=np.float64)
+    cumsum = np.concatenate([[0.0], np.cumsum(values)])
+    index = np.arange(1, len(values) + 1)
+    start = np.maximum(index - window, 0)
+    return (cumsum[index] - cumsum[start]) / (index - start)
+
+def rolling_std(values, window):
+    """滑动标准差（与rolling_mean相同的窗口）"""
+    values = np.asarray(values, dtype=np.float64)
+    mean = rolling_mean(values, window)
+    mean_sq = rolling_mean(values * values, window)
+    return np.sqrt(np.maximum(mean_sq - mean * mean, 0))
+
+class PRPDSequence:
+    """按时间顺序增量追加的PRPD帧序列及其趋势统计
+
+    帧保存在按需扩容的(容量, 行, 列)数组中，超过mmap_threshold字节时改用临时文件的
+    内存映射。window为None时斜率按整个序列计算，否则只按最近window帧计算（滑出窗口的
+    帧从累加和中减去）。所有帧中均为NaN的单元（如行尾逗号产生的空列）在结果中保持NaN。
+    """
+    def __init__(self, window=None, mmap_threshold=MMAP_THRESHOLD, cache_dir=None):
+        self.window = window
+        self.mmap_threshold = mmap_threshold
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.files = []
+        self._frames = None  # (容量, 行, 列)，前len(self)帧有效
+        self._count = 0
+        self._reserved = 0
+        self._mmap_file = None
+        self.totals = []  # 每帧总放电次数
+        self.active = []  # 每帧有放电的单元数
+        self.scores = []  # 与前一帧的变化得分（第一帧为0）
+        self.valid = None
+        self.cumulative = None  # 各单元的累加值
+        self._sum_y = None  # 斜率窗口内各单元值之和
+        self._sum_ty = None  # 斜率窗口内各单元帧序号×值之和
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def shape(self):
+        """单帧的形状，尚未追加帧时为None"""
+        return None if self._frames is None else self._frames.shape[1:]
+
+    @property
+    def frames(self):
+        """所有帧(T, 行, 列)（内存映射时为其视图）"""
+        if self._frames is None:
+            return np.empty((0, 0, 0))
+        return self._frames[:self._count]
+
+    @property
+    def is_mapped(self):
+        """帧是否存放在内存映射中"""
+        return self._mmap_file is not None
+
+    def reserve(self, count):
+        """预先分配至少count帧的空间（帧数已知时避免扩容复制）"""
+        self._reserved = max(self._reserved, count)
+        if self._frames is not None and count > len(self._frames):
+            self._allocate(count, self._frames.shape[1:])
+
+    def _allocate(self, capacity, shape):
+        """分配新的帧数组并复制已有的帧"""
+        nbytes = capacity * int(np.prod(shape)) * 8
+        old, old_file = self._frames, self._mmap_file
+        if nbytes > self.mmap_threshold:
+            directory = os.path.join(self.cache_dir, 'sequences')
+            os.makedirs(directory, exist_ok=True)
+            self._mmap_file = tempfile.TemporaryFile(dir=directory)
+            self._frames = np.memmap(self._mmap_file, dtype=np.float64, mode='w+',
+                                     shape=(capacity,) + tuple(shape))
+        else:
+            self._mmap_file = None
+            self._frames = np.empty((capacity,) + tuple(shape))
+        if old is not None:
+            self._frames[:self._count] = old[:self._count]
+        if old_file is not None:
+            del old
+            old_file.close()
+
+    def extend(self, frames, files=None):
+        """追加一批帧(n, 行, 列)（或单帧(行, 列)），只计算新帧带来的变化"""
+        frames = np.asarray(frames, dtype=np.float64)
+        if frames.ndim == 2:
+            frames = frames[np.newaxis]
+        count = len(frames)
+        if count == 0:
+            return self
+        if self._frames is None:
+            self._allocate(max(count, LOAD_BATCH, self._reserved), frames.shape[1:])
+            self.valid = np.zeros(frames.shape[1:], dtype=bool)
+            self.cumulative = np.zeros(frames.shape[1:])
+            self._sum_y = np.zeros(frames.shape[1:])
+            self._sum_ty = np.zeros(frames.shape[1:])
+        elif frames.shape[1:] != self.shape:
+            raise ValueError(f"帧形状不一致: {frames.shape[1:]}，应为{self.shape}")
+        start, end = self._count, self._count + count
+        if end > len(self._frames):
+            self._allocate(max(end, 2 * len(self._frames)), self.shape)
+        self._frames[start:end] = frames
+        self._count = end
+        self.files.extend(files if files is not None else [''] * count)
+
+        valid = ~np.isnan(frames)
+        self.valid |= valid.any(axis=0)
+        values = np.where(valid, frames, 0.0)
+        t = np.arange(start, end, dtype=np.float64)
+        self.cumulative += values.sum(axis=0)
+        self._sum_y += values.sum(axis=0)
+        self._sum_ty += np.tensordot(t, values, axes=1)
+
+        # 滑出斜率窗口的帧
+        if self.window is not None:
+            leave_start, leave_end = max(start - self.window, 0), max(end - self.window, 0)
+            if leave_end > leave_start:
+                leaving = np.nan_to_num(self._frames[leave_start:leave_end])
+                t_leave = np.arange(leave_start, leave_end, dtype=np.float64)
+                self._sum_y -= leaving.sum(axis=0)
+                self._sum_ty -= np.tensordot(t_leave, leaving, axes=1)
+
+        # 逐帧的标量序列；变化得分需要新帧之前的一帧
+        totals = values.sum(axis=(1, 2))
+        self.totals.extend(totals.tolist())
+        self.active.extend((values > 0).sum(axis=(1, 2)).tolist())
+        if start > 0:
+            previous = np.nan_to_num(self._frames[start - 1:start])
+            values = np.concatenate([previous, values])
+            totals = np.concatenate([[self.totals[start - 1]], totals])
+        change = np.abs(np.diff(values, axis=0)).sum(axis=(1, 2))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scores = np.where(totals[1:] + totals[:-1] > 0, change / (totals[1:] + totals[:-1]), 0.0)
+        if start == 0:
+            scores = np.concatenate([[0.0], scores])
+        self.scores.extend(scores.tolist())
+        return self
+
+    def append(self, frame, file_path=''):
+        """追加一帧"""
+        return self.extend(frame[np.newaxis], [file_path])
+
+    def slope_window(self):
+        """斜率所用帧的序号范围[起, 止)"""
+        return (max(self._count - self.window, 0) if self.window is not None else 0), self._count
+
+    def slope_map(self):
+        """各单元的趋势斜率（放电次数/帧），帧数少于2时为0"""
+        if self._frames is None:
+            raise ValueError("序列中还没有帧")
+        first, last = self.slope_window()
+        n = last - first
+        slope = np.zeros(self.shape)
+        if n >= 2:
+            t = np.arange(first, last, dtype=np.float64)
+            sum_t, sum_tt = t.sum(), (t * t).sum()
+            slope = (n * self._sum_ty - sum_t * self._sum_y) / (n * sum_tt - sum_t * sum_t)
+        slope[~self.valid] = np.nan
+        return slope
+
+    def cumulative_map(self):
+        """各单元的累加值"""
+        data = self.cumulative.copy()
+        data[~self.valid] = np.nan
+        return data
+
+    def difference(self, index):
+        """第index帧与前一帧的差值图（第0帧为全0）"""
+        if not 0 <= index < self._count:
+            raise IndexError(f"帧序号超出范围: {index}")
+        if index == 0:
+            data = np.zeros(self.shape)
+        else:
+            data = self._frames[index] - self._frames[index - 1]
+        data[~self.valid] = np.nan
+        return data
+
+    def series(self, rolling=ROLLING_WINDOW):
+        """逐帧的标量序列: 总放电次数及其滑动平均/标准差、有放电的单元数、累积放电次数、变化得分"""
+        totals = np.array(self.totals)
+        return {
+            'total': totals,
+            'rolling_mean': rolling_mean(totals, rolling),
+            'rolling_std': rolling_std(totals, rolling),
+            'active': np.array(self.active, dtype=np.float64),
+            'cumulative': np.cumsum(totals),
+            'score': np.array(self.scores),
+        }
+
+    def change_points(self, threshold=CHANGE_THRESHOLD):
+        """变化得分异常高（稳健z分数超过threshold）的帧序号"""
+        scores = np.array(self.scores[1:])
+        if len(scores) < 3:
+            return np.array([], dtype=np.intp)
+        median = np.median(scores)
+        mad = np.median(np.abs(scores - median)) * 1.4826
+        z = (scores - median) / max(mad, 1e-12)
+        return np.flatnonzero(z > threshold) + 1
+
+    def close(self):
+        """释放帧数组（内存映射时删除临时文件）"""
+        frames, self._frames = self._frames, None
+        if self._mmap_file is not None:
+            del frames
+            self._mmap_file.close()
+            self._mmap_file = None
+
+def load_sequence(file_list, events=None, window=None, workers=LOAD_WORKERS,
+                  mmap_threshold=MMAP_THRESHOLD):
+    """读取整个序列，返回(PRPDSequence, 失败列表)（文件按给定顺序，见sort_series）"""
+    sequence = PRPDSequence(window, mmap_threshold)
+    failed = []
+    sequence.reserve(len(file_list))
+    for names, frames, batch_failed in iter_sequence_batches(file_list, events, workers=workers):
+        failed.extend(batch_failed)
+        sequence.extend(frames, names)
+    return sequence, failed
+
+def write_trend_csv(path, sequence, rolling=ROLLING_WINDOW, threshold=CHANGE_THRESHOLD):
+    """逐帧写出趋势表（CSV，带BOM便于Excel显示中文文件名）"""
+    series = sequence.series(rolling)
+    changes = set(sequence.change_points(threshold).tolist())
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['index', 'file', 'total', 'rolling_mean', 'rolling_std', 'active',
+                         'cumulative', 'score', 'change_point'])
+        for i, file_path in enumerate(sequence.files):
+            writer.writerow([i, file_path] + [f"{series[key][i]:.10g}" for key in
+                                              ('total', 'rolling_mean', 'rolling_std', 'active',
+                                               'cumulative', 'score')] + [int(i in changes)])
+
+class PRPDTrendFigure:
+    """序列趋势图
+
+    左侧三行为总放电次数（含滑动平均）、累积放电次数和变化得分（标出突变帧），右侧为
+    各单元的趋势斜率图和所选帧与前一帧的差值图（有正负，使用发散色图，颜色范围关于0对称）。
+    坐标轴和colorbar只创建一次，update只替换曲线数据和图像，适合逐批追加帧时刷新。
+    fig为None时创建Agg后端的Figure，也可传入界面画布的Figure。
+    """
+    DIFF_CMAP = 'RdBu_r'
+
+    def __init__(self, dpi=100, fig=None, rolling=ROLLING_WINDOW, threshold=CHANGE_THRESHOLD):
+        self.dpi = dpi
+        self.rolling = rolling
+        self.threshold = threshold
+        if fig is None:
+            fig = Figure(figsize=(12, 7), dpi=100)
+            FigureCanvasAgg(fig)
+        self.fig = fig
+        grid = fig.add_gridspec(6, 2, width_ratios=[1.3, 1], hspace=1.2, wspace=0.25)
+        self.total_ax = fig.add_subplot(grid[0:2, 0])
+        self.cumulative_ax = fig.add_subplot(grid[2:4, 0], sharex=self.total_ax)
+        self.score_ax = fig.add_subplot(grid[4:6, 0], sharex=self.total_ax)
+        self.slope_ax = fig.add_subplot(grid[0:3, 1])
+        self.diff_ax = fig.add_subplot(grid[3:6, 1])
+
+        self.total_line, = self.total_ax.plot([], [], '.-', color='tab:blue', label='总放电次数')
+        self.rolling_line, = self.total_ax.plot([], [], '-', color='tab:orange',
+                                                label=f'{rolling}帧滑动平均')
+        self.total_ax.legend(loc='upper left', fontsize=8)
+        self.total_ax.set_title('放电活动')
+        self.cumulative_line, = self.cumulative_ax.plot([], [], '-', color='tab:green')
+        self.cumulative_ax.set_title('累积放电次数')
+        self.score_line, = self.score_ax.plot([], [], '.-', color='tab:purple')
+        self.change_marks, = self.score_ax.plot([], [], 'v', color='tab:red', label='突变')
+        self.score_ax.set_title('相邻帧变化得分')
+        self.score_ax.set_xlabel('帧')
+        self.score_ax.legend(loc='upper left', fontsize=8)
+
+        self.slope_img = self.slope_ax.imshow(np.zeros((2, 2)), cmap=self.DIFF_CMAP, origin='lower',
+                                              extent=[0, 360, 0, 100], aspect='auto')
+        self.slope_ax.set_title('趋势斜率（次/帧）')
+        self.diff_img = self.diff_ax.imshow(np.zeros((2, 2)), cmap=self.DIFF_CMAP, origin='lower',
+                                            extent=[0, 360, 0, 100], aspect='auto')
+        self.diff_ax.set_title('差值图')
+        for ax in (self.slope_ax, self.diff_ax):
+            ax.set_xticks(np.arange(0, 361, 90))
+            ax.set_yticks(np.arange(0, 101, 25))
+            ax.set_ylabel('电压 (%)')
+        self.diff_ax.set_xlabel('相位 (°)')
+        fig.colorbar(self.slope_img, ax=self.slope_ax)
+        fig.colorbar(self.diff_img, ax=self.diff_ax)
+        fig.subplots_adjust(left=0.07, right=0.97, top=0.95, bottom=0.08)
+        self.bbox_inches = None
+        self.diff_index = None
+
+    @staticmethod
+    def _symmetric_clim(data):
+        """关于0对称的颜色范围"""
+        finite = data[np.isfinite(data)]
+        limit = float(np.abs(finite).max()) if len(finite) else 0.0
+        limit = limit or 1.0
+        return -limit, limit
+
+    def update(self, sequence, diff_index=None):
+        """按序列当前的帧更新全部曲线、斜率图和差值图（diff_index为None时显示最新一帧）"""
+        series = sequence.series(self.rolling)
+        x = np.arange(len(sequence))
+        self.total_line.set_data(x, series['total'])
+        self.rolling_line.set_data(x, series['rolling_mean'])
+        self.cumulative_line.set_data(x, series['cumulative'])
+        self.score_line.set_data(x, series['score'])
+        changes = sequence.change_points(self.threshold)
+        self.change_marks.set_data(changes, series['score'][changes])
+        for ax in (self.total_ax, self.cumulative_ax, self.score_ax):
+            ax.relim()
+            ax.autoscale_view()
+        first, last = sequence.slope_window()
+        slope = sequence.slope_map()
+        self.slope_img.set_data(slope)
+        self.slope_img.set_clim(*self._symmetric_clim(slope))
+        self.slope_ax.set_title(f'趋势斜率（次/帧，第{first}~{last - 1}帧）')
+        self.show_difference(sequence, len(sequence) - 1 if diff_index is None else diff_index)
+
+    def show_difference(self, sequence, index):
+        """显示第index帧与前一帧的差值图"""
+        self.diff_index = index
+        diff = sequence.difference(index)
+        self.diff_img.set_data(diff)
+        self.diff_img.set_clim(*self._symmetric_clim(diff))
+        name = map_title(sequence.files[index]) if sequence.files[index] else f'第{index}帧'
+        self.diff_ax.set_title(f'差值图: {name} − 前一帧' if index else f'差值图: {name}（第一帧）')
+
+    def save(self, save_path):
+        """保存图像（Agg后端，裁剪框在第一次保存时计算）"""
+        if self.bbox_inches is None:
+            self.bbox_inches = tight_bbox(self.fig, self.dpi)
+        save_figure(self.fig, save_path, self.dpi, self.bbox_inches)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PRPD序列趋势分析（无界面）")
+    parser.add_argument('inputs', nargs='*', help="PRPD CSV文件、目录或通配符（按文件名中的编号排序）")
+    parser.add_argument('--archive', help="prpd_cache.py pack生成的打包数组（前缀，代替inputs）")
+    parser.add_argument('-o', '--output', help="逐帧趋势表（CSV）")
+    parser.add_argument('--plot', help="趋势图（PNG/PDF/SVG）")
+    parser.add_argument('--slope-map', help="趋势斜率图（CSV或.npy）")
+    parser.add_argument('--cumulative-map', help="累积图（CSV或.npy）")
+    parser.add_argument('--window', type=int, help="斜率只按最近的帧数计算（默认整个序列）")
+    parser.add_argument('--rolling', type=int, default=ROLLING_WINDOW, help="滑动平均窗口（帧数）")
+    parser.add_argument('--threshold', type=float, default=CHANGE_THRESHOLD,
+                        help="突变帧的稳健z分数阈值")
+    parser.add_argument('--dpi', type=int, default=150, help="趋势图DPI")
+    parser.add_argument('--pattern', default='*.csv', help="目录中的文件匹配模式")
+    parser.add_argument('--workers', type=int, default=LOAD_WORKERS, help="并发读取的线程数")
+    parser.add_argument('--mmap-mb', type=float, default=MMAP_THRESHOLD / 2**20,
+                        help="帧数组超过此大小（MB）时使用内存映射")
+    parser.add_argument('--events', action='store_true',
+                        help="输入为原始脉冲事件（列: 相位或时间戳, 放电量），按分箱生成PRPD图")
+    parser.add_argument('--phase-bins', type=int, default=PHASE_BINS, help="脉冲事件的相位分箱数")
+    parser.add_argument('--amp-bins', type=int, default=AMP_BINS, help="脉冲事件的幅值分箱数")
+    parser.add_argument('--frequency', type=float,
+                        help="脉冲事件第一列为时间戳（秒）时的工频（Hz）")
+    args = parser.parse_args(argv)
+    if bool(args.inputs) == bool(args.archive):
+        parser.error("需要指定输入文件或--archive之一")
+    if args.window is not None and args.window < 2:
+        parser.error("--window至少为2")
+
+    sequence = PRPDSequence(args.window, args.mmap_mb * 2**20)
+    failed = []
+    if args.archive:
+        batches = iter_archive_batches(args.archive)
+    else:
+        files = sort_series(expand_inputs(args.inputs, args.pattern))
+        if not files:
+            parser.error("没有找到要处理的文件")
+        events = None
+        if args.events:
+            events = EventBinning(args.phase_bins, args.amp_bins, frequency=args.frequency)
+        batches = iter_sequence_batches(files, events, workers=args.workers)
+    for names, frames, batch_failed in batches:
+        failed.extend(batch_failed)
+        sequence.extend(frames, names)
+    for file_path, error in failed:
+        print(f"跳过: {file_path} - {error}", file=sys.stderr)
+    if len(sequence) == 0:
+        print("没有可分析的帧", file=sys.stderr)
+        return 1
+
+    series = sequence.series(args.rolling)
+    changes = sequence.change_points(args.threshold)
+    first, last = sequence.slope_window()
+    print(f"序列: {len(sequence)}帧，形状{sequence.shape}"
+          f"{'（内存映射）' if sequence.is_mapped else ''}，总放电次数{series['cumulative'][-1]:g}，"
+          f"斜率按第{first}~{last - 1}帧", file=sys.stderr)
+    if len(changes):
+        print("突变帧: " + "，".join(f"{i}（{os.path.basename(sequence.files[i])}，"
+                                    f"得分{series['score'][i]:.3f}）" for i in changes),
+              file=sys.stderr)
+    if args.output:
+        write_trend_csv(args.output, sequence, args.rolling, args.threshold)
+        print(f"趋势表已保存到: {args.output}", file=sys.stderr)
+    for path, get_map in ((args.slope_map, sequence.slope_map),
+                          (args.cumulative_map, sequence.cumulative_map)):
+        if not path:
+            continue
+        if path.lower().endswith('.npy'):
+            np.save(path, get_map())
+        else:
+            write_prpd_csv(path, get_map())
+        print(f"已保存到: {path}", file=sys.stderr)
+    if args.plot:
+        figure = PRPDTrendFigure(args.dpi, rolling=args.rolling, threshold=args.threshold)
+        figure.update(sequence)
+        figure.save(args.plot)
+        print(f"趋势图已保存到: {args.plot}", file=sys.stderr)
+    sequence.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,373 @@
+"""
+本地PRPD渲染服务（HTTP）。
+
+各个看板需要按需获取PRPD图像时，不必各自导入Matplotlib并逐次调用plot_prpd创建Figure：
+本服务常驻运行，渲染在进程池中进行，工作进程启动时预先创建常用的图形模板（见prpd_core的
+get_render_template和get_raster_renderer），之后每个请求只更新数据并编码PNG。
+相同的并发请求只渲染一次（合并到同一个渲染任务），结果保存在按内存大小限制的LRU缓存中。
+
+接口:
+    GET  /render?file=<路径>&view=2D&scheme=默认方案&dpi=100&render=template
+    POST /render  JSON: {"file": 路径} 或 {"matrix": [[...]]}，另含view、scheme、dpi等参数
+    POST /render?view=2D&dpi=100  请求体为.npy格式的矩阵（Content-Type: application/x-npy）
+    GET  /stats   运行统计（请求数、缓存命中、合并数、吞吐量、延迟分位数）
+    GET  /health  工作进程已就绪时返回200
+返回PNG图像，响应头X-PRPD-Cache为hit（缓存命中）、coalesced（合并到进行中的请求）或miss。
+
+用法:
+    python prpd_server.py [--port 8765] [--workers 2] [--cache-mb 256] [--allow-dir 数据目录]
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import prpd_core
+from prpd_archive import split_member_path, stat_source
+from prpd_cache import LRUCache
+from prpd_core import (COLOR_SCHEMES, RENDER_MODES, SURFACE_COUNT, RenderJob, create_process_pool,
+                       encode_job_image, load_job_data, parse_color_scheme, render_job_image)
+
+DEFAULT_PORT = 8765
+
+# 默认保存DPI（看板中显示，比批处理低）
+DEFAULT_DPI = 100
+
+# 结果缓存上限（MB）
+CACHE_MB = 256
+
+# 请求体和矩阵大小上限
+MAX_BODY_BYTES = 64 * 2**20
+MAX_MATRIX_CELLS = 4096 * 4096
+
+# 延迟统计保留的最近请求数
+LATENCY_WINDOW = 10000
+
+def render_png(job, data=None):
+    """在工作进程中渲染PNG，返回(PNG字节, 渲染耗时)，data为None时读取job.file_path"""
+    start = time.perf_counter()
+    if data is None:
+        data = load_job_data(job)
+    encoded = encode_job_image(job, render_job_image(job, data))
+    return encoded, time.perf_counter() - start
+
+def warm_worker(warm_params):
+    """工作进程初始化：按常用参数各渲染一次，预先创建图形模板"""
+    # 渲染器缓存至少能容纳所有预热的参数组合
+    prpd_core.RENDERER_CACHE_SIZE = max(prpd_core.RENDERER_CACHE_SIZE, len(warm_params) + 1)
+    data = np.zeros((64, 65))
+    for color_scheme, dpi, view_mode, render_mode in warm_params:
+        render_png(RenderJob('', 'warm.png', color_scheme, dpi, view_mode, render_mode), data)
+
+def parse_render_params(params):
+    """解析渲染参数（查询参数或JSON中的字段），返回RenderJob（不含文件路径），参数无效时抛出ValueError"""
+    view_mode = params.get('view', "2D")
+    if view_mode not in ("2D", "3D"):
+        raise ValueError(f"未知视图模式: {view_mode}（可选: 2D, 3D）")
+    render_mode = params.get('render', "template")
+    if render_mode not in RENDER_MODES:
+        raise ValueError(f"未知渲染方式: {render_mode}（可选: {', '.join(RENDER_MODES)}）")
+    scheme = params.get('scheme', "默认方案")
+    try:
+        color_scheme = list(scheme) if isinstance(scheme, list) else parse_color_scheme(scheme)
+    except argparse.ArgumentTypeError as e:
+        raise ValueError(str(e))
+    try:
+        dpi = int(params.get('dpi', DEFAULT_DPI))
+        surface_count = int(params.get('surface_count', SURFACE_COUNT))
+    except (TypeError, ValueError):
+        raise ValueError("dpi和surface_count应为整数")
+    if not 10 <= dpi <= 1200:
+        raise ValueError(f"DPI超出范围（10-1200）: {dpi}")
+    if not 2 <= surface_count <= 500:
+        raise ValueError(f"3D网格数超出范围（2-500）: {surface_count}")
+    return RenderJob('', 'render.png', tuple(color_scheme), dpi, view_mode, render_mode,
+                     surface_count)
+
+def parse_matrix(value):
+    """将JSON中的嵌套列表（null表示NaN）转换为矩阵"""
+    data = np.array([[np.nan if v is None else v for v in row] for row in value], dtype=np.float64)
+    check_matrix(data)
+    return data
+
+def check_matrix(data):
+    if data.ndim != 2 or min(data.shape) == 0:
+        raise ValueError(f"矩阵应为非空二维数组，实际形状: {data.shape}")
+    if data.size > MAX_MATRIX_CELLS:
+        raise ValueError(f"矩阵过大: {data.shape}")
+
+class RenderService:
+    """常驻进程池渲染，合并相同的并发请求，缓存结果（可在多个线程中调用）"""
+    def __init__(self, workers=1, cache_bytes=CACHE_MB * 2**20, allowed_dirs=None, warm_params=None):
+        if warm_params is None:
+            warm_params = [(tuple(COLOR_SCHEMES["默认方案"]), DEFAULT_DPI, "2D", "template")]
+        self.workers = max(1, workers)
+        self.pool = create_process_pool(self.workers, warm_worker, (warm_params,))
+        self.allowed_dirs = [os.path.realpath(d) for d in allowed_dirs or []]
+        self.cache = LRUCache(cache_bytes)
+        self._lock = threading.Lock()
+        self._inflight = {}  # 缓存键 -> 进行中的渲染任务（Future）
+        self.counts = dict.fromkeys(("hit", "coalesced", "miss", "error"), 0)
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.render_seconds = 0.0
+        self.start = time.perf_counter()
+        self.ready = False
+
+    def warm_up(self):
+        """启动全部工作进程（各自执行warm_worker），返回耗时"""
+        start = time.perf_counter()
+        for future in [self.pool.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+        self.ready = True
+        return time.perf_counter() - start
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+    def check_path(self, file_path):
+        """检查文件是否在允许的目录中（未指定允许的目录时不限制）"""
+        member = split_member_path(file_path)
+        real_path = os.path.realpath(member[0] if member else file_path)
+        if self.allowed_dirs and not any(os.path.commonpath([real_path, d]) == d
+                                         for d in self.allowed_dirs):
+            raise PermissionError(f"不允许访问该文件: {file_path}")
+
+    def cache_key(self, job, data=None):
+        """缓存键：文件按路径、大小和修改时间，矩阵按内容哈希，另加渲染参数"""
+        params = (job.color_scheme, job.dpi, job.view_mode, job.render_mode, job.surface_count)
+        if data is None:
+            stat = stat_source(job.file_path)
+            return ('file', os.path.abspath(job.file_path), stat.st_size, stat.st_mtime_ns) + params
+        digest = hashlib.sha1(data.tobytes()).hexdigest()
+        return ('matrix', str(data.dtype), data.shape, digest) + params
+
+    def render(self, job, data=None):
+        """返回(PNG字节, 缓存状态)，缓存状态为hit、coalesced或miss，渲染失败时抛出异常"""
+        start = time.perf_counter()
+        if data is None:
+            self.check_path(job.file_path)
+        key = self.cache_key(job, data)
+        with self._lock:
+            encoded = self.cache.get(key)
+            if encoded is not None:
+                status = "hit"
+            else:
+                future = self._inflight.get(key)
+                status = "coalesced" if future is not None else "miss"
+                if future is None:
+                    future = self.pool.submit(render_png, job, data)
+                    self._inflight[key] = future
+        if status == "miss":
+            # 在锁外注册：任务已完成时回调会在本线程中立即执行，而_finished也要获取锁
+            future.add_done_callback(lambda f: self._finished(key, f))
+        try:
+            if encoded is None:
+                encoded = future.result()[0]
+        except Exception:
+            with self._lock:
+                self.counts["error"] += 1
+            raise
+        with self._lock:
+            self.counts[status] += 1
+            self.latencies.append(time.perf_counter() - start)
+        return encoded, status
+
+    def _finished(self, key, future):
+        """渲染完成：移出进行中的任务并写入缓存（失败的结果不缓存）"""
+        with self._lock:
+            self._inflight.pop(key, None)
+            if future.cancelled() or future.exception() is not None:
+                return
+            encoded, seconds = future.result()
+            self.render_seconds += seconds
+            self.cache.put(key, encoded, len(encoded))
+
+    def snapshot(self):
+        """运行统计"""
+        with self._lock:
+            latencies = np.array(self.latencies)
+            total = sum(self.counts.values())
+            uptime = time.perf_counter() - self.start
+            result = {
+                'ready': self.ready, 'workers': self.workers, 'uptime': uptime,
+                'requests': total, 'rate': total / uptime if uptime > 0 else 0.0,
+                'inflight': len(self._inflight), 'render_seconds': self.render_seconds,
+                'cache': self.cache.summary(), 'cache_bytes': self.cache.size_bytes,
+            }
+            result.update(self.counts)
+        for name, q in (('p50', 50), ('p95', 95), ('p99', 99)):
+            result[name] = float(np.percentile(latencies, q)) if len(latencies) else None
+        return result
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    """HTTP请求处理（服务对象为self.server.service）"""
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        if self.server.access_log:
+            super().log_message(format, *args)
+
+    def send_body(self, code, body, content_type, headers=()):
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, code, value):
+        self.send_body(code, json.dumps(value, ensure_ascii=False).encode('utf-8'),
+                       'application/json; charset=utf-8')
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        service = self.server.service
+        if url.path == '/health':
+            self.send_json(200 if service.ready else 503, {'ready': service.ready})
+        elif url.path == '/stats':
+            self.send_json(200, service.snapshot())
+        elif url.path == '/render':
+            if 'file' not in params:
+                self.send_json(400, {'error': "缺少file参数"})
+                return
+            self.handle_render(params, params['file'])
+        else:
+            self.send_json(404, {'error': f"未知路径: {url.path}"})
+
+    def do_POST(self):
+        url = urllib.parse.urlsplit(self.path)
+        if url.path != '/render':
+            self.send_json(404, {'error': f"未知路径: {url.path}"})
+            return
+        params = dict(urllib.parse.parse_qsl(url.query))
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            self.send_json(413, {'error': f"请求体过大: {length}字节"})
+            return
+        body = self.rfile.read(length)
+        content_type = self.headers.get('Content-Type', '').split(';')[0].strip()
+        try:
+            if content_type == 'application/json':
+                request = json.loads(body)
+                if not isinstance(request, dict):
+                    self.send_json(400, {'error': "请求应为JSON对象"})
+                    return
+                params.update({k: v for k, v in request.items() if k not in ('file', 'matrix')})
+                if 'matrix' in request:
+                    self.handle_render(params, data=parse_matrix(request['matrix']))
+                elif 'file' in request:
+                    if not isinstance(request['file'], str):
+                        self.send_json(400, {'error': "file应为字符串"})
+                        return
+                    self.handle_render(params, request['file'])
+                else:
+                    self.send_json(400, {'error': "请求中应包含file或matrix"})
+                return
+            data = np.load(io.BytesIO(body), allow_pickle=False)
+            check_matrix(data)
+        except (TypeError, ValueError) as e:
+            # TypeError: matrix不是嵌套列表等
+            self.send_json(400, {'error': f"无法解析请求: {e}"})
+            return
+        self.handle_render(params, data=data)
+
+    def handle_render(self, params, file_path=None, data=None):
+        """渲染并返回PNG"""
+        start = time.perf_counter()
+        try:
+            job = parse_render_params(params)
+            if file_path is not None:
+                job = job._replace(file_path=file_path)
+            encoded, status = self.server.service.render(job, data)
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+        except PermissionError as e:
+            self.send_json(403, {'error': str(e)})
+        except FileNotFoundError as e:
+            self.send_json(404, {'error': f"文件不存在: {e.filename or file_path}"})
+        except Exception as e:
+            self.send_json(500, {'error': f"渲染失败: {e}"})
+        else:
+            self.send_body(200, encoded, 'image/png', [
+                ('X-PRPD-Cache', status),
+                ('X-PRPD-Time', f"{(time.perf_counter() - start) * 1000:.1f}")])
+
+class RenderServer(ThreadingHTTPServer):
+    """每个连接一个线程的HTTP服务"""
+    daemon_threads = True
+
+    def __init__(self, address, service, access_log=False):
+        super().__init__(address, RenderRequestHandler)
+        self.service = service
+        self.access_log = access_log
+
+def request_render(url, file_path=None, data=None, timeout=60, **params):
+    """向渲染服务请求图像，返回(PNG字节, 缓存状态)，失败时抛出urllib.error.HTTPError
+
+    file_path和data（矩阵）二选一，params为view、scheme、dpi、render、surface_count。
+    """
+    if data is None:
+        query = urllib.parse.urlencode(dict(params, file=file_path))
+        request = urllib.request.Request(f"{url.rstrip('/')}/render?{query}")
+    else:
+        buf = io.BytesIO()
+        np.save(buf, np.asarray(data))
+        request = urllib.request.Request(
+            f"{url.rstrip('/')}/render?{urllib.parse.urlencode(params)}", data=buf.getvalue(),
+            headers={'Content-Type': 'application/x-npy'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.read(), response.headers.get('X-PRPD-Cache')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地PRPD渲染服务（HTTP）")
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="端口（0表示自动选择）")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="渲染进程数")
+    parser.add_argument('--cache-mb', type=float, default=CACHE_MB, help="结果缓存上限（MB，0表示不缓存）")
+    parser.add_argument('--allow-dir', action='append', default=[],
+                        help="只允许读取这些目录中的文件（可多次指定，默认不限制）")
+    parser.add_argument('--warm', action='append', default=[], metavar="视图,DPI,渲染方式",
+                        help=f"启动时预先创建模板的参数（默认2D,{DEFAULT_DPI},template），可多次指定")
+    parser.add_argument('--access-log', action='store_true', help="打印每个请求")
+    args = parser.parse_args(argv)
+
+    warm_params = None
+    if args.warm:
+        warm_params = []
+        for value in args.warm:
+            try:
+                view_mode, dpi, render_mode = value.split(',')
+                job = parse_render_params({'view': view_mode, 'dpi': dpi, 'render': render_mode})
+            except ValueError as e:
+                parser.error(f"无效的--warm参数: {value}（{e}）")
+            warm_params.append((job.color_scheme, job.dpi, job.view_mode, job.render_mode))
+
+    service = RenderService(args.workers, int(args.cache_mb * 2**20), args.allow_dir, warm_params)
+    server = RenderServer((args.host, args.port), service, args.access_log)
+    host, port = server.server_address[:2]
+    print(f"PRPD渲染服务: http://{host}:{port}", flush=True)
+    print(f"正在启动{service.workers}个渲染进程...", file=sys.stderr, flush=True)
+    print(f"渲染进程已就绪（{service.warm_up():.2f}s）", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
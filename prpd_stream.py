@@ -0,0 +1,167 @@
+"""
+长时PRPD记录的流式读取与累积。
+
+长时记录由连续的多帧PRPD矩阵组成，支持两种格式：
+- 多帧CSV：帧之间以空行分隔，或按固定行数（frame_rows）切分；
+- 二进制.npy：形状为(帧数, 行, 列)的数组（如prpd_cache.py pack的输出），按内存映射读取。
+
+iter_frames逐帧产生NumPy矩阵，内存占用只与单帧大小有关；PRPDAccumulator增量维护
+每个相位/幅值单元的累加值、最大值和放电次数，随时可取出累积PRPD图。
+
+用法:
+    python prpd_stream.py 记录.csv -o 累积.csv --stat sum
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+from prpd_cache import from_compact, rows_to_matrix
+
+# 累积统计方式
+ACCUMULATE_STATS = {
+    "sum": "累加",
+    "max": "最大值",
+    "count": "放电次数",
+    "mean": "平均值",
+}
+
+def iter_csv_frames(file_path, frame_rows=None):
+    """逐帧读取多帧CSV，每次只保留当前帧的文本行
+
+    frame_rows为None时以空行分隔帧，否则每frame_rows个非空行为一帧。
+    """
+    rows = []
+    with open(file_path, 'r', encoding='utf-8-sig') as f:
+        for line in f:
+            if not line.strip():
+                if frame_rows is None and rows:
+                    yield rows_to_matrix(rows)
+                    rows = []
+                continue
+            rows.append(line.rstrip('\r\n').split(','))
+            if frame_rows is not None and len(rows) == frame_rows:
+                yield rows_to_matrix(rows)
+                rows = []
+    if rows:
+        yield rows_to_matrix(rows)
+
+def iter_npy_frames(file_path):
+    """以内存映射方式逐帧读取.npy数组（二维数组视为单帧）"""
+    stack = np.load(file_path, mmap_mode='r')
+    if stack.ndim == 2:
+        stack = stack[np.newaxis]
+    elif stack.ndim != 3:
+        raise ValueError(f"不支持的数组形状: {stack.shape}")
+    for frame in stack:
+        yield from_compact(np.asarray(frame))
+
+def iter_frames(file_path, frame_rows=None):
+    """根据扩展名选择读取方式，逐帧产生float64矩阵"""
+    if os.path.splitext(file_path)[1].lower() == '.npy':
+        return iter_npy_frames(file_path)
+    return iter_csv_frames(file_path, frame_rows)
+
+class PRPDAccumulator:
+    """增量累积PRPD帧
+
+    sum为各单元的累加值，max为最大值，count为该单元出现放电（值大于0）的帧数。
+    所有帧中均为NaN的单元（如行尾逗号产生的空列）在结果中保持NaN。
+    """
+    def __init__(self):
+        self.frame_count = 0
+        self.sum = None
+        self.max = None
+        self.count = None
+        self.valid = None
+
+    @property
+    def shape(self):
+        return None if self.sum is None else self.sum.shape
+
+    def add(self, frame):
+        """累积一帧"""
+        frame = np.asarray(frame, dtype=np.float64)
+        if self.sum is None:
+            self.sum = np.zeros(frame.shape)
+            self.max = np.full(frame.shape, -np.inf)
+            self.count = np.zeros(frame.shape, dtype=np.int64)
+            self.valid = np.zeros(frame.shape, dtype=bool)
+        elif frame.shape != self.sum.shape:
+            raise ValueError(f"帧形状不一致: {frame.shape}，应为{self.sum.shape}")
+        valid = ~np.isnan(frame)
+        np.add(self.sum, frame, out=self.sum, where=valid)
+        np.maximum(self.max, frame, out=self.max, where=valid)
+        self.count += frame > 0
+        self.valid |= valid
+        self.frame_count += 1
+
+    def update(self, frames):
+        """累积多帧，返回自身"""
+        for frame in frames:
+            self.add(frame)
+        return self
+
+    def result(self, stat="sum"):
+        """返回累积PRPD图（float64矩阵）"""
+        if self.sum is None:
+            raise ValueError("尚未累积任何帧")
+        if stat == "sum":
+            data = self.sum.copy()
+        elif stat == "max":
+            data = self.max.copy()
+        elif stat == "count":
+            data = self.count.astype(np.float64)
+        elif stat == "mean":
+            data = self.sum / self.frame_count
+        else:
+            raise ValueError(f"未知的累积方式: {stat}")
+        data[~self.valid] = np.nan
+        return data
+
+    def copy(self):
+        """复制当前累积状态（用于跨线程传递快照）"""
+        other = PRPDAccumulator()
+        other.frame_count = self.frame_count
+        if self.sum is not None:
+            other.sum = self.sum.copy()
+            other.max = self.max.copy()
+            other.count = self.count.copy()
+            other.valid = self.valid.copy()
+        return other
+
+def accumulate_file(file_path, frame_rows=None):
+    """流式累积整个记录文件，返回PRPDAccumulator"""
+    return PRPDAccumulator().update(iter_frames(file_path, frame_rows))
+
+def write_prpd_csv(file_path, data):
+    """将矩阵写为PRPD CSV，NaN写为空字段（与原始文件的行尾逗号一致）"""
+    with open(file_path, 'w', encoding='utf-8') as f:
+        for row in data:
+            f.write(','.join('' if np.isnan(v) else f'{v:.10g}' for v in row) + '\n')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="长时PRPD记录的流式累积")
+    parser.add_argument('input', help="多帧CSV或.npy记录文件")
+    parser.add_argument('-o', '--output', help="累积结果输出路径（.csv或.npy，默认只打印统计）")
+    parser.add_argument('--stat', choices=list(ACCUMULATE_STATS), default="sum",
+                        help="累积方式: sum累加, max最大值, count放电次数, mean平均值")
+    parser.add_argument('--frame-rows', type=int, help="每帧行数（默认以空行分隔帧）")
+    args = parser.parse_args(argv)
+
+    accumulator = accumulate_file(args.input, args.frame_rows)
+    data = accumulator.result(args.stat)
+    print(f"已累积{accumulator.frame_count}帧，形状{data.shape}，"
+          f"{ACCUMULATE_STATS[args.stat]}范围{np.nanmin(data):g}~{np.nanmax(data):g}",
+          file=sys.stderr)
+    if args.output:
+        if args.output.lower().endswith('.npy'):
+            np.save(args.output, data)
+        else:
+            write_prpd_csv(args.output, data)
+        print(f"累积结果已保存到: {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
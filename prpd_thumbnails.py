@@ -0,0 +1,80 @@
+"""
+PRPD缩略图。
+
+缩略图由矩阵经颜色查找表直接生成像素（不经过Matplotlib绘制，与2D图的颜色映射一致），
+以PNG保存在磁盘缓存目录中，按文件路径、大小、修改时间、颜色方案和尺寸区分，
+文件未变化时不再重新生成。
+"""
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+from matplotlib.colors import LinearSegmentedColormap
+
+from prpd_archive import stat_source
+from prpd_cache import DEFAULT_CACHE_DIR, load_prpd_matrix
+from prpd_core import write_png
+from prpd_events import events_to_prpd
+
+# 缩略图尺寸（宽, 高），与2D图的宽高比接近
+THUMBNAIL_SIZE = (96, 64)
+
+DEFAULT_THUMBNAIL_DIR = os.path.join(DEFAULT_CACHE_DIR, 'thumbs')
+
+# 按颜色方案缓存的RGBA颜色查找表
+_luts = {}
+
+def _get_lut(color_scheme):
+    key = tuple(color_scheme)
+    lut = _luts.get(key)
+    if lut is None:
+        cmap = LinearSegmentedColormap.from_list('custom', color_scheme)
+        lut = _luts[key] = cmap(np.arange(cmap.N), bytes=True)
+    return lut
+
+def render_thumbnail(data, color_scheme, size=THUMBNAIL_SIZE):
+    """将PRPD矩阵缩放并映射为RGBA缩略图（uint8，origin='lower'，NaN为白色）"""
+    width, height = size
+    lut = _get_lut(color_scheme)
+    rows = data.shape[0] - 1 - ((np.arange(height) + 0.5) * data.shape[0] / height).astype(np.intp)
+    cols = ((np.arange(width) + 0.5) * data.shape[1] / width).astype(np.intp)
+    sample = data[rows[:, None], cols[None, :]]
+
+    finite = np.isfinite(data)
+    vmin, vmax = (data[finite].min(), data[finite].max()) if finite.any() else (0.0, 1.0)
+    scale = len(lut) / (vmax - vmin) if vmax > vmin else 0.0
+    index = (sample - vmin) * scale
+    nan_mask = np.isnan(index)
+    index[nan_mask] = 0
+    image = lut[np.clip(index, 0, len(lut) - 1).astype(np.intp)]
+    image[nan_mask] = 255
+    return image
+
+def thumbnail_path(file_path, color_scheme, size=THUMBNAIL_SIZE, events=None, cache_dir=None):
+    """返回缩略图在磁盘缓存中的路径"""
+    stat = stat_source(file_path)
+    key = json.dumps([os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns,
+                      list(color_scheme), list(size), list(events) if events else None])
+    name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir or DEFAULT_THUMBNAIL_DIR, name[:2], f"{name}.png")
+
+def make_thumbnail(file_path, color_scheme, size=THUMBNAIL_SIZE, events=None, cache_dir=None):
+    """返回缩略图路径，磁盘缓存中没有时生成
+
+    events为prpd_events.EventBinning时输入按原始脉冲事件分箱。
+    """
+    path = thumbnail_path(file_path, color_scheme, size, events, cache_dir)
+    if os.path.exists(path):
+        return path
+    if events is None:
+        data = load_prpd_matrix(file_path)
+    else:
+        data = events_to_prpd(file_path, events)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # 先写临时文件再替换，避免读到半写入的缩略图
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    write_png(tmp_path, render_thumbnail(data, color_scheme, size), 72, level=6)
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,336 @@
+"""
+监视目录，自动渲染新增或修改的PRPD文件。
+
+采集装置全天向共享目录写入新的*_PRPD.csv文件。FolderWatcher定时扫描目录（os.scandir，
+只比较文件大小和修改时间，不读取内容），文件大小和修改时间在settle秒内保持不变才视为写入
+完成（避免读到写了一半的文件）。写入完成的文件放入有界队列，渲染线程逐批取出，使用与批处理
+相同的渲染任务和流水线（prpd_core.run_jobs）渲染到输出目录，并记录到任务清单，重新启动后
+输入和参数均未变化的文件不再渲染。队列满时扫描线程等待（文件仍在磁盘上，稍后再取），
+一次到达数千个文件时内存占用也有上限。
+
+每个文件从被发现到图像写出的端到端延迟记录在运行统计和批处理日志中。
+
+用法:
+    python prpd_watch.py 采集目录 -o 输出目录 [--interval 1] [--settle 2] [--render raster]
+"""
+import argparse
+import fnmatch
+import os
+import queue
+import sys
+import threading
+import time
+
+from prpd_core import (COLOR_SCHEMES, DEFAULT_NAME_TEMPLATE, RENDER_MODES, SURFACE_COUNT,
+                       PipelineStats, create_process_pool, make_jobs, parse_color_scheme, run_jobs)
+from prpd_events import AMP_BINS, PHASE_BINS, EventBinning
+from prpd_manifest import JobManifest
+from prpd_metrics import BATCH_LOG_NAME, BatchMetrics, format_snapshot
+from prpd_preprocess import add_preprocess_arguments, preprocess_from_args
+
+# 扫描间隔（秒）
+WATCH_INTERVAL = 1.0
+
+# 文件大小和修改时间保持不变多久后视为写入完成（秒）
+SETTLE_TIME = 2.0
+
+# 待渲染队列的最大文件数
+QUEUE_SIZE = 256
+
+# 渲染线程每批最多取出的文件数
+BATCH_SIZE = 32
+
+class FolderWatcher:
+    """扫描目录，找出新增或修改且已写入完成的文件"""
+    def __init__(self, directories, pattern='*.csv', settle=SETTLE_TIME, recursive=False):
+        self.directories = [os.path.abspath(d) for d in directories]
+        self.pattern = pattern
+        self.settle = settle
+        self.recursive = recursive
+        self._handled = {}  # 文件 -> 已交出时的(大小, 修改时间)
+        self._pending = {}  # 文件 -> (大小, 修改时间, 发现时间, 最后变化时间)
+
+    def scan(self):
+        """返回{文件: (大小, 修改时间)}"""
+        found = {}
+        stack = list(self.directories)
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir():
+                            if self.recursive:
+                                stack.append(entry.path)
+                        elif fnmatch.fnmatch(entry.name, self.pattern):
+                            stat = entry.stat()
+                            found[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                    except OSError:
+                        # 扫描期间被删除
+                        continue
+        return found
+
+    @property
+    def pending_count(self):
+        """已发现但尚未写入完成的文件数"""
+        return len(self._pending)
+
+    def poll(self, now=None):
+        """扫描一次，返回写入完成的[(文件, 发现时间)]，发现时间为Unix时间"""
+        now = time.time() if now is None else now
+        found = self.scan()
+        ready = []
+        for file_path, signature in found.items():
+            if self._handled.get(file_path) == signature:
+                continue
+            pending = self._pending.get(file_path)
+            if pending is None or pending[:2] != signature:
+                # 新文件或仍在写入，重新开始计时（保留最初的发现时间）
+                first_seen = now if pending is None else pending[2]
+                self._pending[file_path] = signature + (first_seen, now)
+            elif now - pending[3] >= self.settle:
+                ready.append((file_path, pending[2]))
+        # 已删除的文件
+        for file_path in [f for f in self._pending if f not in found]:
+            del self._pending[file_path]
+        for file_path in [f for f in self._handled if f not in found]:
+            del self._handled[file_path]
+        return ready
+
+    def mark_handled(self, file_path):
+        """文件已放入队列，之后只有再次修改时才交出"""
+        size, mtime_ns = self._pending.pop(file_path)[:2]
+        self._handled[file_path] = (size, mtime_ns)
+
+class WatchService:
+    """监视目录并渲染写入完成的文件
+
+    run()在当前线程中扫描目录，另一个线程渲染，stop()后两者都结束。on_result在渲染线程中
+    以(文件路径, 保存路径, 错误信息)调用（整批出错时保存路径为None），on_stats定时以运行统计
+    （BatchMetrics.snapshot）调用。
+    """
+    def __init__(self, directories, save_dir, color_scheme, dpi=300, view_mode="2D",
+                 render_mode="figure", name_template=DEFAULT_NAME_TEMPLATE,
+                 surface_count=SURFACE_COUNT, events=None, preprocess=None, pattern='*.csv',
+                 recursive=False,
+                 interval=WATCH_INTERVAL, settle=SETTLE_TIME, queue_size=QUEUE_SIZE,
+                 batch_size=BATCH_SIZE, workers=1, log_path=None, on_result=None, on_stats=None):
+        self.watcher = FolderWatcher(directories, pattern, settle, recursive)
+        self.save_dir = save_dir
+        self.job_args = (color_scheme, dpi, view_mode, render_mode, name_template,
+                         surface_count, events, preprocess)
+        self.interval = interval
+        self.batch_size = batch_size
+        self.workers = workers
+        self.queue = queue.Queue(queue_size)  # (文件, 发现时间)
+        self.manifest = JobManifest(save_dir)
+        self.stats = PipelineStats()
+        self.metrics = BatchMetrics(0, log_path, params={
+            'watch': self.watcher.directories, 'view': view_mode, 'dpi': dpi,
+            'render': render_mode, 'workers': workers, 'events': events is not None,
+            'preprocess': preprocess._asdict() if preprocess else None})
+        self.on_result = on_result
+        self.on_stats = on_stats
+        self.skipped = 0
+        self._stopped = threading.Event()
+        self._ready = []  # 写入完成但队列已满、尚未放入队列的文件
+
+    def stop(self):
+        """请求停止（正在渲染的一批文件完成后停止）"""
+        self._stopped.set()
+
+    @property
+    def stopped(self):
+        return self._stopped.is_set()
+
+    def snapshot(self):
+        """运行统计，另含队列长度和等待写入完成的文件数"""
+        return dict(self.metrics.snapshot(), queued=self.queue.qsize() + len(self._ready),
+                    settling=self.watcher.pending_count, skipped=self.skipped)
+
+    def poll_once(self):
+        """扫描一次，将写入完成的文件放入队列（队列满时留到下次），返回新放入的文件数"""
+        if not self._ready:
+            self._ready = self.watcher.poll()
+        added = 0
+        while self._ready:
+            file_path, first_seen = self._ready[0]
+            try:
+                self.queue.put_nowait((file_path, first_seen))
+            except queue.Full:
+                break
+            self._ready.pop(0)
+            self.watcher.mark_handled(file_path)
+            added += 1
+        return added
+
+    def _take_batch(self):
+        """取出一批文件（最多等待一个扫描间隔），返回[(文件, 发现时间)]"""
+        try:
+            batch = [self.queue.get(timeout=self.interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def render_batch(self, batch, executor=None):
+        """渲染一批文件，跳过任务清单中输入和参数均未变化的文件
+
+        整批出错（如输出目录无法创建、磁盘已满）时尚未完成的文件记为失败，不抛出异常，
+        渲染线程继续处理之后的文件。
+        """
+        arrivals = dict(batch)
+        remaining = list(arrivals)  # 尚未报告结果的文件
+        counted = False
+        try:
+            jobs = make_jobs(list(arrivals), self.save_dir, *self.job_args)
+            jobs, skipped = self.manifest.split_jobs(jobs)
+            self.skipped += len(skipped)
+            remaining = [job.file_path for job in jobs]
+            jobs_by_output = {job.save_path: job for job in jobs}
+            self.metrics.add_total(len(jobs))
+            counted = True
+            for job in jobs:
+                self.metrics.arrived(job.file_path, arrivals[job.file_path])
+            for file_path, save_path, error in run_jobs(jobs, self.workers, self.stats,
+                                                        metrics=self.metrics, executor=executor):
+                remaining.remove(file_path)
+                if error is None:
+                    try:
+                        self.manifest.record(jobs_by_output[save_path])
+                    except OSError as e:
+                        error = f"写入任务清单失败: {e}"
+                if self.on_result is not None:
+                    self.on_result(file_path, save_path, error)
+        except Exception as e:
+            if not counted:
+                self.metrics.add_total(len(remaining))
+            for file_path in remaining:
+                self.metrics.file_done(file_path, None, str(e), {})
+                if self.on_result is not None:
+                    self.on_result(file_path, None, str(e))
+
+    def _render_loop(self, executor):
+        while not self.stopped:
+            batch = self._take_batch()
+            if not batch:
+                continue
+            try:
+                self.render_batch(batch, executor)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def run(self, once=False, stats_interval=5.0):
+        """扫描并渲染直到stop()；once为True时处理完当前已有的文件后返回"""
+        executor = create_process_pool(self.workers) if self.workers > 1 else None
+        renderer = threading.Thread(target=self._render_loop, args=(executor,),
+                                    name='prpd-watch-render', daemon=True)
+        renderer.start()
+        last_stats = time.perf_counter()
+        try:
+            while not self.stopped:
+                self.poll_once()
+                if self.on_stats is not None and time.perf_counter() - last_stats >= stats_interval:
+                    last_stats = time.perf_counter()
+                    self.on_stats(self.snapshot())
+                if once and self.idle():
+                    break
+                self._stopped.wait(self.interval)
+        finally:
+            self.stop()
+            renderer.join()
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            if self.on_stats is not None:
+                self.on_stats(self.snapshot())
+            self.metrics.close()
+
+    def idle(self):
+        """没有等待写入完成、排队或正在渲染的文件"""
+        return (not self._ready and self.watcher.pending_count == 0
+                and self.queue.unfinished_tasks == 0)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="监视目录，自动渲染新增或修改的PRPD文件")
+    parser.add_argument('directories', nargs='+', help="监视的目录")
+    parser.add_argument('-o', '--output-dir', required=True, help="输出目录")
+    parser.add_argument('--pattern', default='*.csv', help="文件匹配模式")
+    parser.add_argument('--recursive', action='store_true', help="同时监视子目录")
+    parser.add_argument('--interval', type=float, default=WATCH_INTERVAL, help="扫描间隔（秒）")
+    parser.add_argument('--settle', type=float, default=SETTLE_TIME,
+                        help="文件大小和修改时间保持不变多久后视为写入完成（秒）")
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE, help="待渲染队列的最大文件数")
+    parser.add_argument('--once', action='store_true', help="处理完目录中现有的文件后退出")
+    parser.add_argument('--view', choices=['2D', '3D'], default='2D', help="视图模式")
+    parser.add_argument('--scheme', type=parse_color_scheme, default=COLOR_SCHEMES["默认方案"],
+                        help="颜色方案名称或逗号分隔的颜色列表")
+    parser.add_argument('--dpi', type=int, default=300, help="保存DPI")
+    parser.add_argument('--name', default=DEFAULT_NAME_TEMPLATE,
+                        help="输出文件名模板，可用字段{name}、{view}、{dpi}")
+    parser.add_argument('--workers', type=int, default=1, help="并行进程数")
+    parser.add_argument('--render', choices=RENDER_MODES, default="figure",
+                        help="渲染方式: figure逐文件创建Figure, template复用图形模板, "
+                             "raster直接生成像素（仅2D）")
+    parser.add_argument('--surface-count', type=int, default=SURFACE_COUNT,
+                        help="3D曲面每个方向的最大网格数，越小越快")
+    parser.add_argument('--events', action='store_true',
+                        help="输入为原始脉冲事件（列: 相位或时间戳, 放电量），按分箱生成PRPD图")
+    parser.add_argument('--phase-bins', type=int, default=PHASE_BINS, help="脉冲事件的相位分箱数")
+    parser.add_argument('--amp-bins', type=int, default=AMP_BINS, help="脉冲事件的幅值分箱数")
+    parser.add_argument('--frequency', type=float,
+                        help="脉冲事件第一列为时间戳（秒）时的工频（Hz）")
+    parser.add_argument('--stats-interval', type=float, default=30.0, help="打印运行统计的间隔（秒）")
+    parser.add_argument('--log', help=f"逐文件计时的JSON Lines日志（默认为输出目录中的{BATCH_LOG_NAME}）")
+    parser.add_argument('--no-log', action='store_true', help="不写日志")
+    add_preprocess_arguments(parser)
+    args = parser.parse_args(argv)
+    preprocess = preprocess_from_args(parser, args)
+    if preprocess is not None and preprocess.normalize == "global":
+        # 文件陆续到达，无法预先扫描全部数据
+        parser.error("监视目录不支持--normalize global，请使用--normalize fixed")
+
+    for directory in args.directories:
+        if not os.path.isdir(directory):
+            parser.error(f"目录不存在: {directory}")
+    os.makedirs(args.output_dir, exist_ok=True)
+    events = None
+    if args.events:
+        events = EventBinning(args.phase_bins, args.amp_bins, frequency=args.frequency)
+    log_path = None if args.no_log else args.log or os.path.join(args.output_dir, BATCH_LOG_NAME)
+    failed = 0
+
+    def on_result(file_path, save_path, error):
+        nonlocal failed
+        if error is None:
+            print(f"{file_path} -> {save_path}", flush=True)
+        else:
+            failed += 1
+            print(f"处理文件失败: {file_path} - {error}", file=sys.stderr, flush=True)
+
+    def on_stats(snapshot):
+        print(f"运行统计: {format_snapshot(snapshot)}，排队{snapshot['queued']}，"
+              f"等待写入完成{snapshot['settling']}，跳过未变化{snapshot['skipped']}",
+              file=sys.stderr, flush=True)
+
+    service = WatchService(args.directories, args.output_dir, args.scheme, args.dpi, args.view,
+                           args.render, args.name, args.surface_count, events, preprocess,
+                           args.pattern, args.recursive, args.interval, args.settle, args.queue_size,
+                           workers=args.workers, log_path=log_path, on_result=on_result,
+                           on_stats=on_stats)
+    print(f"正在监视: {', '.join(service.watcher.directories)}（Ctrl+C停止）", file=sys.stderr)
+    try:
+        service.run(once=args.once, stats_interval=args.stats_interval)
+    except KeyboardInterrupt:
+        service.stop()
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())